@@ -0,0 +1,149 @@
+# Typed, table-driven AT response parser
+#
+# Each response prefix registers a compact field spec, one letter per
+# field:
+#
+#   d   decimal int (optionally negative)
+#   x   hex int, e.g. the quoted "1A2B" of +CREG <lac>
+#   s   bytes, surrounding quotes removed
+#   _   skipped (always None, nothing is copied)
+#
+# Fields after a '/' are optional. parse() walks the line in place (bytes
+# or a memoryview of the receive buffer) and returns a tuple with one value
+# per field: ints and bytes, None for absent or empty fields. Nothing is
+# decoded, stripped or split, so the only allocations are the tuple and any
+# 's' fields. Fields are matched by position, never by substring, so
+# "+CREG: 2,1,..." and a phone number containing "0,0" cannot be mistaken
+# for something else.
+
+from modem import startswith
+
+D = 0x64    # 'd'
+X = 0x78    # 'x'
+S = 0x73    # 's'
+SKIP = 0x5F  # '_'
+
+# Prefix (with the colon) -> spec
+SPECS = {}
+
+_compiled = {}
+
+
+def register(prefix, spec):
+    """Register the field spec used by parse() for lines with prefix"""
+    if isinstance(prefix, str):
+        prefix = prefix.encode()
+    SPECS[prefix] = spec
+
+
+def compile_spec(spec):
+    """Turn "d/xxd" into (b"dxxd", required field count), cached"""
+    compiled = _compiled.get(spec)
+    if compiled is None:
+        types = spec.replace("/", "").encode()
+        for t in types:
+            if t not in (D, X, S, SKIP):
+                raise ValueError(f"bad field type in spec {spec!r}")
+        slash = spec.find("/")
+        compiled = _compiled[spec] = (types, len(types) if slash < 0 else slash)
+    return compiled
+
+
+def spec_for(line):
+    """The registered spec for a line, or None"""
+    for prefix, spec in SPECS.items():
+        if startswith(line, prefix):
+            return spec
+    return None
+
+
+def _number(line, start, end, base):
+    # int(line[start:end], base) without the copy; None if malformed
+    negative = line[start] == 0x2D  # '-'
+    if negative:
+        start += 1
+    if start == end:
+        return None
+    value = 0
+    for i in range(start, end):
+        c = line[i]
+        if 0x30 <= c <= 0x39:
+            digit = c - 0x30
+        elif base == 16 and 0x61 <= (c | 0x20) <= 0x66:
+            digit = (c | 0x20) - 0x57
+        else:
+            return None
+        value = value * base + digit
+    return -value if negative else value
+
+
+def _fields_start(line, n):
+    # Index after the "+XXX:" prefix, 0 if the line has none
+    for i in range(n):
+        c = line[i]
+        if c == 0x3A:  # ':'
+            return i + 1
+        if c == 0x22 or c == 0x2C:  # '"' or ',' before any ':'
+            return 0
+    return 0
+
+
+def parse(line, spec=None):
+    """
+    Parse the fields of a "+XXX: a,"b",c" line into a tuple
+
+    spec defaults to the one registered for the line's prefix. Returns None
+    if there is no spec, a required field is missing or empty, or a number
+    does not parse.
+    """
+    if spec is None:
+        spec = spec_for(line)
+        if spec is None:
+            return None
+    types, required = compile_spec(spec)
+    n = len(line)
+    i = _fields_start(line, n)
+    values = []
+    for field, t in enumerate(types):
+        value = None
+        if i <= n:
+            while i < n and line[i] == 0x20:
+                i += 1
+            if i < n and line[i] == 0x22:  # Quoted: commas inside are data
+                start = end = i + 1
+                while end < n and line[end] != 0x22:
+                    end += 1
+                i = end + 1
+                while i < n and line[i] != 0x2C:
+                    i += 1
+                quoted = True
+            else:
+                start = i
+                while i < n and line[i] != 0x2C:
+                    i += 1
+                end = i
+                while end > start and line[end - 1] <= 0x20:
+                    end -= 1
+                quoted = False
+            i += 1
+            if t == S:
+                if end > start or quoted:
+                    value = bytes(line[start:end])
+            elif t != SKIP and end > start:
+                value = _number(line, start, end, 16 if t == X else 10)
+                if value is None:
+                    return None
+        if value is None and field < required and t != SKIP:
+            return None
+        values.append(value)
+    return tuple(values)
+
+
+def find(lines, prefix, spec=None):
+    """Parse the first of lines that starts with prefix, or None"""
+    if isinstance(prefix, str):
+        prefix = prefix.encode()
+    for line in lines:
+        if startswith(line, prefix):
+            return parse(line, spec or SPECS.get(prefix))
+    return None
@@ -0,0 +1,86 @@
+# AT traffic recorder
+#
+# RecordingUART wraps the modem UART and timestamps every chunk written to
+# and read from the SIM7600G. The transcript is saved as one event per line,
+#
+#   <us since start> <T|R> <hex bytes>
+#
+# and can be fed back on a Linux box by tests/sim/replay_uart.py, so SMS,
+# call and GPS flows recorded on the device become host regression tests
+# and reader latency benchmarks.
+
+try:
+    from binascii import hexlify, unhexlify
+except ImportError:
+    from ubinascii import hexlify, unhexlify
+
+from modem import ticks_us, ticks_diff
+from storage import FLASH_ROOT
+
+TRACE_FILE = FLASH_ROOT + "/at_trace.txt"
+
+TX = "T"
+RX = "R"
+
+
+class RecordingUART:
+    def __init__(self, uart, max_events=2000):
+        """
+        Args:
+            uart: machine.UART (or a fake) to pass traffic through
+            max_events: events kept in RAM; later traffic is counted only
+        """
+        self.uart = uart
+        self.max_events = max_events
+        self.events = []        # (us, TX or RX, bytes)
+        self.dropped = 0
+        self.start = ticks_us()
+
+    def _record(self, direction, data):
+        if len(self.events) < self.max_events:
+            self.events.append((ticks_diff(ticks_us(), self.start), direction, bytes(data)))
+        else:
+            self.dropped += 1
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._record(TX, data)
+        return self.uart.write(data)
+
+    def any(self):
+        return self.uart.any()
+
+    def read(self, n=None):
+        data = self.uart.read() if n is None else self.uart.read(n)
+        if data:
+            self._record(RX, data)
+        return data
+
+    def readinto(self, buf, n=None):
+        n = self.uart.readinto(buf) if n is None else self.uart.readinto(buf, n)
+        if n:
+            self._record(RX, buf[:n])
+        return n
+
+    def __getattr__(self, name):
+        # init(), irq(), flush()... go straight to the real UART
+        return getattr(self.uart, name)
+
+    def save(self, path=TRACE_FILE):
+        """Write the transcript, returning the number of events"""
+        with open(path, "w") as f:
+            for us, direction, data in self.events:
+                f.write(f"{us} {direction} {hexlify(data).decode()}\n")
+        return len(self.events)
+
+
+def load_transcript(path=TRACE_FILE):
+    """Read a saved transcript back as a list of (us, TX or RX, bytes)"""
+    events = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3:
+                events.append((int(parts[0]), parts[1], unhexlify(parts[2])))
+    return events
@@ -0,0 +1,185 @@
+# Per-command AT latency statistics
+#
+# Every command sent through Modem or AsyncModem is timed with ticks_us
+# from the write to the first received byte (with echo on, this is the
+# echo) and to the final result code. Times go into fixed-size histograms
+# with one bucket per power of two microseconds, kept per command verb
+# (+CSQ, +CMGS, D, ...), so the cost in RAM is bounded however long the
+# phone runs. modem_stats() prints the table; snapshots can be written to
+# flash periodically to compare builds or sessions.
+
+import json
+
+try:
+    from array import array
+except ImportError:
+    from uarray import array
+
+# Bucket i holds times in [2**(i-1), 2**i) us; the last one everything longer
+BUCKETS = 25            # Up to ~16.8 s
+MAX_VERBS = 32          # Further verbs are counted under OTHER
+OTHER = "other"
+
+
+def bucket(us):
+    """Histogram bucket of a time in microseconds"""
+    i = 0
+    while us > 0 and i < BUCKETS - 1:
+        us >>= 1
+        i += 1
+    return i
+
+
+def bucket_limit_ms(i):
+    """Upper bound of bucket i in ms"""
+    return (1 << i) / 1000
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = array('I', [0] * BUCKETS)
+        self.count = 0
+        self.max_us = 0
+
+    def add(self, us):
+        self.counts[bucket(us)] += 1
+        self.count += 1
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile_ms(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in ms"""
+        if not self.count:
+            return None
+        rank = (self.count * p + 99) // 100
+        seen = 0
+        for i in range(BUCKETS):
+            seen += self.counts[i]
+            if seen >= rank:
+                return min(bucket_limit_ms(i), self.max_us / 1000)
+        return self.max_us / 1000
+
+    def to_dict(self):
+        return {"counts": list(self.counts), "max_us": self.max_us}
+
+    def merge(self, data):
+        for i, n in enumerate(data["counts"][:BUCKETS]):
+            self.counts[i] += n
+            self.count += n
+        self.max_us = max(self.max_us, data["max_us"])
+
+
+class VerbStats:
+    def __init__(self):
+        self.first = Histogram()    # Write to first received byte
+        self.final = Histogram()    # Write to final result code
+        self.results = {}           # Result (OK, ERROR, TIMEOUT, >) -> count
+
+    def to_dict(self):
+        return {"first": self.first.to_dict(), "final": self.final.to_dict(),
+                "results": self.results}
+
+    def merge(self, data):
+        self.first.merge(data["first"])
+        self.final.merge(data["final"])
+        for result, n in data["results"].items():
+            self.results[result] = self.results.get(result, 0) + n
+
+
+class ModemStats:
+    def __init__(self):
+        self.verbs = {}
+        self.autosave_path = None
+        self.autosave_ms = 0
+        self.saved_at = None
+
+    def verb(self, name):
+        stats = self.verbs.get(name)
+        if stats is None:
+            if len(self.verbs) >= MAX_VERBS:
+                name = OTHER
+                stats = self.verbs.get(name)
+            if stats is None:
+                stats = self.verbs[name] = VerbStats()
+        return stats
+
+    def record(self, name, first_us, final_us, result):
+        """Record one finished command; first_us is None if nothing arrived"""
+        stats = self.verb(name)
+        if first_us is not None:
+            stats.first.add(first_us)
+        # A timeout only says the limit was reached: keep it out of the times
+        if result != "TIMEOUT":
+            stats.final.add(final_us)
+        stats.results[result] = stats.results.get(result, 0) + 1
+        if self.autosave_path:
+            self._autosave()
+
+    def reset(self):
+        self.verbs = {}
+
+    def report(self):
+        """The statistics table as text (times in ms, bucket upper bounds)"""
+        lines = [f"{'verb':<16}{'n':>6}{'1st p50':>9}{'p50':>9}{'p90':>9}{'p99':>9}"
+                 f"{'max':>9}  results"]
+        for name in sorted(self.verbs):
+            stats = self.verbs[name]
+            count = sum(stats.results.values())
+            cells = [stats.first.percentile_ms(50), stats.final.percentile_ms(50),
+                     stats.final.percentile_ms(90), stats.final.percentile_ms(99),
+                     stats.final.max_us / 1000 if stats.final.count else None]
+            cells = "".join(f"{c:>9.1f}" if c is not None else f"{'-':>9}" for c in cells)
+            results = " ".join(f"{r}={n}" for r, n in sorted(stats.results.items()))
+            lines.append(f"{name[:15]:<16}{count:>6}{cells}  {results}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {name: stats.to_dict() for name, stats in self.verbs.items()}
+
+    def save(self, path=None):
+        """Write a snapshot to flash (JSON, replaced atomically)"""
+        from storage import write_file_atomic
+        write_file_atomic(path or stats_file(), json.dumps(self.to_dict()).encode())
+
+    def load(self, path=None):
+        """Merge a saved snapshot, e.g. to keep totals across reboots"""
+        try:
+            with open(path or stats_file()) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for name, verb_data in data.items():
+            self.verb(name).merge(verb_data)
+        return True
+
+    def autosave(self, interval_s, path=None):
+        """Save a snapshot at most every interval_s, as commands complete"""
+        self.autosave_path = path or stats_file()
+        self.autosave_ms = int(interval_s * 1000)
+
+    def _autosave(self):
+        from modem import ticks_ms, ticks_diff
+        now = ticks_ms()
+        if self.saved_at is None:
+            self.saved_at = now
+        elif ticks_diff(now, self.saved_at) >= self.autosave_ms:
+            self.saved_at = now
+            try:
+                self.save(self.autosave_path)
+            except OSError as e:
+                print(f"Modem stats snapshot failed: {e}")
+
+
+def stats_file():
+    from storage import FLASH_ROOT
+    return FLASH_ROOT + "/modem_stats.json"
+
+
+# Shared by every modem instance unless one is given its own
+STATS = ModemStats()
+
+
+def modem_stats(stats=STATS):
+    """Print the per-verb latency table and return the statistics"""
+    print(stats.report())
+    return stats
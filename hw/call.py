@@ -0,0 +1,184 @@
+# Voice call state machine for the SIM7600G
+#
+# Driven entirely by URCs: AT+CLCC=1 makes the module report every call
+# state change as a +CLCC line, and RING / +CLIP / NO CARRIER fill in the
+# gaps. Nothing here polls the modem.
+
+from at_parse import parse, register
+
+# Call states
+IDLE = "idle"
+DIALING = "dialing"
+ALERTING = "alerting"
+ACTIVE = "active"
+HELD = "held"
+INCOMING = "incoming"
+ENDED = "ended"
+
+# +CLCC <stat> values
+CLCC_STATES = {
+    0: ACTIVE,
+    1: HELD,
+    2: DIALING,
+    3: ALERTING,
+    4: INCOMING,
+    5: INCOMING,    # Waiting (call waiting counts as incoming)
+    6: ENDED,       # Disconnect
+}
+
+# +CLCC <mode> value for voice calls
+MODE_VOICE = 0
+
+
+# <id>,<dir>,<stat>,<mode>,<mpty>[,<number>,<type>[,<alpha>]]
+CLCC_SPEC = "ddddd/sds"
+CLIP_SPEC = "s/d"
+
+register(b"+CLCC:", CLCC_SPEC)
+register(b"+CLIP:", CLIP_SPEC)
+
+
+def parse_clcc(line):
+    """Parse a +CLCC line into a dict, or None if it is malformed"""
+    fields = parse(line, CLCC_SPEC)
+    if fields is None:
+        return None
+    call_id, direction, stat, mode, multiparty, number, number_type, name = fields
+    try:
+        call = {
+            'id': call_id,
+            'incoming': direction == 1,
+            'stat': stat,
+            'mode': mode,
+            'multiparty': multiparty == 1,
+            'number': number.decode() if number else "",
+            'type': number_type,
+            'name': name.decode() if name else "",
+        }
+    except UnicodeError:
+        return None
+    call['state'] = CLCC_STATES.get(stat, IDLE)
+    return call
+
+
+class CallStateMachine:
+    def __init__(self, modem, lookup=None):
+        """
+        Track the current voice call from modem URCs
+
+        Args:
+            modem: AsyncModem (or Modem) whose dispatcher delivers the URCs
+            lookup: lookup(number) -> contact name or None, e.g.
+                    CallerIndex.lookup, to fill in name
+        """
+        self.modem = modem
+        self.lookup = lookup
+        self.state = IDLE
+        self.call_id = None
+        self.number = ""
+        self.name = ""
+        self.incoming = False
+        self.listeners = []
+
+        modem.on_urc("+CLCC:", self._on_clcc)
+        modem.on_urc("RING", self._on_ring)
+        modem.on_urc("+CLIP:", self._on_clip)
+        for code in ("NO CARRIER", "BUSY", "NO ANSWER"):
+            modem.on_urc(code, self._on_disconnect)
+
+    def on_change(self, listener):
+        """Call listener(old_state, new_state, machine) on every transition"""
+        self.listeners.append(listener)
+
+    def in_call(self):
+        """True while a call is being set up, ringing, active or held"""
+        return self.state not in (IDLE, ENDED)
+
+    def _set_state(self, state, force=False):
+        old = self.state
+        if state == old and not force:
+            return
+        self.state = state
+        for listener in self.listeners:
+            listener(old, state, self)
+
+    def _set_number(self, number):
+        if number != self.number:
+            self.number = number
+            self.name = (self.lookup(number) or "") if self.lookup and number else ""
+
+    def _reset(self):
+        self.call_id = None
+        self.number = ""
+        self.name = ""
+        self.incoming = False
+
+    def _on_clcc(self, line):
+        call = parse_clcc(line)
+        if call is None or call['mode'] != MODE_VOICE:
+            return
+        # Ignore reports for other calls (e.g. a waiting call we rejected)
+        if self.call_id is not None and call['id'] != self.call_id and self.in_call():
+            return
+        if call['state'] == ENDED:
+            self._set_state(ENDED)
+            self._reset()
+            return
+        self.call_id = call['id']
+        self.incoming = call['incoming']
+        if call['number']:
+            self._set_number(call['number'])
+        self._set_state(call['state'])
+
+    def _on_ring(self, line):
+        if not self.in_call():
+            self.incoming = True
+            self._set_state(INCOMING)
+
+    def _on_clip(self, line):
+        fields = parse(line, CLIP_SPEC)
+        number = fields[0].decode() if fields else ""
+        changed = number != self.number
+        self._set_number(number)
+        if not self.in_call():
+            self.incoming = True
+            self._set_state(INCOMING)
+        elif changed and self.state == INCOMING:
+            # RING came first; tell listeners who is calling
+            self._set_state(INCOMING, force=True)
+
+    def _on_disconnect(self, line):
+        if self.in_call():
+            self._set_state(ENDED)
+            self._reset()
+
+    async def enable(self):
+        """Turn on +CLCC auto-reports and caller ID presentation"""
+        result, _ = await self.modem.command("AT+CLCC=1")
+        await self.modem.command("AT+CLIP=1")
+        return result == "OK"
+
+    async def dial(self, number, timeout=15):
+        """Start a voice call; progress arrives through +CLCC reports"""
+        self._reset()
+        self._set_number(number)
+        self._set_state(DIALING)
+        result, _ = await self.modem.command(f"ATD{number};", timeout)
+        if result != "OK":
+            self._set_state(ENDED)
+            self._reset()
+            return False
+        return True
+
+    async def answer(self):
+        """Answer the incoming call"""
+        result, _ = await self.modem.command("ATA", timeout=10)
+        return result == "OK"
+
+    async def hangup(self):
+        """Hang up the current call"""
+        result, _ = await self.modem.command("AT+CHUP", timeout=5)
+        if result == "OK" and self.in_call():
+            self._set_state(ENDED)
+            self._reset()
+        return result == "OK"
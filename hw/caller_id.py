@@ -0,0 +1,263 @@
+# Caller-ID index in a raw W25Q128 region
+#
+# Incoming calls need a contact name before the caller gives up, however
+# many contacts there are. Contacts are hashed by the last 9 digits of
+# their normalized number into one 256-byte page per bucket, so a lookup
+# is one page read; a full bucket chains to an overflow page. The digit
+# count is stored next to the key, so "012345678" and "12345678" stay
+# apart. The names of recent callers are kept in a small RAM cache. The
+# index is rebuilt from the contact store at boot when its header is not
+# valid (open_index), and the store updates it in place as contacts are
+# added or removed (NOR flash only clears bits: slots are appended,
+# removal zeroes a key).
+#
+# Region layout:  page 0              "CID2" <buckets u32 LE>
+#                 pages 1..buckets    bucket pages
+#                 following pages     overflow pages, allocated in order
+# Page layout:    <next page u32 LE> <slot> x 7   (0xFFFFFFFF = no next)
+# Slot layout:    <key + 1 u32 LE> <digits> <name length> <name, 30 bytes UTF-8>
+#                 key 0xFFFFFFFF = free, 0 = removed
+
+from w25q128 import SECTOR_SIZE, PAGE_SIZE
+from contacts import normalize_number
+
+MAGIC = b"CID2"
+KEY_DIGITS = 9
+NEXT_SIZE = 4
+SLOT_SIZE = 36
+SLOTS = (PAGE_SIZE - NEXT_SIZE) // SLOT_SIZE
+NAME_MAX = SLOT_SIZE - 6
+REMOVED = 0
+CACHE_SIZE = 16
+
+_BLANK = b"\xff" * PAGE_SIZE
+
+
+def caller_key(number):
+    """Index key of a phone number: (value, count) of its last 9 digits, or None"""
+    digits = normalize_number(number or "")[-KEY_DIGITS:]
+    if not digits:
+        return None
+    return int(digits), len(digits)
+
+
+def _u32(buf, pos):
+    # Little-endian u32 of a used field; stays a small int on MicroPython
+    return buf[pos] | buf[pos + 1] << 8 | buf[pos + 2] << 16 | buf[pos + 3] << 24
+
+
+def _name_bytes(name):
+    # UTF-8, cut to NAME_MAX without splitting a character
+    data = name.encode()
+    if len(data) <= NAME_MAX:
+        return data
+    end = NAME_MAX
+    while end and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return data[:end]
+
+
+class CallerIndex:
+    def __init__(self, flash, cache_size=CACHE_SIZE):
+        """
+        Args:
+            flash: raw region (W25Q128 partition, see storage.caller_id_region)
+            cache_size: recent lookups kept in RAM
+        """
+        self.flash = flash
+        self.pages = flash.size // PAGE_SIZE
+        self.buckets = self.pages // 2 - 1     # Odd, so keys spread over all of them
+        self.page = bytearray(PAGE_SIZE)
+        self.slot = bytearray(SLOT_SIZE)
+        self.cache = []         # [key, name or None], most recent first
+        self.cache_size = cache_size
+        self.page_reads = 0
+        self.cache_hits = 0
+        self.next_overflow = None
+        self.valid = self._read_header()
+
+    def _read_header(self):
+        header = bytearray(8)
+        self.flash.read(0, header)
+        return header[:4] == MAGIC and _u32(header, 4) == self.buckets
+
+    def _read_page(self, page):
+        self.flash.read(page * PAGE_SIZE, self.page)
+        self.page_reads += 1
+
+    def _bucket(self, key):
+        return 1 + key[0] % self.buckets
+
+    def _matches(self, pos, key):
+        return _u32(self.page, pos) == key[0] + 1 and self.page[pos + 4] == key[1]
+
+    def _next(self):
+        # Next page of the chain, or None
+        if self.page[3] == 0xFF:
+            return None
+        return _u32(self.page, 0)
+
+    # --- Lookup ------------------------------------------------------------------
+
+    def lookup(self, number):
+        """Contact name for a caller's number, or None if it is not known"""
+        key = caller_key(number)
+        if key is None or not self.valid:
+            return None
+        for i, entry in enumerate(self.cache):
+            if entry[0] == key:
+                if i:
+                    self.cache.insert(0, self.cache.pop(i))
+                self.cache_hits += 1
+                return entry[1]
+        name = self._find(key)
+        self._remember(key, name)
+        return name
+
+    def _find(self, key):
+        page = self._bucket(key)
+        name = None
+        while page is not None:
+            self._read_page(page)
+            for slot in range(SLOTS):
+                pos = NEXT_SIZE + slot * SLOT_SIZE
+                if self.page[pos + 3] == 0xFF:
+                    return name     # Slots fill in order: the rest are free
+                if self._matches(pos, key):
+                    # Later slots win: an update is appended
+                    n = self.page[pos + 5]
+                    name = bytes(self.page[pos + 6:pos + 6 + n]).decode()
+            page = self._next()
+        return name
+
+    def _remember(self, key, name):
+        for i, entry in enumerate(self.cache):
+            if entry[0] == key:
+                self.cache.pop(i)
+                break
+        self.cache.insert(0, [key, name])
+        if len(self.cache) > self.cache_size:
+            self.cache.pop()
+
+    # --- Updates -----------------------------------------------------------------
+
+    def add(self, number, name):
+        """Index a contact; a later add for the same number replaces the name"""
+        key = caller_key(number)
+        if key is None:
+            return False
+        page = self._bucket(key)
+        while True:
+            self._read_page(page)
+            for slot in range(SLOTS):
+                pos = NEXT_SIZE + slot * SLOT_SIZE
+                if self.page[pos + 3] == 0xFF:
+                    self._program_slot(page, pos, key, name)
+                    self._remember(key, name)
+                    return True
+            next_page = self._next()
+            if next_page is None:
+                break
+            page = next_page
+        # Bucket chain full: start an overflow page and link it
+        overflow = self._allocate()
+        if overflow is None:
+            return False
+        self._program_slot(overflow, NEXT_SIZE, key, name)
+        self.flash.program(page * PAGE_SIZE, overflow.to_bytes(4, "little"))
+        self._remember(key, name)
+        return True
+
+    def remove(self, number):
+        """Drop a number from the index, returning True if it was there"""
+        key = caller_key(number)
+        if key is None:
+            return False
+        page = self._bucket(key)
+        found = False
+        while page is not None:
+            self._read_page(page)
+            for slot in range(SLOTS):
+                pos = NEXT_SIZE + slot * SLOT_SIZE
+                if self.page[pos + 3] == 0xFF:
+                    break
+                if self._matches(pos, key):
+                    self.flash.program(page * PAGE_SIZE + pos, REMOVED.to_bytes(4, "little"))
+                    found = True
+            page = self._next()
+        self._remember(key, None)
+        return found
+
+    def _program_slot(self, page, pos, key, name):
+        data = _name_bytes(name)
+        slot = self.slot
+        slot[:] = b"\xff" * SLOT_SIZE
+        slot[:4] = (key[0] + 1).to_bytes(4, "little")
+        slot[4] = key[1]
+        slot[5] = len(data)
+        slot[6:6 + len(data)] = data
+        self.flash.program(page * PAGE_SIZE + pos, slot)
+
+    def _allocate(self):
+        # Overflow pages are used in order: binary search for the first free one
+        if self.next_overflow is None:
+            low, high = self.buckets + 1, self.pages
+            while low < high:
+                mid = (low + high) // 2
+                self._read_page(mid)
+                if self.page[NEXT_SIZE + 3] == 0xFF:
+                    high = mid
+                else:
+                    low = mid + 1
+            self.next_overflow = low
+        if self.next_overflow >= self.pages:
+            return None
+        page = self.next_overflow
+        self.next_overflow += 1
+        return page
+
+    def rebuild(self, contacts):
+        """
+        Rebuild the index from contact dicts (ContactStore.contacts())
+
+        Only sectors holding data are erased. The header is written last,
+        so an index cut short by a power loss is rebuilt at the next boot.
+        Returns the number of contacts indexed.
+        """
+        for sector in range(self.flash.size // SECTOR_SIZE):
+            if not self._blank(sector):
+                self.flash.erase_sector(sector * SECTOR_SIZE)
+        self.valid = False
+        self.cache = []
+        self.next_overflow = self.buckets + 1
+        count = 0
+        for contact in contacts:
+            if self.add(contact.get('number'), contact.get('name') or ""):
+                count += 1
+        self.flash.program(0, MAGIC + self.buckets.to_bytes(4, "little"))
+        self.valid = True
+        self.cache = []
+        return count
+
+    def _blank(self, sector):
+        for page in range(sector * SECTOR_SIZE // PAGE_SIZE, (sector + 1) * SECTOR_SIZE // PAGE_SIZE):
+            self.flash.read(page * PAGE_SIZE, self.page)
+            if self.page != _BLANK:
+                return False
+        return True
+
+
+def open_index(flash, store):
+    """
+    Mount the caller-ID index at boot and hand it to a ContactStore
+
+    An index without a valid header (never built, cut short by a power
+    loss or in an older layout) is rebuilt from the store first. From then
+    on the store keeps it up to date.
+    """
+    index = CallerIndex(flash)
+    if not index.valid:
+        count = index.rebuild(store.contacts())
+        print(f"Caller-ID index rebuilt: {count} contacts")
+    store.index = index
+    return index
@@ -0,0 +1,108 @@
+# Contact store on the W25Q128
+#
+# Contacts are appended as JSON lines to a file on the LittleFS partition,
+# like received messages. Each carries its normalized number as key, so
+# the same number typed as "+1 555..." and "001555..." is stored once.
+# With a caller-ID index attached, every contact added or removed is
+# applied to it as well, so incoming calls see the change at once.
+
+import json
+import os
+from storage import FLASH_ROOT
+
+CONTACTS_FILE = FLASH_ROOT + "/contacts.jsonl"
+
+
+def normalize_number(number):
+    """Digits of a phone number, without formatting or the 00 / + prefix"""
+    digits = "".join(c for c in number if "0" <= c <= "9")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    return digits
+
+
+class ContactStore:
+    def __init__(self, path=CONTACTS_FILE, index=None):
+        """
+        Args:
+            path: JSON-lines file, one contact per line
+            index: CallerIndex kept in step with the store (see caller_id.open_index)
+        """
+        self.path = path
+        self.index = index
+        self.keys = None    # Normalized numbers stored, loaded on first add
+        self.count = 0
+
+    def _load_keys(self):
+        self.keys = set()
+        self.count = 0
+        for contact in self.contacts():
+            self.keys.add(contact.get('key'))
+            self.count += 1
+
+    def add(self, name, number, source=None):
+        """Store a contact, returning False if its number is already stored"""
+        return self.add_many(((name, number),), source) == 1
+
+    def add_many(self, entries, source=None):
+        """
+        Store (name, number) pairs with one file open, returning how many
+        were new. Entries without digits or with a stored number are skipped.
+        """
+        if self.keys is None:
+            self._load_keys()
+        added = 0
+        f = None
+        try:
+            for name, number in entries:
+                key = normalize_number(number)
+                if not key or key in self.keys:
+                    continue
+                if f is None:
+                    f = open(self.path, "a")
+                f.write(json.dumps({'key': key, 'name': name, 'number': number,
+                                    'source': source}))
+                f.write("\n")
+                self.keys.add(key)
+                added += 1
+                if self.index is not None:
+                    self.index.add(number, name)
+        finally:
+            if f is not None:
+                f.close()
+        self.count += added
+        return added
+
+    def remove(self, number):
+        """Remove the contact with this number, returning False if there is none"""
+        key = normalize_number(number or "")
+        if self.keys is None:
+            self._load_keys()
+        if not key or key not in self.keys:
+            return False
+        # Copy the others line by line, then swap the file in atomically
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for contact in self.contacts():
+                if contact.get('key') != key:
+                    f.write(json.dumps(contact))
+                    f.write("\n")
+        os.rename(tmp, self.path)
+        self.keys.discard(key)
+        self.count -= 1
+        if self.index is not None:
+            self.index.remove(number)
+        return True
+
+    def contacts(self):
+        """Yield stored contacts oldest first, one line in RAM at a time"""
+        try:
+            f = open(self.path)
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    pass    # Line cut short by a power loss
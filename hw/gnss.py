@@ -0,0 +1,243 @@
+# GNSS service for the SIM7600G
+#
+# AT+CGPSINFO=<n> makes the module report the position every n seconds as a
+# +CGPSINFO URC. Each report is parsed straight from the receive ring into
+# one preallocated Fix, which is published to subscribers. Values are
+# fixed-point integers (micro-degrees, cm), so the parser creates no float
+# or str objects.
+#
+# +CGPSINFO: <lat>,<N/S>,<lon>,<E/W>,<ddmmyy>,<hhmmss.s>,<alt m>,<speed kn>,<course>
+# +CGPSINFO: ,,,,,,,,            (no fix yet)
+
+try:
+    from array import array
+except ImportError:
+    from uarray import array
+
+from modem import RESULT_OK, RESULT_ERROR
+
+FIELD_COUNT = 9
+
+# Commands that start a session; the hot and warm starts reuse ephemeris and
+# almanac the module still holds (see location.py)
+START_COMMANDS = {
+    None: "AT+CGPS=1",
+    "hot": "AT+CGPSHOT",
+    "warm": "AT+CGPSWARM",
+    "cold": "AT+CGPSCOLD",
+}
+
+# cm/s per knot, x100 (1 kn = 51.44 cm/s)
+KNOT_CM_S_X100 = 5144
+
+
+class Fix:
+    def __init__(self):
+        """One position report; the GNSS service reuses a single instance"""
+        self.valid = False
+        self.lat = 0        # Micro-degrees, north positive
+        self.lon = 0        # Micro-degrees, east positive
+        self.alt = 0        # cm above mean sea level
+        self.speed = 0      # cm/s over ground
+        self.course = 0     # Centi-degrees from true north
+        self.year = 0
+        self.month = 0
+        self.day = 0
+        self.time_ms = 0    # UTC ms since midnight
+
+    def copy_to(self, other):
+        """Copy this fix into other (subscribers keeping a fix must copy it)"""
+        other.valid = self.valid
+        other.lat = self.lat
+        other.lon = self.lon
+        other.alt = self.alt
+        other.speed = self.speed
+        other.course = self.course
+        other.year = self.year
+        other.month = self.month
+        other.day = self.day
+        other.time_ms = self.time_ms
+        return other
+
+    def __repr__(self):
+        return (f"Fix(lat={self.lat / 1e6:.6f}, lon={self.lon / 1e6:.6f}, alt={self.alt / 100}m, "
+                f"{self.year:04d}-{self.month:02d}-{self.day:02d} {self.time_ms // 1000}s)")
+
+
+def _fixed(line, start, end, decimals):
+    # Decimal text to an int scaled by 10**decimals, extra digits truncated
+    value = 0
+    negative = False
+    frac = -1
+    for i in range(start, end):
+        c = line[i]
+        if c == 0x2D:       # '-'
+            negative = True
+        elif c == 0x2E:     # '.'
+            frac = 0
+        elif 0x30 <= c <= 0x39:
+            if frac < 0:
+                value = value * 10 + c - 0x30
+            elif frac < decimals:
+                value = value * 10 + c - 0x30
+                frac += 1
+    if frac < 0:
+        frac = 0
+    while frac < decimals:
+        value *= 10
+        frac += 1
+    return -value if negative else value
+
+
+def _coordinate(line, start, end):
+    # (d)ddmm.mmmmmm to micro-degrees; degrees and minutes are kept apart so
+    # every intermediate value stays a small int
+    whole = 0
+    i = start
+    while i < end and line[i] != 0x2E:
+        whole = whole * 10 + line[i] - 0x30
+        i += 1
+    minutes = (whole % 100) * 1000000 + _fixed(line, i, end, 6)
+    return (whole // 100) * 1000000 + minutes // 60
+
+
+def _digits(line, start, count):
+    value = 0
+    for i in range(start, start + count):
+        value = value * 10 + line[i] - 0x30
+    return value
+
+
+def split_spans(line, spans):
+    """
+    Record the (start, end) of each comma-separated field after the ':'
+
+    spans is a preallocated array of 2 * FIELD_COUNT ints. Returns the
+    number of fields found.
+    """
+    n = len(line)
+    start = 0
+    while start < n and line[start] != 0x3A:
+        start += 1
+    start += 1
+    while start < n and line[start] == 0x20:
+        start += 1
+    count = 0
+    for i in range(start, n + 1):
+        if i == n or line[i] == 0x2C:
+            if count < FIELD_COUNT:
+                spans[2 * count] = start
+                spans[2 * count + 1] = i
+            count += 1
+            start = i + 1
+    return count
+
+
+def parse_cgpsinfo(line, fix, spans):
+    """
+    Parse a +CGPSINFO line (bytes or memoryview) into fix, without float or str objects
+
+    Returns fix.valid: False when the module has no fix yet.
+    """
+    fix.valid = False
+    if split_spans(line, spans) < FIELD_COUNT or spans[0] == spans[1]:
+        return False
+
+    fix.lat = _coordinate(line, spans[0], spans[1])
+    if spans[2] < spans[3] and line[spans[2]] == 0x53:         # 'S'
+        fix.lat = -fix.lat
+    fix.lon = _coordinate(line, spans[4], spans[5])
+    if spans[6] < spans[7] and line[spans[6]] == 0x57:         # 'W'
+        fix.lon = -fix.lon
+
+    if spans[9] - spans[8] >= 6:
+        fix.day = _digits(line, spans[8], 2)
+        fix.month = _digits(line, spans[8] + 2, 2)
+        fix.year = 2000 + _digits(line, spans[8] + 4, 2)
+    if spans[11] - spans[10] >= 6:
+        t = spans[10]
+        fix.time_ms = ((_digits(line, t, 2) * 60 + _digits(line, t + 2, 2)) * 60
+                       + _digits(line, t + 4, 2)) * 1000 + _fixed(line, t + 6, spans[11], 3)
+    fix.alt = _fixed(line, spans[12], spans[13], 2)
+    fix.speed = _fixed(line, spans[14], spans[15], 2) * KNOT_CM_S_X100 // 10000
+    fix.course = _fixed(line, spans[16], spans[17], 2)
+    fix.valid = True
+    return True
+
+
+class GnssService:
+    def __init__(self, modem):
+        """
+        Args:
+            modem: Modem or AsyncModem whose dispatcher delivers the URCs
+        """
+        self.modem = modem
+        self.fix = Fix()
+        self.spans = array('H', [0] * (2 * FIELD_COUNT))
+        self.subscribers = []
+        self.reports = 0    # +CGPSINFO reports seen, with or without a fix
+        self.interval = 0
+        modem.on_urc("+CGPSINFO:", self._on_info, raw=True)
+
+    def subscribe(self, callback):
+        """
+        Call callback(fix) for every valid fix
+
+        The Fix instance is reused for the next report: copy it (Fix.copy_to)
+        to keep it.
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _on_info(self, line):
+        self.reports += 1
+        if parse_cgpsinfo(line, self.fix, self.spans):
+            for callback in self.subscribers:
+                try:
+                    callback(self.fix)
+                except Exception as e:
+                    print(f"GNSS subscriber error: {e}")
+
+    def _commands(self, interval, mode):
+        # Starting answers ERROR when the receiver is already running
+        return ((START_COMMANDS[mode], (RESULT_OK, RESULT_ERROR)),
+                (f"AT+CGPSINFO={interval}", (RESULT_OK,)))
+
+    def start(self, interval=1, mode=None):
+        """
+        Power the receiver and report a fix every interval seconds (Modem)
+
+        mode: None for a plain start, or "hot", "warm" or "cold"
+        """
+        for command, accepted in self._commands(interval, mode):
+            result, _ = self.modem.command(command, 3)
+            if result not in accepted:
+                return False
+        self.interval = interval
+        return True
+
+    def stop(self):
+        """Stop reports and power the receiver down (Modem)"""
+        self.modem.command("AT+CGPSINFO=0", 3)
+        result, _ = self.modem.command("AT+CGPS=0", 3)
+        self.interval = 0
+        return result == RESULT_OK
+
+    async def start_async(self, interval=1, mode=None):
+        """start() for the asyncio engine"""
+        for command, accepted in self._commands(interval, mode):
+            result, _ = await self.modem.command(command, 3)
+            if result not in accepted:
+                return False
+        self.interval = interval
+        return True
+
+    async def stop_async(self):
+        """stop() for the asyncio engine"""
+        await self.modem.command("AT+CGPSINFO=0", 3)
+        result, _ = await self.modem.command("AT+CGPS=0", 3)
+        self.interval = 0
+        return result == RESULT_OK
@@ -0,0 +1,141 @@
+# Persistent cache of modem and SIM identity
+#
+# IMEI, IMSI and ICCID never change for a given module and SIM, so they are
+# kept in a JSON file on the W25Q128. Boot and "About" screens read them
+# from flash after one cheap AT+CICCID per boot confirms the SIM is the
+# cached one. The modem is asked for more only when the cache is empty or
+# the SIM was swapped; +SIMCARD / +CPIN URCs trigger a new check.
+
+import json
+from storage import FLASH_ROOT, write_file_atomic
+from modem import RESULT_OK
+from modem_status import parse_status_lines
+
+IDENTITY_FILE = FLASH_ROOT + "/identity.json"
+
+# SIM identity is keyed by ICCID so a SIM seen before needs no +CIMI query
+ICCID_QUERY = ("+CICCID",)
+FULL_QUERY = ("+CICCID", "+CIMI", "+CGSN")
+
+
+class IdentityCache:
+    def __init__(self, path=IDENTITY_FILE):
+        """
+        Args:
+            path: JSON file holding {"imei", "current", "sims": {iccid: imsi}}
+        """
+        self.path = path
+        self.data = {"imei": None, "current": None, "sims": {}}
+        self.sim_removed = False
+        self.verified = False   # ICCID checked against the cache since boot
+        self.modem = None       # Modem watched for SIM events
+        try:
+            with open(path) as f:
+                self.data.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        write_file_atomic(self.path, json.dumps(self.data).encode())
+
+    def watch(self, modem):
+        """Invalidate the current SIM on SIM removal/insertion URCs"""
+        if self.modem is modem:
+            return
+        self.modem = modem
+        modem.on_urc("+SIMCARD:", self._on_sim_event)
+        modem.on_urc("+CPIN:", self._on_sim_event)
+
+    def _on_sim_event(self, line):
+        if b"READY" in line and b"NOT READY" not in line:
+            # A SIM came back after a removal: the next get() checks which one
+            self.sim_removed = False
+            return
+        # "+SIMCARD: NOT AVAILABLE", "+CPIN: NOT READY", "+CPIN: SIM REMOVED"...
+        if b"SIM PIN" in line or b"SIM PUK" in line:
+            return
+        self.sim_removed = True
+        self.verified = False
+        if self.data["current"] is not None:
+            self.data["current"] = None
+            self.save()
+
+    def cached(self):
+        """Return the cached identity dict, or None if it must be queried"""
+        iccid = self.data["current"]
+        if iccid is None or self.data["imei"] is None:
+            return None
+        return {"iccid": iccid, "imsi": self.data["sims"].get(iccid), "imei": self.data["imei"]}
+
+    def _queries(self):
+        # A known module only needs the ICCID to find the cached SIM entry
+        if self.data["imei"] is not None:
+            return ICCID_QUERY
+        return FULL_QUERY
+
+    def _update(self, values):
+        iccid = values["iccid"]
+        if iccid is None:
+            return None
+        if values["imei"]:
+            self.data["imei"] = values["imei"]
+        if values["imsi"]:
+            self.data["sims"][iccid] = values["imsi"]
+        self.data["current"] = iccid
+        self.verified = True
+        self.save()
+        return self.cached()
+
+    def _need_imsi(self, values):
+        iccid = values["iccid"]
+        return iccid and not values["imsi"] and iccid not in self.data["sims"]
+
+    def _changed(self, values):
+        # Same SIM as cached: nothing to store
+        return values["iccid"] != self.data["current"]
+
+    def get(self, modem):
+        """Identity from flash, querying a blocking Modem only when needed"""
+        self.watch(modem)
+        identity = self.cached()
+        if identity and self.verified:
+            return identity
+        return self.verify(modem)
+
+    def verify(self, modem):
+        """Check the ICCID once against the cache, re-reading a new SIM"""
+        queries = self._queries()
+        result, raw = modem.command("AT" + ";".join(queries), 5)
+        if result != RESULT_OK:
+            return self.cached()
+        values = parse_status_lines(raw.split(b"\r\n"), queries)
+        if not self._changed(values) and self.cached():
+            self.verified = True
+            return self.cached()
+        if self._need_imsi(values):
+            result, raw = modem.command("AT+CIMI", 5)
+            parse_status_lines(raw.split(b"\r\n"), ("+CIMI",), values)
+        return self._update(values)
+
+    async def get_async(self, modem):
+        """Identity from flash, querying an AsyncModem only when needed"""
+        self.watch(modem)
+        identity = self.cached()
+        if identity and self.verified:
+            return identity
+        return await self.verify_async(modem)
+
+    async def verify_async(self, modem):
+        """verify() for the asyncio engine"""
+        queries = self._queries()
+        result, lines = await modem.command("AT" + ";".join(queries), 5)
+        if result != RESULT_OK:
+            return self.cached()
+        values = parse_status_lines(lines, queries)
+        if not self._changed(values) and self.cached():
+            self.verified = True
+            return self.cached()
+        if self._need_imsi(values):
+            result, lines = await modem.command("AT+CIMI", 5)
+            parse_status_lines(lines, ("+CIMI",), values)
+        return self._update(values)
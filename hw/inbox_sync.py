@@ -0,0 +1,243 @@
+# Incremental SMS inbox sync
+#
+# New messages are announced by +CMTI: "<mem>",<index> (AT+CNMI=2,1). Each
+# one is fetched with AT+CMGR, committed to the flash message store and
+# only then deleted from the SIM with AT+CMGD, so nothing that arrives
+# while another message is being handled can be lost. A failed fetch is
+# queued again, up to FETCH_ATTEMPTS times; a message given up on stays on
+# the SIM. At boot, reconcile() picks up whatever arrived while the phone
+# was off or could not be fetched. Parts of long messages go through
+# sms_concat and reach the store as one message; every expire_interval the
+# module clock (AT+CCLK?) is read so a long message whose other parts never
+# come is still stored, with the gaps marked, once it is MAX_AGE_S old.
+
+from modem import ticks_ms, ticks_diff, ticks_add, RESULT_OK
+from at_parse import find, parse, register
+from modem_async import asyncio
+from message_store import MessageStore
+from sms_concat import ConcatStore, ts_seconds
+from sms import parse_cmgr, list_messages_async, CNMI_COMMAND, STAT_REC_UNREAD
+
+# +CMS ERROR: 321, invalid memory index: the slot is already empty
+CMS_INVALID_INDEX = b"321"
+
+# Tries per announced message, and the wait before each retry
+FETCH_ATTEMPTS = 3
+RETRY_DELAY = 1     # Seconds
+
+# Seconds between checks for long messages with overdue parts
+EXPIRE_INTERVAL = 3600
+
+# The module RTC reads 80/01/06 (or earlier) until the network sets it
+CLOCK_UNSET_YEAR = 70
+
+CMTI_SPEC = "sd"    # "<mem>",<index>
+register(b"+CMTI:", CMTI_SPEC)
+register(b"+CCLK:", "s")    # "yy/MM/dd,hh:mm:ss±zz"
+
+
+def clock_timestamp(value):
+    """decode_timestamp()-style tuple of a +CCLK time, None if unset or malformed"""
+    try:
+        value = value.decode()
+        fields = [int(value[i:i + 2]) for i in (0, 3, 6, 9, 12, 15)]
+        quarters = int(value[17:])     # Signed, in quarter hours
+    except (ValueError, UnicodeError):
+        return None
+    if fields[0] >= CLOCK_UNSET_YEAR:
+        return None
+    return (2000 + fields[0], fields[1], fields[2], fields[3], fields[4], fields[5], quarters * 15)
+
+
+class InboxSync:
+    def __init__(self, modem, store=None, on_message=None, concat=None, retry_delay=RETRY_DELAY,
+                 expire_interval=EXPIRE_INTERVAL):
+        """
+        Args:
+            modem: AsyncModem to use
+            store: MessageStore receiving new messages
+            on_message: called with each newly stored record
+            concat: ConcatStore joining the parts of long messages
+            retry_delay: seconds to wait before fetching a message again
+            expire_interval: seconds between checks for overdue parts
+        """
+        self.modem = modem
+        self.store = store or MessageStore()
+        self.concat = concat or ConcatStore()
+        self.on_message = on_message
+        self.mem = None         # Storage AT+CMGR/AT+CMGD currently act on
+        self.pending = []       # (mem, index) announced by +CMTI, oldest first
+        self.fetching = None    # pending[0] while it is being fetched
+        self.failures = {}      # (mem, index) -> failed fetches so far
+        self.retry_delay = retry_delay
+        self.given_up = 0       # Messages left on the SIM after FETCH_ATTEMPTS
+        self.expire_interval = expire_interval
+        self.next_expire = None  # ticks_ms of the next check, once started
+        self.sc_time = None     # Newest service centre time seen (ts_seconds)
+        self.sc_ticks = None    # ticks_ms when it was seen
+        self.wakeup = asyncio.Event()
+        self.task = None
+        modem.on_urc("+CMTI:", self._on_cmti)
+
+    async def enable(self):
+        """PDU mode, and +CMTI for every message stored on arrival"""
+        result, _ = await self.modem.command("AT+CMGF=0")
+        if result == RESULT_OK:
+            result, _ = await self.modem.command(CNMI_COMMAND)
+        return result == RESULT_OK
+
+    def start(self):
+        """Start fetching messages as they are announced"""
+        if self.task is None:
+            self.next_expire = ticks_add(ticks_ms(), int(self.expire_interval * 1000))
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def _on_cmti(self, line):
+        fields = parse(line, CMTI_SPEC)
+        if fields is None:
+            return
+        entry = (fields[0].decode(), fields[1])
+        # Once AT+CMGD frees the slot being fetched, the next message stored
+        # there is announced with the same index: queue it again
+        queued = self.pending[1:] if self.fetching else self.pending
+        if entry not in queued:
+            self.pending.append(entry)
+            self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            wait = ticks_diff(self.next_expire, ticks_ms())
+            if wait <= 0:
+                self.next_expire = ticks_add(ticks_ms(), int(self.expire_interval * 1000))
+                try:
+                    await self.expire()
+                except Exception as e:
+                    print(f"Inbox sync expiry error: {e}")
+                continue
+            if not self.pending:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), wait / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            entry = self.pending[0]
+            if entry in self.failures:
+                await asyncio.sleep(self.retry_delay)
+            mem, index = self.fetching = entry
+            done = False
+            try:
+                done = await self.fetch(index, mem)
+            except Exception as e:
+                print(f"Inbox sync error for {mem} {index}: {e}")
+            self.fetching = None
+            self.pending.pop(0)
+            if done:
+                self.failures.pop(entry, None)
+            else:
+                self._retry(entry)
+
+    def _retry(self, entry):
+        # Behind the messages announced since, so one bad slot holds none up
+        failures = self.failures.get(entry, 0) + 1
+        if failures >= FETCH_ATTEMPTS:
+            self.failures.pop(entry, None)
+            self.given_up += 1
+            print(f"Inbox sync gave up on {entry[0]} {entry[1]}")
+            return
+        self.failures[entry] = failures
+        if entry not in self.pending:
+            self.pending.append(entry)
+
+    async def _select(self, mem):
+        if mem and mem != self.mem:
+            result, _ = await self.modem.command(f'AT+CPMS="{mem}"')
+            if result == RESULT_OK:
+                self.mem = mem
+
+    def _commit(self, record):
+        # Parts of a long message wait on flash until the set is complete
+        now = ts_seconds(record.get('timestamp'))
+        if now is not None and (self.sc_time is None or now > self.sc_time):
+            self.sc_time = now
+            self.sc_ticks = ticks_ms()
+        self._deliver(self.concat.add(record))
+
+    def _deliver(self, messages):
+        for message in messages:
+            if self.store.append(message) and self.on_message:
+                self.on_message(message)
+
+    async def now(self):
+        """
+        Current time in seconds since 2000 (UTC), or None if unknown
+
+        The module clock once the network has set it, else the newest
+        service centre time seen plus the time since it was seen.
+        """
+        result, lines = await self.modem.command("AT+CCLK?")
+        if result == RESULT_OK:
+            fields = find(lines, b"+CCLK:")
+            if fields:
+                now = ts_seconds(clock_timestamp(fields[0]))
+                if now is not None:
+                    return now
+        if self.sc_time is None:
+            return None
+        return self.sc_time + ticks_diff(ticks_ms(), self.sc_ticks) // 1000
+
+    async def expire(self):
+        """Store long messages whose missing parts are overdue; returns how many"""
+        messages = self.concat.expire(await self.now())
+        self._deliver(messages)
+        return len(messages)
+
+    async def fetch(self, index, mem=None):
+        """
+        Fetch, store and delete one message
+
+        Returns True once done with the slot (freed, or holding something
+        that is not a received message), False if it should be tried again.
+        """
+        await self._select(mem)
+        request = await self.modem.request(f"AT+CMGR={index}", 5)
+        if request.result != RESULT_OK:
+            return request.final is not None and request.final.endswith(CMS_INVALID_INDEX)
+        record = parse_cmgr(request.lines, index)
+        if record is None:
+            return True
+        if record['text'] is None:
+            return True     # Not a received message: leave it on the SIM
+        self._commit(record)
+        return await self.delete(index)
+
+    async def delete(self, index):
+        result, _ = await self.modem.command(f"AT+CMGD={index}", 5)
+        return result == RESULT_OK
+
+    async def reconcile(self):
+        """
+        Cold-start sync of messages that arrived while nothing was listening
+
+        Each unread message is committed to flash as the listing streams
+        in; the SIM copies are deleted once the listing has finished.
+        Returns the number of messages taken off the SIM.
+        """
+        indexes = []
+
+        def on_record(record):
+            if record['text'] is not None:
+                self._commit(record)
+                indexes.append(record['index'])
+
+        await list_messages_async(self.modem, on_record, STAT_REC_UNREAD)
+        deleted = 0
+        for index in indexes:
+            if await self.delete(index):
+                deleted += 1
+        return deleted
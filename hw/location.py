@@ -0,0 +1,175 @@
+# Location manager: cached positions and hot/warm GNSS starts
+#
+# The last fix is kept on the W25Q128 together with its UTC time. A
+# position younger than the TTL is served from the cache without powering
+# the receiver. Otherwise the receiver is started as warm as the age of the
+# last fix allows: ephemeris is good for a couple of hours (AT+CGPSHOT),
+# almanac and rough position for days (AT+CGPSWARM). Time to first fix is
+# recorded per start mode.
+
+import json
+import time
+from modem import ticks_ms, ticks_diff, sleep_ms
+from storage import FLASH_ROOT, write_file_atomic
+from gnss import GnssService, Fix
+
+LOCATION_FILE = FLASH_ROOT + "/location.json"
+
+DEFAULT_TTL = 60            # Seconds a cached position is served for
+HOT_MAX_AGE = 2 * 3600      # Ephemeris still valid
+WARM_MAX_AGE = 7 * 86400    # Almanac and approximate position still useful
+TTFF_SAMPLES = 20           # Time-to-first-fix samples kept per mode
+
+FIX_FIELDS = ("lat", "lon", "alt", "speed", "course", "year", "month", "day", "time_ms")
+
+
+def fix_epoch(fix):
+    """UTC seconds of a fix, in the same epoch as time.time()"""
+    seconds = fix.time_ms // 1000
+    return time.mktime((fix.year, fix.month, fix.day, seconds // 3600,
+                        seconds // 60 % 60, seconds % 60, 0, 0, 0))
+
+
+class LocationManager:
+    def __init__(self, modem, gnss=None, path=LOCATION_FILE, ttl=DEFAULT_TTL, clock=time.time):
+        """
+        Args:
+            modem: Modem or AsyncModem
+            gnss: GnssService to share; one is created when omitted
+            path: JSON file holding the last fix and TTFF samples
+            ttl: seconds a cached position is served without the receiver
+            clock: UTC seconds; only trusted when it is later than the
+                   stored fix (the Pico RTC restarts on reset)
+        """
+        self.gnss = gnss or GnssService(modem)
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self.fix = Fix()
+        self.fix_ticks = None       # ticks_ms of the last fix seen this boot
+        self.session = None         # (mode, ticks_ms) of the running session
+        self.session_fixed = False
+        self.data = {"fix": None, "time": None, "ttff": {}}
+        try:
+            with open(path) as f:
+                self.data.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        if self.data["fix"]:
+            for name in FIX_FIELDS:
+                setattr(self.fix, name, self.data["fix"][name])
+            self.fix.valid = True
+        self.gnss.subscribe(self._on_fix)
+
+    def save(self):
+        if self.fix.valid:
+            self.data["fix"] = {name: getattr(self.fix, name) for name in FIX_FIELDS}
+            self.data["time"] = fix_epoch(self.fix)
+        write_file_atomic(self.path, json.dumps(self.data).encode())
+
+    def _on_fix(self, fix):
+        fix.copy_to(self.fix)
+        self.fix_ticks = ticks_ms()
+        if self.session and not self.session_fixed:
+            self.session_fixed = True
+            mode, started = self.session
+            samples = self.data["ttff"].setdefault(mode, [])
+            samples.append(ticks_diff(self.fix_ticks, started))
+            del samples[:-TTFF_SAMPLES]
+            self.save()     # First fix of the session survives a reset
+
+    def age(self):
+        """Seconds since the last fix, or None if unknown"""
+        if self.fix_ticks is not None:
+            return ticks_diff(ticks_ms(), self.fix_ticks) // 1000
+        if self.data["time"] is None:
+            return None
+        age = self.clock() - self.data["time"]
+        return age if age >= 0 else None
+
+    def cached(self, max_age=None):
+        """The last fix if younger than max_age (default: the TTL), else None"""
+        age = self.age()
+        limit = self.ttl if max_age is None else max_age
+        if self.fix.valid and age is not None and age <= limit:
+            return self.fix
+        return None
+
+    def start_mode(self):
+        """"hot", "warm" or "cold", from the age of the last fix"""
+        age = self.age()
+        if age is None:
+            # A stored fix with an unsynced clock: assume only the almanac
+            return "warm" if self.data["fix"] else "cold"
+        if age <= HOT_MAX_AGE:
+            return "hot"
+        if age <= WARM_MAX_AGE:
+            return "warm"
+        return "cold"
+
+    def _begin(self):
+        self.session = (self.start_mode(), ticks_ms())
+        self.session_fixed = False
+        return self.session[0]
+
+    def _end(self):
+        self.session = None
+        if self.session_fixed:
+            self.save()     # Keep the newest fix for the next start
+
+    def locate(self, timeout=120, max_age=None, keep_on=False):
+        """
+        Return a fix no older than max_age, powering the receiver if needed
+
+        Works with a blocking Modem. The receiver is switched off again
+        after the first fix unless keep_on. Returns None on timeout.
+        """
+        fix = self.cached(max_age)
+        if fix:
+            return fix
+        mode = self._begin()
+        if not self.gnss.start(mode=mode):
+            self.session = None
+            return None
+        start = ticks_ms()
+        while not self.session_fixed and ticks_diff(ticks_ms(), start) < timeout * 1000:
+            self.gnss.modem.poll()
+            sleep_ms(20)
+        if not keep_on:
+            self.stop()
+        return self.fix if self.session_fixed else None
+
+    def stop(self):
+        """Switch the receiver off, keeping the last fix on flash"""
+        self.gnss.stop()
+        self._end()
+
+    async def locate_async(self, timeout=120, max_age=None, keep_on=False):
+        """locate() for the asyncio engine"""
+        from modem_async import asyncio
+        fix = self.cached(max_age)
+        if fix:
+            return fix
+        mode = self._begin()
+        if not await self.gnss.start_async(mode=mode):
+            self.session = None
+            return None
+        start = ticks_ms()
+        while not self.session_fixed and ticks_diff(ticks_ms(), start) < timeout * 1000:
+            await asyncio.sleep(0.05)
+        if not keep_on:
+            await self.stop_async()
+        return self.fix if self.session_fixed else None
+
+    async def stop_async(self):
+        await self.gnss.stop_async()
+        self._end()
+
+    def ttff_stats(self):
+        """{mode: (samples, min_ms, mean_ms, max_ms)} over the kept samples"""
+        stats = {}
+        for mode, samples in self.data["ttff"].items():
+            if samples:
+                stats[mode] = (len(samples), min(samples),
+                               sum(samples) // len(samples), max(samples))
+        return stats
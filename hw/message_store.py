@@ -0,0 +1,81 @@
+# Received message store on the W25Q128
+#
+# Messages are appended as JSON lines to a file on the LittleFS partition
+# and the file is closed (committed) before the SIM copy is deleted. A
+# power cut in between can only lead to the same message being fetched
+# again, which the store recognises by its key and skips.
+
+import json
+from storage import FLASH_ROOT
+
+INBOX_FILE = FLASH_ROOT + "/inbox.jsonl"
+
+# Duplicates can only come from the last few fetches, so only the keys of
+# the newest messages are remembered
+RECENT_KEYS = 32
+
+
+def message_key(record):
+    """Identity of a received message: sender, SC timestamp and part"""
+    concat = record.get('concat')
+    part = f"{concat[0]}/{concat[2]}" if concat else ""
+    return f"{record.get('sender')}|{record.get('timestamp')}|{part}"
+
+
+class MessageStore:
+    def __init__(self, path=INBOX_FILE):
+        """
+        Args:
+            path: JSON-lines file, one message per line
+        """
+        self.path = path
+        self.recent = None  # Keys of the newest messages, loaded on first append
+        self.count = 0
+
+    def _load_recent(self):
+        self.recent = []
+        self.count = 0
+        for entry in self.messages():
+            self.recent.append(entry.get('key'))
+            if len(self.recent) > RECENT_KEYS:
+                self.recent.pop(0)
+            self.count += 1
+
+    def append(self, record):
+        """Store a received SMS record, returning False if it is already stored"""
+        if self.recent is None:
+            self._load_recent()
+        key = message_key(record)
+        if key in self.recent:
+            return False
+        entry = {
+            'key': key,
+            'sender': record.get('sender'),
+            'timestamp': record.get('timestamp'),
+            'text': record.get('text'),
+            'concat': record.get('concat'),
+            'parts': record.get('parts'),         # Reassembled long message
+            'missing': record.get('missing'),
+            'read': False,
+        }
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry))
+            f.write("\n")
+        self.recent.append(key)
+        if len(self.recent) > RECENT_KEYS:
+            self.recent.pop(0)
+        self.count += 1
+        return True
+
+    def messages(self):
+        """Yield stored messages oldest first, one line in RAM at a time"""
+        try:
+            f = open(self.path)
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    pass    # Line cut short by a power loss
@@ -0,0 +1,407 @@
+# SIM7600G AT command transport
+#
+# Shared by every modem test and service. Reads are terminator-aware: the
+# reader scans incoming lines for a final result code and returns as soon as
+# the modem has finished, so `timeout` is only an upper bound.
+
+try:
+    from time import ticks_ms, ticks_us, ticks_diff, ticks_add, sleep_ms
+except ImportError:
+    # CPython host (benchmarks, replay, emulator): emulate the ticks API
+    import time as _time
+
+    def ticks_ms():
+        return int(_time.monotonic() * 1000)
+
+    def ticks_us():
+        return int(_time.monotonic() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def ticks_add(a, b):
+        return a + b
+
+    def sleep_ms(ms):
+        _time.sleep(ms / 1000)
+
+from ringbuf import RingBuffer
+from at_stats import STATS
+
+# Lines that end a command response
+FINAL_OK = (b"OK",)
+FINAL_ERROR = (b"ERROR",)
+FINAL_ERROR_PREFIXES = (b"+CME ERROR:", b"+CMS ERROR:")
+# Call results: final for ATD/ATA, unsolicited at any other time
+FINAL_CALL = (b"NO CARRIER", b"BUSY", b"NO ANSWER", b"NO DIALTONE")
+CALL_VERBS = (b"D", b"A")
+
+# Unsolicited result codes the SIM7600G can send at any time
+URC_PREFIXES = (
+    b"RING", b"+CLIP:", b"+CLCC:", b"VOICE CALL:", b"MISSED_CALL:",
+    b"NO CARRIER", b"BUSY", b"NO ANSWER",
+    b"+CMTI:", b"+CMT:", b"+CDS:", b"+CDSI:",
+    b"+CREG:", b"+CEREG:", b"+CGREG:", b"+CPIN:", b"+SIMCARD:",
+    b"RDY", b"PB DONE", b"SMS DONE", b"+CGPSINFO:", b"+CSQ:",
+)
+# URCs whose payload follows on a second line (PDU mode +CMT/+CDS)
+TWO_LINE_URCS = (b"+CMT:", b"+CDS:")
+
+# Result of a finished read
+RESULT_OK = "OK"
+RESULT_ERROR = "ERROR"
+RESULT_PROMPT = ">"
+RESULT_TIMEOUT = "TIMEOUT"
+
+CTRL_Z = b"\x1a"
+
+
+def open_uart(baudrate=115200):
+    """Open UART0 on GP0/GP1, wired to the SIM7600G"""
+    from machine import UART, Pin
+    # A larger driver buffer covers bursts between RX IRQs
+    return UART(0, baudrate=baudrate, tx=Pin(0), rx=Pin(1), rxbuf=1024)
+
+
+def command_verbs(command):
+    """
+    Response prefixes owned by an AT command line
+
+    "AT+CREG?" -> (b"+CREG",), "ATD123;" -> (b"D",),
+    "AT+CPIN?;+CSQ" -> (b"+CPIN", b"+CSQ")
+    """
+    if isinstance(command, str):
+        command = command.encode()
+    verbs = []
+    for part in command.strip()[2:].split(b";"):
+        part = part.strip()
+        if not part:
+            continue
+        if part[:1] in (b"+", b"&", b"$"):
+            end = len(part)
+            for i in range(1, len(part)):
+                if part[i] in b"=?":
+                    end = i
+                    break
+            verbs.append(part[:end].upper())
+        else:
+            verbs.append(part[:1].upper())
+    return tuple(verbs)
+
+
+def startswith(line, prefix):
+    """bytes.startswith that also works on memoryview lines"""
+    n = len(prefix)
+    return len(line) >= n and line[:n] == prefix
+
+
+def contains(line, value):
+    """True if the byte value occurs in line; `in` fails on a memoryview"""
+    for c in line:
+        if c == value:
+            return True
+    return False
+
+
+def final_result(line, verbs=CALL_VERBS):
+    """Classify a response line: RESULT_OK, RESULT_ERROR or None if not final"""
+    for word in FINAL_OK:
+        if line == word:
+            return RESULT_OK
+    for word in FINAL_ERROR:
+        if line == word:
+            return RESULT_ERROR
+    for prefix in FINAL_ERROR_PREFIXES:
+        if startswith(line, prefix):
+            return RESULT_ERROR
+    for word in FINAL_CALL:
+        if line == word:
+            for verb in CALL_VERBS:
+                if verb in verbs:
+                    return RESULT_ERROR
+    return None
+
+
+def _field(line, start, end):
+    # Trim whitespace and one pair of quotes without copying the line
+    while start < end and line[start] <= 0x20:
+        start += 1
+    while end > start and line[end - 1] <= 0x20:
+        end -= 1
+    if end - start >= 2 and line[start] == 0x22 and line[end - 1] == 0x22:
+        start += 1
+        end -= 1
+    return bytes(line[start:end])
+
+
+def split_fields(line):
+    """
+    Split the parameters of a "+XXX: a,"b,c",d" line, honouring quotes
+
+    Works on bytes or memoryview lines. Returns a list of bytes with
+    surrounding quotes removed; empty fields are b"".
+    """
+    n = len(line)
+    start = 0
+    for i in range(n):
+        c = line[i]
+        if c == 0x3A:  # ':' ends the "+XXX" prefix
+            start = i + 1
+            break
+        if c == 0x22 or c == 0x2C:  # No prefix before the first field
+            break
+    fields = []
+    quoted = False
+    for i in range(start, n):
+        c = line[i]
+        if c == 0x22:  # '"'
+            quoted = not quoted
+        elif c == 0x2C and not quoted:  # ','
+            fields.append(_field(line, start, i))
+            start = i + 1
+    fields.append(_field(line, start, n))
+    return fields
+
+
+class UrcDispatcher:
+    def __init__(self):
+        """Routes unsolicited result codes to registered handlers"""
+        self.handlers = {}
+        self.prefixes = list(URC_PREFIXES)
+        self.held = None    # First line of a two-line URC
+
+    def on_urc(self, prefix, handler, raw=False):
+        """
+        Call handler(line) for every URC line starting with prefix
+
+        Handlers get the line as bytes. With raw=True they get the receive
+        buffer memoryview instead, which is only valid during the call.
+        """
+        if isinstance(prefix, str):
+            prefix = prefix.encode()
+        self.handlers.setdefault(prefix, []).append((handler, raw))
+        if prefix not in self.prefixes:
+            self.prefixes.append(prefix)
+
+    def remove(self, prefix, handler):
+        """Unregister a handler added with on_urc"""
+        if isinstance(prefix, str):
+            prefix = prefix.encode()
+        handlers = self.handlers.get(prefix, [])
+        for entry in handlers:
+            if entry[0] == handler:
+                handlers.remove(entry)
+                break
+
+    def match(self, line, verbs=()):
+        """Return the URC prefix of line, or None if it is not a URC"""
+        for prefix in self.prefixes:
+            if startswith(line, prefix):
+                # "+CREG: 0,1" answers AT+CREG?; "NO CARRIER" answers ATD
+                if prefix[-1] == 0x3A:  # ':'
+                    if prefix[:-1] in verbs:
+                        return None
+                elif prefix in FINAL_CALL and final_result(line, verbs):
+                    return None
+                return prefix
+        return None
+
+    def dispatch(self, line, verbs=()):
+        """
+        Deliver line to its handlers if it is a URC
+
+        Returns True when the line was consumed and must not be treated as
+        part of a command response.
+        """
+        if self.held is not None:
+            prefix, header = self.held
+            self.held = None
+            line = header + b"\r\n" + bytes(line)
+        else:
+            prefix = self.match(line, verbs)
+            if prefix is None:
+                return False
+            # Text mode +CDS fits on one line; PDU mode carries only a length
+            if prefix in TWO_LINE_URCS and (prefix == b"+CMT:" or not contains(line, 0x2C)):
+                self.held = (prefix, bytes(line))
+                return True
+
+        data = None
+        for handler, raw in self.handlers.get(prefix, ()):
+            try:
+                if raw:
+                    handler(line)
+                else:
+                    if data is None:
+                        data = bytes(line)
+                    handler(data)
+            except Exception as e:
+                print(f"URC handler error for {prefix}: {e}")
+        return True
+
+
+class LineReader:
+    def __init__(self, uart, rx_size=4096, stats=None):
+        """Receives UART bytes into a RingBuffer and splits them into lines"""
+        self.uart = uart
+        self.ring = RingBuffer(rx_size)
+        self.stats = stats or STATS
+        self.timing = None      # [verb, write_us, first_byte_us] of the running command
+
+    def _begin_timing(self, command):
+        verbs = command_verbs(command)
+        verb = ";".join(v.decode() for v in verbs) if verbs else "AT"
+        self.timing = [verb, ticks_us(), None]
+
+    def _first_byte(self):
+        timing = self.timing
+        if timing and timing[2] is None:
+            timing[2] = ticks_diff(ticks_us(), timing[1])
+
+    def _end_timing(self, result):
+        timing = self.timing
+        if timing:
+            self.timing = None
+            self.stats.record(timing[0], timing[2], ticks_diff(ticks_us(), timing[1]), result)
+
+    def fill(self):
+        """Move waiting UART bytes into the ring, return the count"""
+        return self.ring.fill_from(self.uart)
+
+    def next_line(self):
+        """
+        Pop the next complete line, or None
+
+        The line is a stripped memoryview into the ring buffer, valid until
+        the next call; copy it with bytes() to keep it.
+        """
+        return self.ring.readline()
+
+    def take_prompt(self):
+        """Consume the SMS '>' prompt if it is all that is buffered"""
+        return self.ring.take_prompt()
+
+
+class Modem(LineReader):
+    def __init__(self, uart, verbose=True, urc=None, rx_size=4096, stats=None):
+        """
+        AT command transport over a UART (or anything with the same API)
+
+        Args:
+            uart: machine.UART or a compatible fake
+            verbose: print commands and responses like the original test scripts
+            urc: UrcDispatcher to share with other modem services
+            rx_size: receive ring buffer size in bytes
+            stats: ModemStats receiving command latencies (shared by default)
+        """
+        super().__init__(uart, rx_size, stats)
+        self.verbose = verbose
+        self.urc = urc or UrcDispatcher()
+        self.last_result = None
+        self.last_response = b""
+        self.before_command = None  # Called before each command, returns ms to wait
+
+    def on_urc(self, prefix, handler, raw=False):
+        """Register a URC handler (see UrcDispatcher.on_urc)"""
+        self.urc.on_urc(prefix, handler, raw)
+
+    def write(self, data):
+        """Write raw bytes or str to the modem"""
+        self.uart.write(data)
+
+    def _send(self, command):
+        if self.before_command:
+            sleep_ms(self.before_command())
+        self._begin_timing(command)
+        self.write(command + "\r\n")
+
+    def poll(self):
+        """Dispatch any URCs waiting on the UART without blocking"""
+        self.fill()
+        line = self.next_line()
+        while line is not None:
+            if line:
+                self.urc.dispatch(line)
+            line = self.next_line()
+
+    def read_lines(self, timeout=5, verbs=CALL_VERBS):
+        """
+        Yield response lines until a final result code or the '>' prompt
+
+        Lines are memoryviews into the receive ring, valid only until the
+        next line is requested. URCs received meanwhile are dispatched, not
+        yielded. The outcome is left in last_result (RESULT_OK, RESULT_ERROR,
+        RESULT_PROMPT or RESULT_TIMEOUT); the final line itself is yielded.
+        """
+        self.last_result = RESULT_TIMEOUT
+        deadline = ticks_add(ticks_ms(), int(timeout * 1000))
+
+        while ticks_diff(deadline, ticks_ms()) > 0:
+            line = self.next_line()
+            if line is None:
+                if self.take_prompt():
+                    # Timing goes on through the payload (AT+CMGS)
+                    self.last_result = RESULT_PROMPT
+                    return
+                if self.fill():
+                    self._first_byte()
+                else:
+                    sleep_ms(1)
+                continue
+            if not line or self.urc.dispatch(line, verbs):
+                continue
+            result = final_result(line, verbs)
+            if result:
+                self._end_timing(result)
+            yield line
+            if result:
+                self.last_result = result
+                return
+        self._end_timing(RESULT_TIMEOUT)
+
+    def command_lines(self, command, timeout=5):
+        """Send an AT command and yield its response lines (see read_lines)"""
+        self._send(command)
+        return self.read_lines(timeout, command_verbs(command))
+
+    def read_response(self, timeout=5, verbs=CALL_VERBS):
+        """
+        Read until a final result code or the '>' prompt arrives
+
+        URC lines received meanwhile are dispatched, not returned. Returns
+        (result, raw_bytes) where result is one of RESULT_OK, RESULT_ERROR,
+        RESULT_PROMPT or RESULT_TIMEOUT.
+        """
+        lines = [bytes(line) for line in self.read_lines(timeout, verbs)]
+        if self.last_result == RESULT_PROMPT:
+            lines.append(b"> ")
+        self.last_response = b"\r\n".join(lines)
+        return self.last_result, self.last_response
+
+    def command(self, command, timeout=5):
+        """Send an AT command, returning (result, raw_bytes)"""
+        self._send(command)
+        return self.read_response(timeout, command_verbs(command))
+
+    def send_at_command(self, command, timeout=5):
+        """Send an AT command and return the response decoded to str"""
+        if self.verbose:
+            print(f"Sending: {command}")
+
+        result, raw = self.command(command, timeout)
+
+        response_str = ""
+        if raw:
+            try:
+                response_str = raw.decode("utf-8")
+                if self.verbose:
+                    print(f"Response: {response_str.strip()}")
+            except UnicodeError:
+                # Handle decode errors by converting to string representation
+                response_str = str(raw)
+                if self.verbose:
+                    print(f"Response (raw): {response_str}")
+        elif self.verbose:
+            print(f"No response from module for command '{command}' after {timeout}s")
+
+        return response_str
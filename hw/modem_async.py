@@ -0,0 +1,182 @@
+# uasyncio AT command engine for the SIM7600G
+#
+# Owns UART(0): the RX IRQ fills a ring buffer, one reader task splits it
+# into lines and one worker task sends queued commands strictly one at a
+# time. URC lines are routed to registered handlers even while a command
+# is in flight, so call, SMS and GPS code can wait on events instead of
+# polling the modem.
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from modem import (LineReader, UrcDispatcher, command_verbs, final_result, open_uart,
+                   CTRL_Z, RESULT_PROMPT, RESULT_TIMEOUT)
+
+
+class ATRequest:
+    def __init__(self, command, timeout, payload, on_line=None):
+        """A queued AT command and, once finished, its response"""
+        self.command = command
+        self.echo = command.encode().strip()
+        self.verbs = command_verbs(command)
+        self.timeout = timeout
+        self.payload = payload      # Sent after the '>' prompt, then Ctrl+Z
+        self.on_line = on_line      # Streams response lines instead of collecting them
+        self.lines = []             # Response lines, without echo and final code
+        self.final = None           # The final result line, e.g. b"+CMS ERROR: 500"
+        self.result = None
+        self.done = asyncio.Event()
+
+    def finish(self, result, final=None):
+        if self.result is None:
+            self.result = result
+            self.final = final
+            self.done.set()
+
+
+class AsyncModem(LineReader):
+    def __init__(self, uart=None, urc=None, poll_ms=2, rx_size=4096, stats=None):
+        """
+        Args:
+            uart: UART to own; UART(0) on GP0/GP1 when omitted
+            urc: UrcDispatcher shared with other modem services
+            poll_ms: idle poll interval when the UART has no RX IRQ
+            rx_size: receive ring buffer size in bytes
+            stats: ModemStats receiving command latencies (shared by default)
+        """
+        if uart is None:
+            uart = open_uart()
+        super().__init__(uart, rx_size, stats)
+        self.rx_flag = None
+        if hasattr(asyncio, "ThreadSafeFlag"):
+            flag = asyncio.ThreadSafeFlag()
+            if self.ring.attach_irq(uart, flag.set):
+                self.rx_flag = flag
+        self.urc = urc or UrcDispatcher()
+        self.poll_ms = poll_ms
+        self.queue = []
+        self.current = None
+        self.wakeup = asyncio.Event()
+        self.tasks = []
+        self.before_command = None  # Called before each command, returns ms to wait
+
+    def on_urc(self, prefix, handler, raw=False):
+        """Register a URC handler (see UrcDispatcher.on_urc)"""
+        self.urc.on_urc(prefix, handler, raw)
+
+    def start(self):
+        """Start the reader and worker tasks"""
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._reader()),
+                          asyncio.create_task(self._worker())]
+
+    def stop(self):
+        """Cancel the engine tasks and fail any queued commands"""
+        self.ring.detach_irq()
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        if self.current:
+            self.current.finish(RESULT_TIMEOUT)
+            self.current = None
+        for request in self.queue:
+            request.finish(RESULT_TIMEOUT)
+        self.queue = []
+
+    async def command(self, command, timeout=5, payload=None):
+        """
+        Queue an AT command and wait for its final result code
+
+        Returns (result, lines) where lines are the response lines as bytes.
+        Use request() instead to get the final line (e.g. +CMS ERROR codes).
+        """
+        request = await self.request(command, timeout, payload)
+        return request.result, request.lines
+
+    async def request(self, command, timeout=5, payload=None, on_line=None):
+        """
+        Queue an AT command and return its finished ATRequest
+
+        With on_line, each response line is passed to on_line(line) as it
+        arrives (a memoryview, valid only during the call) instead of being
+        collected in request.lines.
+        """
+        request = ATRequest(command, timeout, payload, on_line)
+        self.queue.append(request)
+        self.wakeup.set()
+        await request.done.wait()
+        return request
+
+    async def _worker(self):
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            request = self.queue.pop(0)
+            self.current = request
+            if self.before_command:
+                delay = self.before_command()
+                if delay:
+                    await asyncio.sleep(delay / 1000)
+            self._begin_timing(request.command)
+            self.uart.write(request.command + "\r\n")
+            try:
+                await asyncio.wait_for(request.done.wait(), request.timeout)
+            except asyncio.TimeoutError:
+                request.finish(RESULT_TIMEOUT)
+                self._end_timing(RESULT_TIMEOUT)
+            self.current = None
+
+    async def _wait_rx(self):
+        if self.fill():
+            return
+        if self.rx_flag:
+            await self.rx_flag.wait()
+            self.fill()     # Bytes left in the UART by an IRQ during fill()
+            return
+        while not self.fill():
+            await asyncio.sleep(self.poll_ms / 1000)
+
+    async def _reader(self):
+        while True:
+            await self._wait_rx()
+            self._first_byte()
+
+            line = self.next_line()
+            while line is not None:
+                if line:
+                    self._on_line(line)
+                line = self.next_line()
+
+            request = self.current
+            if request and self.take_prompt():
+                if request.payload is None:
+                    request.finish(RESULT_PROMPT)
+                    self._end_timing(RESULT_PROMPT)
+                else:
+                    self.uart.write(request.payload)
+                    self.uart.write(CTRL_Z)
+                    request.payload = None
+
+    def _on_line(self, line):
+        request = self.current
+        verbs = request.verbs if request else ()
+        if self.urc.dispatch(line, verbs) or request is None:
+            return
+        if line == request.echo:
+            return
+        result = final_result(line, verbs)
+        if result:
+            request.finish(result, bytes(line))
+            self._end_timing(result)
+        elif request.on_line:
+            try:
+                request.on_line(line)
+            except Exception as e:
+                print(f"Line handler error for {request.command}: {e}")
+        else:
+            request.lines.append(bytes(line))
@@ -0,0 +1,173 @@
+# SIM7600G UART link manager
+#
+# The module boots at 115200 baud (~11 KB/s). For bulk transfers (SMS
+# listings, phonebook reads, NMEA streams) the link is switched to a higher
+# rate with AT+IPR, which the module forgets on power-off, and optionally to
+# RTS/CTS hardware flow control with AT+IFC. Without flow control a long
+# reply overruns the Pico's 32-byte RX FIFO whenever the interpreter is busy
+# for longer than the FIFO takes to fill, so rates above max_baudrate are
+# only tried with RTS/CTS on. Every switch is verified with a long reply and
+# falls back to a lower rate if the link does not come back clean.
+
+from modem import ticks_ms, ticks_diff, sleep_ms, RESULT_OK
+
+DEFAULT_BAUDRATE = 115200
+BAUD_RATES = (921600, 460800, 230400, 115200)
+# Fastest rate trusted without RTS/CTS
+MAX_BAUDRATE_NO_FLOW = 115200
+
+# Lists every supported command: several KB of output, independent of the
+# SIM contents, for verifying a switch and for a throughput test
+THROUGHPUT_COMMAND = "AT+CLAC"
+VERIFY_COMMAND = THROUGHPUT_COMMAND
+
+
+class ModemLink:
+    def __init__(self, modem, tx=0, rx=1, cts=None, rts=None, max_baudrate=MAX_BAUDRATE_NO_FLOW):
+        """
+        Args:
+            modem: Modem whose UART is reconfigured
+            tx, rx: UART0 pin numbers (GP0/GP1)
+            cts, rts: flow control pin numbers if wired, else None
+            max_baudrate: fastest rate the wiring carries without flow control
+        """
+        self.modem = modem
+        self.tx = tx
+        self.rx = rx
+        self.cts = cts
+        self.rts = rts
+        self.max_baudrate = max_baudrate
+        self.baudrate = DEFAULT_BAUDRATE
+        self.flow = False
+        self.throughput = None  # Bytes per second from the last measurement
+
+    def _reopen(self, baudrate, flow=False):
+        """Reconfigure the Pico side of the link"""
+        kwargs = {"baudrate": baudrate}
+        try:
+            from machine import UART, Pin
+            kwargs["tx"] = Pin(self.tx)
+            kwargs["rx"] = Pin(self.rx)
+            if flow:
+                kwargs["flow"] = UART.RTS | UART.CTS
+                kwargs["cts"] = Pin(self.cts)
+                kwargs["rts"] = Pin(self.rts)
+            else:
+                kwargs["flow"] = 0
+        except ImportError:
+            # Host fakes only need the rate
+            kwargs["flow"] = flow
+        self.modem.uart.init(**kwargs)
+        self.modem.ring.clear()
+        self.baudrate = baudrate
+        self.flow = flow
+        sleep_ms(20)  # Let the module see the new line settings
+
+    def verify(self, attempts=3, long=False):
+        """
+        True if AT gets a clean OK at the current settings
+
+        AT alone fits the RX FIFO; with long=True a multi-KB reply must
+        also come back complete and free of overrun garbage.
+        """
+        for _ in range(attempts):
+            result, _ = self.modem.command("AT", 0.3)
+            if result == RESULT_OK:
+                return not long or self._verify_long()
+        return False
+
+    def _verify_long(self):
+        clean = True
+        for line in self.modem.command_lines(VERIFY_COMMAND, 5):
+            for c in line:
+                if c < 0x20 or c > 0x7E:
+                    clean = False
+                    break
+        return clean and self.modem.last_result == RESULT_OK
+
+    def probe(self, rates=BAUD_RATES):
+        """Find the rate the module is currently using, or None"""
+        if self.verify(1):
+            return self.baudrate
+        for rate in rates:
+            self._reopen(rate)
+            if self.verify(2):
+                return rate
+        self._reopen(DEFAULT_BAUDRATE)
+        return None
+
+    def set_baudrate(self, rate):
+        """Switch both ends to rate, falling back to the old rate on errors"""
+        old = self.baudrate
+        if rate == old:
+            return True
+        result, _ = self.modem.command(f"AT+IPR={rate}", 1)
+        if result != RESULT_OK:
+            return False
+        self._reopen(rate, self.flow)
+        if self.verify(long=True):
+            return True
+
+        # Replies are not clean (typically RX overruns without flow control):
+        # commands usually still get through, so ask for the old rate blind
+        self.modem.write(f"AT+IPR={old}\r\n")
+        sleep_ms(50)
+        self._reopen(old, self.flow)
+        if self.verify():
+            return False
+
+        # Find the module again and put it back where it was
+        found = self.probe((old,) + tuple(r for r in BAUD_RATES if r != old))
+        if found is not None and found != old:
+            self.modem.command(f"AT+IPR={old}", 1)
+            self._reopen(old, self.flow)
+        return False
+
+    def enable_flow_control(self):
+        """Turn on RTS/CTS both ways if the pins are wired"""
+        if self.cts is None or self.rts is None:
+            return False
+        result, _ = self.modem.command("AT+IFC=2,2", 1)
+        if result != RESULT_OK:
+            return False
+        self._reopen(self.baudrate, True)
+        if self.verify(long=True):
+            return True
+        self._reopen(self.baudrate, False)
+        self.modem.command("AT+IFC=0,0", 1)
+        return False
+
+    def negotiate(self, rates=BAUD_RATES):
+        """
+        Move the link to the fastest rate that verifies cleanly
+
+        Returns the rate in use. Flow control is enabled first when wired;
+        without it rates above max_baudrate are not tried.
+        """
+        if self.probe() is None:
+            return None
+        self.enable_flow_control()
+        for rate in rates:
+            if not self.flow and rate > self.max_baudrate:
+                continue
+            if rate <= self.baudrate or self.set_baudrate(rate):
+                break
+        return self.baudrate
+
+    def measure_throughput(self, command=THROUGHPUT_COMMAND, timeout=10):
+        """Time a bulk command and return the received bytes per second"""
+        received = 0
+        start = ticks_ms()
+        for line in self.modem.command_lines(command, timeout):
+            received += len(line) + 2
+        elapsed = ticks_diff(ticks_ms(), start)
+        if self.modem.last_result != RESULT_OK or elapsed <= 0:
+            return None
+        self.throughput = received * 1000 // elapsed
+        return self.throughput
+
+    def report(self):
+        """One-line summary of the link settings and measured throughput"""
+        flow = "RTS/CTS" if self.flow else "no flow control"
+        speed = f"{self.throughput} B/s" if self.throughput else "not measured"
+        return f"{self.baudrate} baud, {flow}, {speed}"
@@ -0,0 +1,207 @@
+# SIM7600G power controller
+#
+# GP2 drives the module's PWRKEY input: it idles high and is held low for
+# PULSE_MS, then released, to switch the module on, or for OFF_PULSE_MS to
+# switch it off (power_off() then waits for STATUS to drop). STATUS (GP3)
+# goes high once the module is running. Instead of sleeping a fixed time
+# after the pulse, boot is followed through STATUS and the boot URCs:
+#
+#   RDY        UART is up, AT commands are accepted
+#   PB DONE    phonebook loaded
+#   SMS DONE   SMS storage ready
+#
+# A module that is already on is detected from STATUS plus one AT and is
+# left alone: PWRKEY held low is also how the module is switched off, so
+# it is only pulsed when the module is off. Timings of the last boot are
+# kept in `timings` for benchmarking.
+
+from modem import ticks_ms, ticks_diff, ticks_add, sleep_ms, RESULT_OK
+
+POWER_KEY_PIN = 2
+STATUS_PIN = 3
+
+# PWRKEY low time that switches the module on: the SIM7600 datasheet asks
+# for at least 500 ms; 1 s as the original power-on sequence used
+PULSE_MS = 1000
+# PWRKEY low time that switches it off (datasheet: at least 2.5 s)
+OFF_PULSE_MS = 3000
+# STATUS drops within about 26 s of a power-off pulse
+OFF_TIMEOUT = 30
+# How often to poll for RDY / STATUS during boot
+POLL_MS = 10
+# With STATUS high but no RDY seen after RDY_GRACE_MS (e.g. it was missed
+# during autobaud), probe with AT every PROBE_INTERVAL_MS
+RDY_GRACE_MS = 500
+PROBE_INTERVAL_MS = 250
+
+BOOT_URCS = {
+    "RDY": "rdy",
+    "PB DONE": "pb_done",
+    "SMS DONE": "sms_done",
+}
+
+
+class ModemPower:
+    def __init__(self, modem, power_key=None, status=None, pulse_ms=PULSE_MS,
+                 off_pulse_ms=OFF_PULSE_MS):
+        """
+        Args:
+            modem: Modem or AsyncModem receiving the boot URCs
+            power_key: PWRKEY output Pin; GP2 when omitted
+            status: STATUS input Pin; GP3 when omitted
+            pulse_ms: PWRKEY low time for power-on
+            off_pulse_ms: PWRKEY low time for power-off
+        """
+        if power_key is None or status is None:
+            from machine import Pin
+            power_key = power_key or Pin(POWER_KEY_PIN, Pin.OUT, value=1)
+            status = status or Pin(STATUS_PIN, Pin.IN)
+        self.modem = modem
+        self.power_key = power_key
+        self.status = status
+        self.pulse_ms = pulse_ms
+        self.off_pulse_ms = off_pulse_ms
+        self.start = None
+        self.seen = {}
+        self.timings = {}   # Event name -> ms since power_on() started
+        for urc, name in BOOT_URCS.items():
+            modem.on_urc(urc, lambda line, name=name: self._on_boot_urc(name))
+
+    def _on_boot_urc(self, name):
+        self.seen[name] = True
+        self._mark(name)
+
+    def _mark(self, name):
+        if self.start is not None and name not in self.timings:
+            self.timings[name] = ticks_diff(ticks_ms(), self.start)
+
+    def is_on(self):
+        """True when STATUS reports the module running"""
+        return self.status.value() == 1
+
+    def ready(self):
+        """True once the module accepts AT commands"""
+        return "ready" in self.timings
+
+    def sms_ready(self):
+        return self.seen.get("sms_done", False)
+
+    def _begin(self):
+        self.start = ticks_ms()
+        self.seen = {}
+        self.timings = {}
+
+    def _pulse_start(self):
+        self.power_key.value(0)
+
+    def _pulse_end(self):
+        self.power_key.value(1)
+        self._mark("pulse")
+
+    def _poll(self, next_probe):
+        # One look at STATUS and the URCs: returns (ready, next_probe), with
+        # ready None when it is time to probe with AT
+        if self.is_on() and "status" not in self.timings:
+            self._mark("status")
+            next_probe = ticks_add(ticks_ms(), RDY_GRACE_MS)
+        # Any boot URC means the UART is up, even if RDY itself was missed
+        if self.seen:
+            return True, next_probe
+        if "status" in self.timings and ticks_diff(ticks_ms(), next_probe) >= 0:
+            return None, ticks_add(ticks_ms(), PROBE_INTERVAL_MS)
+        return False, next_probe
+
+    def power_on(self, timeout=30):
+        """
+        Switch the module on (if needed) and wait until it takes commands
+
+        Returns True when ready, False on timeout. Works with a blocking
+        Modem; use power_on_async() with an AsyncModem.
+        """
+        self._begin()
+        if self.is_on():
+            result, _ = self.modem.command("AT", 0.3)
+            if result == RESULT_OK:
+                self._mark("ready")
+                return True
+
+        self._pulse_start()
+        sleep_ms(self.pulse_ms)
+        self._pulse_end()
+
+        next_probe = ticks_ms()
+        while ticks_diff(ticks_ms(), self.start) < timeout * 1000:
+            self.modem.poll()
+            ready, next_probe = self._poll(next_probe)
+            if ready is None:
+                result, _ = self.modem.command("AT", 0.2)
+                ready = result == RESULT_OK
+            if ready:
+                self._mark("ready")
+                return True
+            sleep_ms(POLL_MS)
+        return False
+
+    async def power_on_async(self, timeout=30):
+        """power_on() for the asyncio engine (the AsyncModem must be started)"""
+        from modem_async import asyncio
+        self._begin()
+        if self.is_on():
+            result, _ = await self.modem.command("AT", 0.3)
+            if result == RESULT_OK:
+                self._mark("ready")
+                return True
+
+        self._pulse_start()
+        await asyncio.sleep(self.pulse_ms / 1000)
+        self._pulse_end()
+
+        next_probe = ticks_ms()
+        while ticks_diff(ticks_ms(), self.start) < timeout * 1000:
+            ready, next_probe = self._poll(next_probe)
+            if ready is None:
+                result, _ = await self.modem.command("AT", 0.2)
+                ready = result == RESULT_OK
+            if ready:
+                self._mark("ready")
+                return True
+            await asyncio.sleep(POLL_MS / 1000)
+        return False
+
+    def power_off(self, timeout=OFF_TIMEOUT):
+        """Switch the module off with a long PWRKEY pulse; True once STATUS drops"""
+        if not self.is_on():
+            return True
+        self._pulse_start()
+        sleep_ms(self.off_pulse_ms)
+        self.power_key.value(1)
+        start = ticks_ms()
+        while self.is_on():
+            if ticks_diff(ticks_ms(), start) >= timeout * 1000:
+                return False
+            sleep_ms(POLL_MS)
+        return True
+
+    async def power_off_async(self, timeout=OFF_TIMEOUT):
+        """power_off() for the asyncio engine"""
+        from modem_async import asyncio
+        if not self.is_on():
+            return True
+        self._pulse_start()
+        await asyncio.sleep(self.off_pulse_ms / 1000)
+        self.power_key.value(1)
+        start = ticks_ms()
+        while self.is_on():
+            if ticks_diff(ticks_ms(), start) >= timeout * 1000:
+                return False
+            await asyncio.sleep(POLL_MS / 1000)
+        return True
+
+    def report(self):
+        """One-line summary of the last boot's timings"""
+        if not self.timings:
+            return "not powered on yet"
+        if "pulse" not in self.timings:
+            return f"already on, ready in {self.timings.get('ready')} ms"
+        order = ("pulse", "status", "rdy", "ready", "pb_done", "sms_done")
+        return ", ".join(f"{name} {self.timings[name]} ms" for name in order if name in self.timings)
@@ -0,0 +1,194 @@
+# SIM7600G sleep manager
+#
+# With AT+CSCLK=1 the module drops into slow-clock sleep whenever DTR is
+# high and the UART is quiet, cutting its standby current from tens of mA
+# to a few. DTR is pulled low before each command (through the modem's
+# before_command hook) and released once the modem has been idle for
+# IDLE_MS. While asleep the module still reports calls and SMS: it wakes
+# itself and sends the URC, which the first falling edge on the RX line
+# (or on RI, if wired) announces. The wake IRQ is only armed while the
+# module sleeps, and fires once per wake.
+#
+# lightsleep stops the Pico's peripheral clocks, so the UART misses the
+# start of a URC that wakes it. The Pico therefore only lightsleeps with a
+# wired RI pin, and afterwards on_wake() repeats what the URC may have
+# carried (AT+CLCC, an inbox reconcile...). With the RX-edge wake standby()
+# just waits with the UART running.
+#
+# Time spent in each state, including the module's own wakes, is
+# accumulated in `state_ms` for benchmarking.
+
+from modem import ticks_ms, ticks_diff, sleep_ms, RESULT_OK
+
+DTR_PIN = 27
+WAKE_PIN = 1    # UART0 RX: left in its UART function, only an edge IRQ is added
+
+AWAKE = "awake"
+SLEEP = "sleep"
+
+# Idle time before DTR is released
+IDLE_MS = 2000
+# The UART answers about 20 ms after DTR goes low; keep a margin
+WAKE_MS = 50
+
+
+class ModemSleep:
+    def __init__(self, modem, dtr=None, ri=None, idle_ms=IDLE_MS, wake_ms=WAKE_MS,
+                 on_wake=None, lightsleep=None):
+        """
+        Args:
+            modem: Modem or AsyncModem; its before_command hook is taken over
+            dtr: DTR output Pin; GP27 when omitted
+            ri: wired RI input Pin; the UART RX pin GP1 when omitted
+            idle_ms: idle time before the module may sleep
+            wake_ms: wait after pulling DTR low before sending a command
+            on_wake: called after a module wake ended a lightsleep, to
+                     repeat what the waking URC may have lost
+            lightsleep: machine.lightsleep by default; only used with RI
+        """
+        self.ri_wired = ri is not None
+        if dtr is None or ri is None:
+            from machine import Pin
+            dtr = dtr or Pin(DTR_PIN, Pin.OUT, value=0)
+            ri = ri or Pin(WAKE_PIN)
+        if self.ri_wired and lightsleep is None:
+            try:
+                from machine import lightsleep
+            except ImportError:
+                pass
+        self.lightsleep = lightsleep if self.ri_wired else None
+        self.on_wake = on_wake
+        self.modem = modem
+        self.dtr = dtr
+        self.ri = ri
+        self.idle_ms = idle_ms
+        self.wake_ms = wake_ms
+        self.enabled = False
+        self.state = AWAKE
+        self.since = ticks_ms()
+        self.last_activity = self.since
+        self.state_ms = {AWAKE: 0, SLEEP: 0}
+        self.wakeups = 0        # DTR wakes before a command
+        self.rings = 0          # Wakes by the module (incoming call, SMS, other URCs)
+        self.missed = 0         # Module wakes that ended a lightsleep
+        self.armed = False
+        self.standby_ms = 0     # Time the Pico spent in lightsleep
+        self.task = None
+        modem.before_command = self._before_command
+
+    def _enter(self, state):
+        now = ticks_ms()
+        self.state_ms[self.state] += ticks_diff(now, self.since)
+        self.state = state
+        self.since = now
+
+    def _before_command(self):
+        # Wake the module for the command about to be written. After a wake
+        # by the module DTR is still high: it may be asleep again already
+        self.last_activity = ticks_ms()
+        if not self.dtr.value():
+            return 0
+        self.dtr.value(0)
+        self._arm(False)
+        if self.state == SLEEP:
+            self._enter(AWAKE)
+        self.wakeups += 1
+        return self.wake_ms
+
+    def _arm(self, armed):
+        # The RX line toggles on every byte: listen for the first edge only
+        # while the module sleeps
+        if armed != self.armed:
+            self.ri.irq(handler=self._on_ri if armed else None, trigger=self.ri.IRQ_FALLING)
+            self.armed = armed
+
+    def _on_ri(self, pin):
+        # Soft IRQ: account the module's wake; the URC arrives over the UART
+        # and poll() puts it back to SLEEP once idle
+        self._arm(False)
+        self.rings += 1
+        self.last_activity = ticks_ms()
+        if self.state == SLEEP:
+            self._enter(AWAKE)
+
+    def _busy(self):
+        return getattr(self.modem, "current", None) is not None or getattr(self.modem, "queue", None)
+
+    def enable(self):
+        """Allow slow-clock sleep with AT+CSCLK=1 (Modem)"""
+        result, _ = self.modem.command("AT+CSCLK=1")
+        self.enabled = result == RESULT_OK
+        return self.enabled
+
+    async def enable_async(self):
+        """enable() for the asyncio engine"""
+        result, _ = await self.modem.command("AT+CSCLK=1")
+        self.enabled = result == RESULT_OK
+        return self.enabled
+
+    def poll(self):
+        """Let the module sleep once it has been idle for idle_ms"""
+        if (self.enabled and self.state == AWAKE and not self._busy()
+                and ticks_diff(ticks_ms(), self.last_activity) >= self.idle_ms):
+            self.dtr.value(1)
+            self._enter(SLEEP)
+        if self.state == SLEEP:
+            self._arm(True)
+        return self.state
+
+    def start(self):
+        """Check for idleness in the background (AsyncModem)"""
+        if self.task is None:
+            from modem_async import asyncio
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        from modem_async import asyncio
+        while True:
+            self.poll()
+            await asyncio.sleep(self.idle_ms / 4000)
+
+    def standby(self, max_ms):
+        """
+        Wait until the module wakes the Pico or max_ms pass
+
+        Only waits when the module is asleep too. With a wired RI the Pico
+        lightsleeps, and on_wake() runs if the module ended it. Returns the
+        ms waited.
+        """
+        if self.poll() != SLEEP:
+            return 0
+        rings = self.rings
+        start = ticks_ms()
+        if self.lightsleep:
+            self.lightsleep(max_ms)     # The RI IRQ ends it early
+        else:
+            # The UART keeps running, so the waking URC arrives whole
+            while self.rings == rings and ticks_diff(ticks_ms(), start) < max_ms:
+                sleep_ms(1)
+        slept = ticks_diff(ticks_ms(), start)
+        self.standby_ms += slept
+        if self.lightsleep and self.rings != rings:
+            self.missed += 1
+            if self.on_wake:
+                self.on_wake()
+        return slept
+
+    def totals(self):
+        """{state: ms} including the time spent in the current state"""
+        totals = dict(self.state_ms)
+        totals[self.state] += ticks_diff(ticks_ms(), self.since)
+        return totals
+
+    def report(self):
+        totals = self.totals()
+        total = sum(totals.values()) or 1
+        return (f"awake {totals[AWAKE]} ms, sleep {totals[SLEEP]} ms "
+                f"({100 * totals[SLEEP] // total}%), {self.wakeups} wakeups, "
+                f"{self.rings} module wakes ({self.missed} from lightsleep), "
+                f"Pico standby {self.standby_ms} ms")
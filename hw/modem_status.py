@@ -0,0 +1,135 @@
+# Batched SIM7600G identity and status query
+#
+# The SIM7600G accepts several commands chained on one AT line with ';'.
+# snapshot() sends the ten status queries the comprehensive test used to
+# send one by one, and parses the combined reply into a Status record.
+
+from collections import namedtuple
+from modem import split_fields, startswith, RESULT_OK
+from at_parse import parse
+
+STATUS_QUERIES = ("+CPIN?", "+CIMI", "+CCID", "+CGSN", "+CSQ",
+                  "+CREG?", "+CEREG?", "+COPS?", "+CGATT?", "+CPSI?")
+STATUS_COMMAND = "AT" + ";".join(STATUS_QUERIES)
+
+# Queries that answer with a bare line of digits, in STATUS_QUERIES order
+BARE_FIELDS = {"+CIMI": "imsi", "+CGSN": "imei"}
+
+FIELDS = (
+    "sim",          # +CPIN state, e.g. "READY" or "SIM PIN"
+    "imsi",         # Subscriber identity (str)
+    "iccid",        # SIM serial number (str)
+    "imei",         # Module identity (str)
+    "rssi",         # +CSQ signal 0-31, 99 = unknown
+    "ber",          # +CSQ bit error rate 0-7, 99 = unknown
+    "creg",         # +CREG <stat>: 1 = home, 5 = roaming
+    "cereg",        # +CEREG <stat> (LTE)
+    "operator",     # Operator name from +COPS
+    "act",          # +COPS access technology, 7 = LTE
+    "attached",     # +CGATT packet domain attach
+    "system_mode",  # +CPSI system mode, e.g. "LTE" or "NO SERVICE"
+    "cell",         # Remaining +CPSI fields as str
+)
+Status = namedtuple("Status", FIELDS)
+
+
+# Prefix -> (field spec, value name per field); None fields are skipped
+STATUS_SPECS = (
+    (b"+CPIN:", "s", ("sim",)),
+    (b"+ICCID:", "s", ("iccid",)),
+    (b"+CCID:", "s", ("iccid",)),
+    (b"+CSQ:", "dd", ("rssi", "ber")),
+    (b"+CREG:", "_d", (None, "creg")),
+    (b"+CEREG:", "_d", (None, "cereg")),
+    (b"+COPS:", "d/dsd", (None, None, "operator", "act")),
+    (b"+CGATT:", "d", ("attached",)),
+)
+
+
+def _str(field):
+    return field.decode("utf-8", "ignore")
+
+
+def parse_status_lines(lines, queries=STATUS_QUERIES, values=None):
+    """
+    Parse response lines of (chained) status queries into a values dict
+
+    queries lists the commands that produced the lines, in order, so bare
+    digit lines (IMSI, IMEI) can be told apart.
+    """
+    if values is None:
+        values = dict.fromkeys(FIELDS)
+    bare = [BARE_FIELDS[q] for q in queries if q in BARE_FIELDS]
+
+    for line in lines:
+        if not line or startswith(line, b"AT") or line == b"OK":
+            continue
+        if line[0] != 0x2B:  # '+'
+            if bare and bytes(line).isdigit():
+                values[bare.pop(0)] = _str(bytes(line))
+            continue
+
+        if startswith(line, b"+CPSI:"):
+            # Field count depends on the radio technology
+            fields = split_fields(line)
+            values["system_mode"] = _str(fields[0])
+            values["cell"] = [_str(f) for f in fields[1:]]
+            continue
+        for prefix, spec, names in STATUS_SPECS:
+            if startswith(line, prefix):
+                fields = parse(line, spec)
+                if fields is not None:
+                    for name, value in zip(names, fields):
+                        if name is None or value is None:
+                            continue
+                        if isinstance(value, bytes):
+                            value = _str(value)
+                        elif name == "attached":
+                            value = value == 1
+                        values[name] = value
+                break
+    return values
+
+
+def make_status(values):
+    return Status(*[values[name] for name in FIELDS])
+
+
+class ModemStatus:
+    def __init__(self, modem, timeout=10):
+        """
+        Args:
+            modem: Modem (blocking) or AsyncModem
+            timeout: upper bound for the whole chained query in seconds
+        """
+        self.modem = modem
+        self.timeout = timeout
+        self.last = None
+
+    def snapshot(self):
+        """Query everything in one round trip with a blocking Modem"""
+        result, raw = self.modem.command(STATUS_COMMAND, self.timeout)
+        if result == RESULT_OK:
+            values = parse_status_lines(raw.split(b"\r\n"))
+        else:
+            # One failing query (e.g. +CIMI with a locked SIM) aborts the
+            # whole chain; ask one at a time so the rest still get answered
+            values = None
+            for query in STATUS_QUERIES:
+                _, raw = self.modem.command("AT" + query, self.timeout)
+                values = parse_status_lines(raw.split(b"\r\n"), (query,), values)
+        self.last = make_status(values)
+        return self.last
+
+    async def snapshot_async(self):
+        """Query everything in one round trip with an AsyncModem"""
+        result, lines = await self.modem.command(STATUS_COMMAND, self.timeout)
+        if result == RESULT_OK:
+            values = parse_status_lines(lines)
+        else:
+            values = None
+            for query in STATUS_QUERIES:
+                _, lines = await self.modem.command("AT" + query, self.timeout)
+                values = parse_status_lines(lines, (query,), values)
+        self.last = make_status(values)
+        return self.last
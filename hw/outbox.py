@@ -0,0 +1,214 @@
+# Outbound SMS queue
+#
+# enqueue_sms() returns at once; the message is kept in a JSON file on the
+# W25Q128 until it is delivered or given up on, so queued messages survive
+# a reboot. One background task sends the queue through the AsyncModem,
+# part by part, finishing each part on +CMGS or +CMS ERROR rather than on a
+# fixed wait, and retries failures with backoff. Delivery is confirmed by
+# SMS-STATUS-REPORTs arriving as +CDS URCs.
+
+import json
+from modem import ticks_ms, ticks_diff, ticks_add, RESULT_OK
+from at_parse import find, register
+from modem_async import asyncio
+from storage import FLASH_ROOT, write_file_atomic
+from sms import CNMI_COMMAND
+from sms_pdu import encode_submit, next_concat_ref, decode_status_report, report_final, from_hex
+
+OUTBOX_FILE = FLASH_ROOT + "/outbox.json"
+
+# Message states
+QUEUED = "queued"           # Waiting to be (re)sent
+SENT = "sent"               # All parts accepted by the network, awaiting reports
+DELIVERED = "delivered"
+FAILED = "failed"
+
+# Wait before each retry, in seconds; a message fails once they run out
+RETRY_DELAYS = (5, 30, 120, 600)
+
+# Sent messages kept waiting for status reports, oldest dropped first
+MAX_AWAITING = 20
+
+# Sending one part can take a while on a weak network
+SEND_TIMEOUT = 60
+
+register(b"+CMGS:", "d/s")     # <mr>[,<scts>]
+
+
+class Outbox:
+    def __init__(self, modem, path=OUTBOX_FILE, on_status=None, retry_delays=RETRY_DELAYS):
+        """
+        Args:
+            modem: AsyncModem to send through
+            path: JSON file holding the queue
+            on_status: called with the entry dict when a message is sent,
+                       delivered or failed
+            retry_delays: seconds to wait before each retry
+        """
+        self.modem = modem
+        self.path = path
+        self.on_status = on_status
+        self.retry_delays = retry_delays
+        self.entries = []
+        self.due = {}           # id -> ticks_ms of the next attempt (RAM only)
+        self.wakeup = asyncio.Event()
+        self.task = None
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.next_id = max([entry['id'] for entry in self.entries] + [0]) + 1
+
+    def save(self):
+        write_file_atomic(self.path, json.dumps(self.entries).encode())
+
+    async def enable(self):
+        """PDU mode, with status reports routed to the TE as +CDS"""
+        result, _ = await self.modem.command("AT+CMGF=0")
+        if result == RESULT_OK:
+            result, _ = await self.modem.command(CNMI_COMMAND)
+        return result == RESULT_OK
+
+    def start(self):
+        """Start sending queued messages, including ones left from before a reboot"""
+        if self.task is None:
+            self.modem.on_urc("+CDS:", self._on_cds)
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+            self.modem.urc.remove("+CDS:", self._on_cds)
+
+    def enqueue_sms(self, number, text):
+        """Queue text for number and return the message id"""
+        entry = {
+            'id': self.next_id,
+            'number': number,
+            'text': text,
+            'state': QUEUED,
+            'ref': next_concat_ref(),   # Same concatenation ref on every retry
+            'sent': 0,                  # Parts accepted so far
+            'mrs': [],                  # TP-MR of each accepted part
+            'reported': [],             # TP-MRs with a final status report
+            'attempts': 0,
+            'error': None,
+        }
+        self.next_id += 1
+        self.entries.append(entry)
+        self.save()
+        self.wakeup.set()
+        return entry['id']
+
+    def pending(self):
+        """Entries not yet accepted by the network"""
+        return [entry for entry in self.entries if entry['state'] == QUEUED]
+
+    def _next_due(self):
+        # Returns (entry, ms until due) for the oldest queued entry. Messages
+        # go out in the order they were queued: one waiting for a retry
+        # holds the ones behind it
+        for entry in self.entries:
+            if entry['state'] == QUEUED:
+                due = self.due.get(entry['id'])
+                if due is None:
+                    return entry, 0
+                return entry, max(0, ticks_diff(due, ticks_ms()))
+        return None, None
+
+    async def _run(self):
+        while True:
+            entry, wait = self._next_due()
+            if entry is None or wait > 0:
+                self.wakeup.clear()
+                try:
+                    if entry is None:
+                        await self.wakeup.wait()
+                    else:
+                        await asyncio.wait_for(self.wakeup.wait(), wait / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._send(entry)
+            except Exception as e:
+                print(f"Outbox error for message {entry['id']}: {e}")
+                self._retry(entry, str(e))
+
+    async def _send(self, entry):
+        parts = encode_submit(entry['number'], entry['text'], srr=True, ref=entry['ref'])
+        while entry['sent'] < len(parts):
+            pdu, length = parts[entry['sent']]
+            request = await self.modem.request(f"AT+CMGS={length}", SEND_TIMEOUT, pdu)
+            if request.result != RESULT_OK:
+                error = request.final.decode() if request.final else request.result
+                self._retry(entry, error)
+                return
+            fields = find(request.lines, b"+CMGS:")
+            if fields:
+                entry['mrs'].append(fields[0])
+            entry['sent'] += 1
+            self.save()     # A reboot resumes after the last accepted part
+
+        entry['state'] = SENT
+        entry['error'] = None
+        self.due.pop(entry['id'], None)
+        self._trim_awaiting()
+        self.save()
+        self._notify(entry)
+
+    def _retry(self, entry, error):
+        entry['attempts'] += 1
+        entry['error'] = error
+        if entry['attempts'] > len(self.retry_delays):
+            self._finish(entry, FAILED)
+            return
+        delay = self.retry_delays[entry['attempts'] - 1]
+        self.due[entry['id']] = ticks_add(ticks_ms(), int(delay * 1000))
+        self.save()
+
+    def _trim_awaiting(self):
+        awaiting = [entry for entry in self.entries if entry['state'] == SENT]
+        for entry in awaiting[:-MAX_AWAITING]:
+            self.entries.remove(entry)
+
+    def _finish(self, entry, state):
+        entry['state'] = state
+        self.entries.remove(entry)
+        self.due.pop(entry['id'], None)
+        self.save()
+        self._notify(entry)
+
+    def _notify(self, entry):
+        if self.on_status:
+            self.on_status(entry)
+
+    def _on_cds(self, line):
+        # b"+CDS: <length>\r\n<pdu hex>"
+        end = line.find(b"\r\n")
+        if end < 0:
+            return
+        try:
+            report = decode_status_report(from_hex(line[end + 2:]))
+        except (ValueError, IndexError):
+            return
+        final = report_final(report['status'])
+        if final is None:
+            return
+        # TP-MR wraps at 256: match the newest sent message using it
+        for entry in reversed(self.entries):
+            mr = report['mr']
+            if entry['state'] != SENT or mr not in entry['mrs'] or mr in entry['reported']:
+                continue
+            if not final:
+                entry['error'] = f"status {report['status']:#04x}"
+                self._finish(entry, FAILED)
+            else:
+                entry['reported'].append(mr)
+                if len(entry['reported']) == len(entry['mrs']):
+                    self._finish(entry, DELIVERED)
+                else:
+                    self.save()
+            return
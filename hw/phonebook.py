@@ -0,0 +1,111 @@
+# SIM phonebook import
+#
+# AT+CPBR=<start>,<end> answers a whole range of entries in one reply, so
+# a full 250-entry SIM is read in a handful of round trips instead of one
+# per entry. Entries are parsed in place as the reply streams in and are
+# written to the contact store a page at a time, deduplicated by
+# normalized number. Progress is reported after every page. New contacts
+# reach the caller-ID index through the store.
+
+from modem import startswith, RESULT_OK
+from at_parse import parse, find, register
+from contacts import ContactStore
+
+PAGE_SIZE = 100         # Entries asked for per AT+CPBR
+SOURCE_SIM = "sim"
+TYPE_INTERNATIONAL = 145
+
+# +CME ERROR: 22, not found: no entries in the range
+CME_NOT_FOUND = b"22"
+
+CPBR_SPEC = "dsd/s"     # <index>,"<number>",<type>[,"<text>"]
+CPBS_SPEC = "s/dd"      # "<storage>",<used>,<total>
+
+register(b"+CPBR:", CPBR_SPEC)
+register(b"+CPBS:", CPBS_SPEC)
+
+
+def parse_cpbr(line):
+    """Parse a +CPBR line into (index, number, name), or None"""
+    fields = parse(line, CPBR_SPEC)
+    if fields is None:
+        return None
+    index, number, number_type, name = fields
+    number = number.decode()
+    if number_type == TYPE_INTERNATIONAL and not number.startswith("+"):
+        number = "+" + number
+    return index, number, name.decode("utf-8", "ignore") if name else ""
+
+
+class PhonebookImport:
+    def __init__(self, modem, store=None, page=PAGE_SIZE, on_progress=None, index=None):
+        """
+        Args:
+            modem: AsyncModem to read through
+            store: ContactStore receiving the entries
+            page: entries asked for per AT+CPBR
+            on_progress: called with this PhonebookImport after every page
+            index: CallerIndex to update, if the store has none yet
+        """
+        self.modem = modem
+        self.store = store or ContactStore()
+        if index is not None and self.store.index is None:
+            self.store.index = index
+        self.page = page
+        self.on_progress = on_progress
+        self.used = None        # Entries on the SIM
+        self.size = None        # Phonebook capacity (highest index)
+        self.position = 0       # Last index read
+        self.read = 0
+        self.added = 0
+        self.pages = 0
+
+    async def run(self):
+        """Import the SIM phonebook; returns the number of new contacts, None on failure"""
+        result, _ = await self.modem.command('AT+CPBS="SM"')
+        if result != RESULT_OK:
+            return None
+        result, lines = await self.modem.command("AT+CPBS?")
+        fields = find(lines, b"+CPBS:")
+        if result != RESULT_OK or fields is None or fields[2] is None:
+            return None
+        _, self.used, self.size = fields
+
+        # Entries can sit anywhere below size: stop once all used ones are in
+        while self.position < self.size and self.read < self.used:
+            end = min(self.position + self.page, self.size)
+            if not await self._read_page(self.position + 1, end):
+                return None
+        return self.added
+
+    async def _read_page(self, start, end):
+        entries = []
+
+        def on_line(line):
+            if startswith(line, b"+CPBR:"):
+                entry = parse_cpbr(line)
+                if entry:
+                    entries.append((entry[2], entry[1]))
+
+        # The SIM is read entry by entry: allow for a full page
+        timeout = 10 + (end - start) // 10
+        request = await self.modem.request(f"AT+CPBR={start},{end}", timeout, on_line=on_line)
+        if request.result != RESULT_OK and not (
+                request.final is not None and request.final.endswith(CME_NOT_FOUND)):
+            return False
+        self.read += len(entries)
+        self.added += self.store.add_many(entries, SOURCE_SIM)
+        self.position = end
+        self.pages += 1
+        if self.on_progress:
+            self.on_progress(self)
+        return True
+
+    def percent(self):
+        if not self.used:
+            return 100
+        return self.read * 100 // self.used
+
+    def report(self):
+        return (f"{self.read}/{self.used} entries read, {self.added} new, "
+                f"{self.read - self.added} already stored, {self.pages} pages")
@@ -0,0 +1,147 @@
+# Network registration tracker
+#
+# AT+CREG=2 / AT+CEREG=2 make the module report every registration change
+# as a URC, with location area, cell and access technology. The current
+# state is kept in memory, so "are we registered?" never costs an AT round
+# trip and callers can await registration instead of polling AT+CREG?.
+
+from modem import startswith, RESULT_OK
+from at_parse import parse, register
+from modem_async import asyncio
+
+# <stat> values
+NOT_REGISTERED = 0
+HOME = 1
+SEARCHING = 2
+DENIED = 3
+UNKNOWN = 4
+ROAMING = 5
+
+# <AcT> values
+ACT_NAMES = {
+    0: "GSM",
+    2: "UTRAN",
+    3: "GSM/EGPRS",
+    4: "HSDPA",
+    5: "HSUPA",
+    6: "HSPA",
+    7: "LTE",
+}
+
+DOMAINS = ("creg", "cereg")     # Circuit-switched, LTE (EPS)
+
+
+# <stat>[,<lac>,<ci>[,<AcT>]]; answers to AT+CREG? have <n> in front
+URC_SPEC = "d/xxd"
+QUERY_SPEC = "_d/xxd"
+
+register(b"+CREG:", URC_SPEC)
+register(b"+CEREG:", URC_SPEC)
+
+
+def parse_registration(line, solicited=False):
+    """
+    Parse a +CREG/+CEREG line into (stat, lac, ci, act)
+
+    lac and ci are ints (sent as hex strings), None if absent.
+    """
+    fields = parse(line, QUERY_SPEC if solicited else URC_SPEC)
+    return fields[1:] if fields and solicited else fields
+
+
+class RegistrationTracker:
+    def __init__(self, modem):
+        """
+        Track network registration from +CREG / +CEREG URCs
+
+        Args:
+            modem: AsyncModem (or Modem) whose dispatcher delivers the URCs
+        """
+        self.modem = modem
+        self.stats = {"creg": None, "cereg": None}
+        self.lac = None
+        self.ci = None
+        self.act = None
+        self.listeners = []
+        self.registered_event = asyncio.Event()
+
+        modem.on_urc("+CREG:", lambda line: self._on_urc("creg", line))
+        modem.on_urc("+CEREG:", lambda line: self._on_urc("cereg", line))
+
+    def on_change(self, listener):
+        """Call listener(tracker) whenever the registration state changes"""
+        self.listeners.append(listener)
+
+    def registered(self):
+        """True when registered (home or roaming) in any domain"""
+        for stat in self.stats.values():
+            if stat in (HOME, ROAMING):
+                return True
+        return False
+
+    def roaming(self):
+        return ROAMING in self.stats.values() and HOME not in self.stats.values()
+
+    def act_name(self):
+        return ACT_NAMES.get(self.act, "unknown")
+
+    def _on_urc(self, domain, line):
+        parsed = parse_registration(line)
+        if parsed:
+            self._update(domain, parsed)
+
+    def _update(self, domain, parsed):
+        stat, lac, ci, act = parsed
+        changed = stat != self.stats[domain]
+        self.stats[domain] = stat
+        if stat in (HOME, ROAMING) and ci is not None:
+            changed = changed or (lac, ci, act) != (self.lac, self.ci, self.act)
+            self.lac, self.ci, self.act = lac, ci, act
+
+        if self.registered():
+            self.registered_event.set()
+        else:
+            self.registered_event.clear()
+        if changed:
+            for listener in self.listeners:
+                listener(self)
+
+    async def enable(self):
+        """Turn on registration URCs and read the current state"""
+        result, _ = await self.modem.command("AT+CREG=2;+CEREG=2")
+        if result != RESULT_OK:
+            # Firmware without +CEREG still reports circuit-switched changes
+            result, _ = await self.modem.command("AT+CREG=2")
+        await self.refresh()
+        return result == RESULT_OK
+
+    async def refresh(self):
+        """Re-read the state with AT+CREG?;+CEREG? (URCs keep it current)"""
+        result, lines = await self.modem.command("AT+CREG?;+CEREG?")
+        if result != RESULT_OK:
+            result, lines = await self.modem.command("AT+CREG?")
+        for line in lines:
+            for domain, prefix in (("creg", b"+CREG:"), ("cereg", b"+CEREG:")):
+                if startswith(line, prefix):
+                    parsed = parse_registration(line, solicited=True)
+                    if parsed:
+                        self._update(domain, parsed)
+        return self.registered()
+
+    async def wait_registered(self, timeout=None):
+        """
+        Wait until the module is registered, returning False on timeout
+
+        Returns as soon as the registration URC arrives; timeout in seconds
+        (None waits forever).
+        """
+        if self.registered():
+            return True
+        try:
+            if timeout is None:
+                await self.registered_event.wait()
+            else:
+                await asyncio.wait_for(self.registered_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
@@ -0,0 +1,190 @@
+# Preallocated receive ring buffer for the modem UART
+#
+# Bytes go straight from the UART into a fixed bytearray (from the RX IRQ
+# on rp2, or by polling), and complete lines are handed out as memoryview
+# slices of that buffer. Nothing is reallocated while a response arrives.
+
+
+class RingBuffer:
+    def __init__(self, size=4096, line_max=512):
+        """
+        Args:
+            size: ring capacity in bytes (one slot is kept free)
+            line_max: longest line that can wrap around the end of the ring
+        """
+        self.size = size
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.head = 0           # Next write position (advanced by the filler)
+        self.tail = 0           # Next read position (advanced by the reader)
+        self.scanned = 0        # Bytes after tail already searched for '\n'
+        self.release = 0        # Bytes handed out by readline, freed on next read
+        self.line = bytearray(line_max)
+        self.line_mv = memoryview(self.line)
+        self.filling = False
+        self.overflows = 0      # Bytes dropped because the ring was full
+        self.truncated = 0      # Wrapped lines cut to line_max
+        self.uart = None
+
+    def __len__(self):
+        return (self.head - self.tail) % self.size
+
+    def free(self):
+        """Bytes that can be written before the ring is full"""
+        return self.size - 1 - len(self)
+
+    def clear(self):
+        self.tail = self.head
+        self.scanned = 0
+        self.release = 0
+
+    def write(self, data):
+        """Copy bytes into the ring, dropping what does not fit"""
+        n = len(data)
+        room = self.free()
+        if n > room:
+            self.overflows += n - room
+            n = room
+        head = self.head
+        first = min(n, self.size - head)
+        self.mv[head:head + first] = data[:first]
+        if n > first:
+            self.mv[0:n - first] = data[first:n]
+        self.head = (head + n) % self.size
+        return n
+
+    def fill_from(self, uart):
+        """Read waiting UART bytes directly into the ring, return the count"""
+        if self.filling:
+            return 0    # Re-entered from the IRQ while the main loop is reading
+        self.filling = True
+        total = 0
+        try:
+            while uart.any():
+                room = self.free()
+                if not room:
+                    break
+                head = self.head
+                end = min(head + room, self.size)
+                n = uart.readinto(self.mv[head:end])
+                if not n:
+                    break
+                self.head = (head + n) % self.size
+                total += n
+        finally:
+            self.filling = False
+        return total
+
+    def attach_irq(self, uart, callback=None):
+        """
+        Fill the ring from the UART RX IRQ (rp2 UART.IRQ_RXIDLE)
+
+        callback() runs after each fill, e.g. to set a ThreadSafeFlag.
+        Returns False if the port has no RX IRQ and must be polled instead.
+        """
+        from machine import UART
+        trigger = getattr(UART, "IRQ_RXIDLE", None)
+        if trigger is None or not hasattr(uart, "irq"):
+            return False
+
+        def handler(_):
+            self.fill_irq(uart, callback)
+
+        uart.irq(handler=handler, trigger=trigger)
+        self.uart = uart
+        return True
+
+    def fill_irq(self, uart, callback=None):
+        """
+        The RX IRQ's fill: run callback() if there is anything to read
+
+        When the IRQ lands while the main loop is in fill_from(), that loop
+        may already have seen an empty FIFO, so the bytes behind this IRQ
+        stay in the UART: callback() still runs so the reader looks again.
+        """
+        if self.filling:
+            if callback:
+                callback()
+            return
+        if self.fill_from(uart) and callback:
+            callback()
+
+    def detach_irq(self):
+        if self.uart:
+            self.uart.irq(handler=None)
+            self.uart = None
+
+    def _consume(self):
+        if self.release:
+            self.tail = (self.tail + self.release) % self.size
+            self.release = 0
+
+    def readline(self):
+        """
+        Return the next complete line as a memoryview, or None
+
+        The CR/LF terminator and surrounding whitespace are stripped. The
+        view stays valid until the next readline() or take_prompt() call;
+        copy it (bytes(line)) to keep it longer.
+        """
+        self._consume()
+        buf = self.buf
+        size = self.size
+        tail = self.tail
+        used = len(self)
+
+        i = self.scanned
+        while i < used:
+            if buf[(tail + i) % size] == 0x0A:  # '\n'
+                break
+            i += 1
+        else:
+            self.scanned = used
+            if used == size - 1:
+                # A line longer than the ring: drop it rather than stall
+                self.overflows += used
+                self.clear()
+            return None
+
+        self.scanned = 0
+        self.release = i + 1
+
+        # Strip whitespace (including the '\r') from both ends
+        start = 0
+        while start < i and buf[(tail + start) % size] <= 0x20:
+            start += 1
+        end = i
+        while end > start and buf[(tail + end - 1) % size] <= 0x20:
+            end -= 1
+
+        a = (tail + start) % size
+        n = end - start
+        if a + n <= size:
+            return self.mv[a:a + n]
+
+        # The line wraps around the end of the ring: join it in the scratch,
+        # keeping its first line_max bytes if it does not fit
+        if n > len(self.line):
+            self.truncated += 1
+            n = len(self.line)
+        first = min(size - a, n)
+        self.line_mv[:first] = self.mv[a:a + first]
+        if n > first:
+            self.line_mv[first:n] = self.mv[0:n - first]
+        return self.line_mv[:n]
+
+    def take_prompt(self):
+        """Consume the SMS '>' prompt if it is all that is left unread"""
+        self._consume()
+        buf = self.buf
+        tail = self.tail
+        prompt = False
+        for i in range(len(self)):
+            c = buf[(tail + i) % self.size]
+            if c == 0x3E and not prompt:  # '>'
+                prompt = True
+            elif c > 0x20:
+                return False
+        if prompt:
+            self.clear()
+        return prompt
@@ -0,0 +1,138 @@
+# Signal quality monitor
+#
+# AT+AUTOCSQ=1,1 makes the SIM7600G send a +CSQ URC whenever the signal
+# changes, so a status bar needs no polling at all. On firmware without it
+# AT+CSQ is polled with adaptive backoff: every MIN_INTERVAL while the value
+# moves, doubling up to MAX_INTERVAL while it is stable. Listeners are only
+# called when the displayed number of bars changes, so the display is never
+# redrawn for nothing.
+#
+# +CSQ: <rssi>,<ber>   rssi 0-31 (-113 + 2 * rssi dBm), 99 = unknown
+
+from modem import startswith, RESULT_OK
+from at_parse import parse, register
+from modem_async import asyncio
+
+UNKNOWN = 99
+
+# Lowest rssi for 1, 2, 3 and 4 bars (-109, -93, -83, -73 dBm)
+BAR_THRESHOLDS = (2, 10, 15, 20)
+MAX_BARS = len(BAR_THRESHOLDS)
+
+MIN_INTERVAL = 2        # Seconds between polls while the signal moves
+MAX_INTERVAL = 60       # Seconds between polls while it is stable
+
+
+register(b"+CSQ:", "dd")
+
+
+def parse_csq(line):
+    """Parse a +CSQ line into (rssi, ber), or None"""
+    return parse(line, "dd")
+
+
+def rssi_dbm(rssi):
+    """Signal in dBm, or None if unknown"""
+    if rssi is None or rssi == UNKNOWN:
+        return None
+    return -113 + 2 * rssi
+
+
+def rssi_bars(rssi):
+    """Bars (0-MAX_BARS) shown for an rssi value"""
+    if rssi is None or rssi == UNKNOWN:
+        return 0
+    bars = 0
+    for threshold in BAR_THRESHOLDS:
+        if rssi >= threshold:
+            bars += 1
+    return bars
+
+
+class SignalMonitor:
+    def __init__(self, modem, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        """
+        Keep the signal quality current from +CSQ URCs or adaptive polling
+
+        Args:
+            modem: AsyncModem whose dispatcher delivers the URCs
+            min_interval: seconds between polls while the value changes
+            max_interval: seconds between polls while it is stable
+        """
+        self.modem = modem
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.rssi = None
+        self.ber = None
+        self.bars = None
+        self.auto = False       # The module reports changes by itself
+        self.polls = 0
+        self.values = 0         # Readings received, polled or reported
+        self.listeners = []
+        self.task = None
+        modem.on_urc("+CSQ:", self._on_urc)
+
+    def on_change(self, listener):
+        """Call listener(bars, monitor) whenever the displayed bars change"""
+        self.listeners.append(listener)
+
+    def dbm(self):
+        return rssi_dbm(self.rssi)
+
+    def _on_urc(self, line):
+        parsed = parse_csq(line)
+        if parsed:
+            self._update(*parsed)
+
+    def _update(self, rssi, ber):
+        # Returns True when the raw value changed
+        changed = rssi != self.rssi
+        self.rssi, self.ber = rssi, ber
+        self.values += 1
+        bars = rssi_bars(rssi)
+        if bars != self.bars:
+            self.bars = bars
+            for listener in self.listeners:
+                try:
+                    listener(bars, self)
+                except Exception as e:
+                    print(f"Signal listener error: {e}")
+        return changed
+
+    async def enable(self):
+        """Ask for +CSQ URCs on change; falls back to polling without them"""
+        result, _ = await self.modem.command("AT+AUTOCSQ=1,1")
+        self.auto = result == RESULT_OK
+        await self.refresh()
+        return self.auto
+
+    async def refresh(self):
+        """Read the signal with AT+CSQ; returns True if the value changed"""
+        self.polls += 1
+        result, lines = await self.modem.command("AT+CSQ")
+        if result == RESULT_OK:
+            for line in lines:
+                if startswith(line, b"+CSQ:"):
+                    parsed = parse_csq(line)
+                    if parsed:
+                        return self._update(*parsed)
+        return False
+
+    def start(self):
+        """Poll in the background (only needed without +AUTOCSQ)"""
+        if self.task is None and not self.auto:
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if await self.refresh():
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
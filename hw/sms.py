@@ -0,0 +1,186 @@
+# SMS storage listing for the SIM7600G
+#
+# Parses +CMGL listings one record at a time as lines come off the UART,
+# so a full SIM store never has to sit in RAM: memory is bounded by one
+# message, and the first record is available before the listing finishes.
+# Works in PDU mode (AT+CMGF=0, the default here) and in text mode.
+
+from modem import final_result, split_fields, startswith, RESULT_OK
+from sms_pdu import decode_deliver, from_hex
+
+# <stat> values in PDU mode; text mode uses the matching names
+STAT_REC_UNREAD = 0
+STAT_REC_READ = 1
+STAT_STO_UNSENT = 2
+STAT_STO_SENT = 3
+STAT_ALL = 4
+STAT_NAMES = ("REC UNREAD", "REC READ", "STO UNSENT", "STO SENT", "ALL")
+
+# Store new messages and announce them with +CMTI; route status reports
+# straight to the TE as +CDS
+CNMI_COMMAND = "AT+CNMI=2,1,0,1,0"
+
+# Largest PDU: 12-octet SMSC prefix plus a 164-octet TPDU
+PDU_MAX = 176
+
+
+def _int(field, default=None):
+    try:
+        return int(field)
+    except ValueError:
+        return default
+
+
+def _stat(field):
+    # Text mode reports the name, PDU mode the number
+    name = field.decode()
+    if name in STAT_NAMES:
+        return STAT_NAMES.index(name)
+    return _int(field)
+
+
+class CmglParser:
+    PREFIX = b"+CMGL:"
+
+    def __init__(self, pdu=True, pdu_buf=None):
+        """
+        Args:
+            pdu: parse a PDU-mode listing (AT+CMGF=0), else text mode
+            pdu_buf: reusable buffer for decoded PDU octets
+        """
+        self.pdu = pdu
+        self.pdu_buf = pdu_buf or bytearray(PDU_MAX)
+        self.record = None
+        self.body = []
+
+    def feed(self, line):
+        """
+        Feed one response line, return a completed record or None
+
+        Records are dicts with index, stat (int), sender, timestamp and
+        text. PDU records also carry dcs and concat (see sms_pdu); PDUs
+        that are not SMS-DELIVER (e.g. stored outgoing messages) have text
+        None and the raw octets in 'pdu'.
+        """
+        if startswith(line, self.PREFIX):
+            done = self.flush()
+            self._header(split_fields(line))
+            return done
+        if self.record is None:
+            return None
+        if self.pdu:
+            record = self.record
+            self.record = None
+            return self._decode(record, line)
+        # Text mode bodies may span several lines
+        self.body.append(bytes(line))
+        return None
+
+    def flush(self):
+        """Return the record still being collected, if any"""
+        record = self.record
+        self.record = None
+        if record is None or self.pdu:
+            return None
+        record['text'] = b"\n".join(self.body).decode('utf-8', 'ignore')
+        self.body = []
+        return record
+
+    def _header(self, fields):
+        index = _int(fields[0])
+        stat = _stat(fields[1]) if len(fields) > 1 else None
+        if self.pdu:
+            # +CMGL: <index>,<stat>,[<alpha>],<length>
+            self.record = {'index': index, 'stat': stat,
+                           'length': _int(fields[-1])}
+        else:
+            # +CMGL: <index>,<stat>,<oa/da>,[<alpha>],[<scts>]
+            self.record = {
+                'index': index,
+                'stat': stat,
+                'sender': fields[2].decode() if len(fields) > 2 else "",
+                'timestamp': fields[4].decode() if len(fields) > 4 else "",
+                'text': "",
+            }
+
+    def _decode(self, record, line):
+        octets = from_hex(line, self.pdu_buf)
+        try:
+            record.update(decode_deliver(octets))
+        except (ValueError, IndexError):
+            record['sender'] = None
+            record['timestamp'] = None
+            record['text'] = None
+            record['pdu'] = bytes(octets)
+        return record
+
+
+class CmgrParser(CmglParser):
+    PREFIX = b"+CMGR:"
+
+    def __init__(self, index, pdu=True, pdu_buf=None):
+        """Parser for one AT+CMGR=<index> response (no index in its header)"""
+        super().__init__(pdu, pdu_buf)
+        self.index = index
+
+    def _header(self, fields):
+        super()._header([str(self.index).encode()] + fields)
+
+
+def parse_cmgr(lines, index, pdu=True):
+    """
+    Parse AT+CMGR response lines into a record (see CmglParser.feed)
+
+    Returns None for an empty storage slot.
+    """
+    parser = CmgrParser(index, pdu)
+    record = None
+    for line in lines:
+        record = parser.feed(line) or record
+    return record or parser.flush()
+
+
+def list_command(stat=STAT_ALL, pdu=True):
+    """The AT+CMGL command for stat in the given mode"""
+    if pdu:
+        return f"AT+CMGL={stat}"
+    return f'AT+CMGL="{STAT_NAMES[stat]}"'
+
+
+def list_messages(modem, stat=STAT_ALL, pdu=True, timeout=30):
+    """
+    Yield stored messages one at a time from a blocking Modem
+
+    The listing is parsed as it arrives; check modem.last_result afterwards
+    to tell a complete listing from an error or timeout.
+    """
+    parser = CmglParser(pdu)
+    for line in modem.command_lines(list_command(stat, pdu), timeout):
+        if final_result(line):
+            continue    # Let read_lines record the result
+        record = parser.feed(line)
+        if record:
+            yield record
+    record = parser.flush()
+    if record:
+        yield record
+
+
+async def list_messages_async(modem, on_message, stat=STAT_ALL, pdu=True, timeout=30):
+    """
+    Stream stored messages from an AsyncModem to on_message(record)
+
+    Returns True if the listing completed with OK.
+    """
+    parser = CmglParser(pdu)
+
+    def on_line(line):
+        record = parser.feed(line)
+        if record:
+            on_message(record)
+
+    request = await modem.request(list_command(stat, pdu), timeout, on_line=on_line)
+    record = parser.flush()
+    if record:
+        on_message(record)
+    return request.result == RESULT_OK
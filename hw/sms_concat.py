@@ -0,0 +1,248 @@
+# Concatenated SMS reassembly
+#
+# Parts of a long message arrive as separate SMS, in any order, possibly
+# hours apart and across reboots. Each incomplete set lives in one slot
+# file on flash (a header line, then one JSON line per part), so RAM only
+# holds a small index: set key (sender, reference, total) -> slot, and a
+# bitmask of the parts seen. A part is looked up in O(1), appended to its
+# slot and, once the last one lands, the parts are joined into one logical
+# message for the inbox.
+#
+# Completed slots are kept as tombstones until the slot is needed again:
+# a part fetched a second time after a power cut is recognised instead of
+# starting a new set. Sets older than max_age_s expire, and an incomplete
+# one is handed over with the missing parts marked: every record passing
+# through add() (long or not) is checked against its service centre time,
+# and the inbox calls expire() now and then with the module's clock, so a
+# lone part does not wait for the next long message.
+
+import json
+import os
+from storage import FLASH_ROOT
+
+CONCAT_DIR = FLASH_ROOT + "/concat"
+SLOTS = 16              # Sets collected at the same time
+MAX_AGE_S = 24 * 3600   # Give up on missing parts after a day
+MISSING = "[...]"       # Stands in for each part that never arrived
+
+_DAYS_BEFORE_MONTH = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+
+
+def ts_seconds(timestamp):
+    """Seconds since 2000 (UTC) of a decode_timestamp() tuple, or None"""
+    if not timestamp:
+        return None
+    year, month, day, hour, minute, second, tz_minutes = timestamp
+    years = year - 2000
+    days = years * 365 + (years + 3) // 4 + _DAYS_BEFORE_MONTH[month - 1] + day - 1
+    if month > 2 and year % 4 == 0:
+        days += 1
+    return ((days * 24 + hour) * 60 + minute) * 60 + second - tz_minutes * 60
+
+
+def set_key(record):
+    ref, total, _ = record['concat']
+    return f"{record.get('sender')}|{ref}|{total}"
+
+
+class _Set:
+    def __init__(self, key, sender, ref, total, first):
+        self.key = key
+        self.sender = sender
+        self.ref = ref
+        self.total = total
+        self.first = first      # Service centre time of the first part seen
+        self.mask = 0           # Bit seq set for each part on flash
+        self.count = 0
+        self.done = False
+        self.used = 0
+
+
+class ConcatStore:
+    def __init__(self, root=CONCAT_DIR, slots=SLOTS, max_age_s=MAX_AGE_S):
+        """
+        Args:
+            root: directory holding one file per slot
+            slots: incomplete sets kept at once; the oldest makes room
+            max_age_s: age at which a set expires
+        """
+        self.root = root
+        self.slots = slots
+        self.max_age_s = max_age_s
+        self.sets = None        # Slot -> _Set or None, loaded on first use
+        self.index = {}         # Set key -> slot
+        self.clock = 0
+
+    def _path(self, slot):
+        return f"{self.root}/{slot}.jsonl"
+
+    def _load(self):
+        self.sets = [None] * self.slots
+        self.index = {}
+        try:
+            os.mkdir(self.root)
+        except OSError:
+            pass    # Already there
+        for slot in range(self.slots):
+            try:
+                f = open(self._path(slot))
+            except OSError:
+                continue
+            with f:
+                entry = None
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        continue    # Line cut short by a power loss
+                    if entry is None:
+                        if 'key' not in data:
+                            break
+                        entry = _Set(data['key'], data['sender'], data['ref'],
+                                     data['total'], data['first'])
+                    elif 'seq' in data and not entry.mask & (1 << data['seq']):
+                        entry.mask |= 1 << data['seq']
+                        entry.count += 1
+                    elif 'done' in data:
+                        entry.done = True
+            if entry is None:
+                self._free(slot)
+                continue
+            self.sets[slot] = entry
+            self.index[entry.key] = slot
+
+    def add(self, record):
+        """
+        Take one received record, returning the messages ready for the inbox
+
+        Records that are not part of a long message come straight back.
+        A part is on flash when this returns; its logical message comes
+        back with the last part, or incomplete when the set expires or is
+        pushed out. Parts already seen return nothing. Sets that expired
+        by the record's service centre time come back first.
+        """
+        now = ts_seconds(record.get('timestamp'))
+        ready = self.expire(now)
+        concat = record.get('concat')
+        if not concat or not 1 <= concat[2] <= concat[1] or concat[1] < 2:
+            ready.append(record)
+            return ready
+        if self.sets is None:
+            self._load()
+        ref, total, seq = concat
+
+        key = set_key(record)
+        slot = self.index.get(key)
+        if slot is None:
+            slot = self._allocate(ready)
+            sender = record.get('sender')
+            self.sets[slot] = _Set(key, sender, ref, total, now)
+            self.index[key] = slot
+            with open(self._path(slot), "w") as f:
+                f.write(json.dumps({'key': key, 'sender': sender, 'ref': ref,
+                                    'total': total, 'first': now}))
+                f.write("\n")
+        entry = self.sets[slot]
+        self.clock += 1
+        entry.used = self.clock
+        if entry.done or entry.mask & (1 << seq):
+            return ready
+
+        with open(self._path(slot), "a") as f:
+            f.write(json.dumps({'seq': seq, 'text': record.get('text'),
+                                'timestamp': record.get('timestamp')}))
+            f.write("\n")
+        entry.mask |= 1 << seq
+        entry.count += 1
+        if entry.count == total:
+            ready.append(self._assemble(slot, record))
+            entry.done = True
+            with open(self._path(slot), "a") as f:
+                f.write('{"done": 1}\n')
+        return ready
+
+    def expire(self, now):
+        """
+        Drop sets older than max_age_s at now (seconds since 2000, UTC)
+
+        Returns the incomplete messages of the sets dropped.
+        """
+        ready = []
+        if now is None:
+            return ready
+        if self.sets is None:
+            self._load()
+        for slot, entry in enumerate(self.sets):
+            if entry and entry.first is not None and now - entry.first > self.max_age_s:
+                if not entry.done:
+                    ready.append(self._assemble(slot))
+                self._free(slot)
+        return ready
+
+    def pending(self):
+        """Number of sets still waiting for parts"""
+        if self.sets is None:
+            self._load()
+        return sum(1 for entry in self.sets if entry and not entry.done)
+
+    def _allocate(self, ready):
+        # A free slot, else the least recently used tombstone, else the
+        # least recently used incomplete set, handed over as it is
+        free = None
+        oldest = None
+        for slot, entry in enumerate(self.sets):
+            if entry is None:
+                return slot
+            if entry.done and (free is None or entry.used < self.sets[free].used):
+                free = slot
+            if oldest is None or entry.used < self.sets[oldest].used:
+                oldest = slot
+        if free is None:
+            free = oldest
+            ready.append(self._assemble(free))
+        self._free(free)
+        return free
+
+    def _free(self, slot):
+        entry = self.sets[slot]
+        if entry is not None:
+            self.index.pop(entry.key, None)
+            self.sets[slot] = None
+        try:
+            os.remove(self._path(slot))
+        except OSError:
+            pass
+
+    def _assemble(self, slot, last=None):
+        # Join the parts on flash, one line in RAM at a time
+        entry = self.sets[slot]
+        texts = [MISSING] * entry.total
+        timestamp = None
+        first_seq = entry.total + 1
+        with open(self._path(slot)) as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                seq = data.get('seq')
+                if seq is None or not 1 <= seq <= entry.total:
+                    continue
+                texts[seq - 1] = data['text'] or ""
+                if seq < first_seq:
+                    first_seq = seq
+                    timestamp = data['timestamp']
+        if timestamp is not None:
+            timestamp = tuple(timestamp)
+        message = {
+            'sender': entry.sender,
+            'timestamp': timestamp,
+            'text': "".join(texts),
+            'concat': None,
+            'parts': entry.total,
+            'missing': entry.total - entry.count,
+            'ref': entry.ref,
+        }
+        if last is not None:
+            message['index'] = last.get('index')
+        return message
@@ -0,0 +1,456 @@
+# SMS PDU-mode codec (3GPP TS 23.040 / 23.038)
+#
+# Encodes SMS-SUBMIT and decodes SMS-DELIVER / SMS-STATUS-REPORT PDUs for
+# AT+CMGF=0. Works on bytes/memoryview octets: hex lines from the modem are
+# decoded into a reusable buffer and the user data is unpacked straight
+# from it. Supports the GSM 7-bit default alphabet (with the extension
+# table), UCS-2 (with surrogate pairs) and concatenated messages.
+
+try:
+    from binascii import hexlify
+except ImportError:
+    from ubinascii import hexlify
+
+# GSM 03.38 default alphabet, indexed by septet value
+GSM7_BASIC = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+              "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà")
+# Extension table, reached through the 0x1B escape septet
+GSM7_EXTENSION = {0x0A: "\f", 0x14: "^", 0x28: "{", 0x29: "}", 0x2F: "\\",
+                  0x3C: "[", 0x3D: "~", 0x3E: "]", 0x40: "|", 0x65: "€"}
+GSM7_ESCAPE = 0x1B
+
+_GSM7_REVERSE = {}
+for _i in range(len(GSM7_BASIC)):
+    _GSM7_REVERSE[GSM7_BASIC[_i]] = _i
+for _code in GSM7_EXTENSION:
+    _GSM7_REVERSE[GSM7_EXTENSION[_code]] = (GSM7_ESCAPE << 8) | _code
+del _GSM7_REVERSE["\x1b"]
+
+# Data coding schemes
+DCS_GSM7 = 0x00
+DCS_8BIT = 0x04
+DCS_UCS2 = 0x08
+ALPHABET_GSM7 = 0
+ALPHABET_8BIT = 1
+ALPHABET_UCS2 = 2
+
+# Type of address
+TOA_INTERNATIONAL = 0x91
+TOA_UNKNOWN = 0x81
+TOA_ALPHANUMERIC = 0x50    # Type-of-number bits (0x70 mask)
+
+# TP-MTI of the PDUs handled here
+MTI_SUBMIT = 0x01
+MTI_STATUS_REPORT = 0x02
+
+# SMS-SUBMIT first octet bits
+VPF_RELATIVE = 0x10
+SRR = 0x20                  # Status report request
+UDHI = 0x40                 # User data starts with a header
+
+# Information elements for concatenated messages
+IEI_CONCAT_8 = 0x00
+IEI_CONCAT_16 = 0x08
+
+VALIDITY_4_DAYS = 0xAA
+
+# Limits per message part
+GSM7_SINGLE = 160
+GSM7_PART = 153             # After a 6-octet concatenation header
+UCS2_SINGLE = 70
+UCS2_PART = 67
+
+_concat_ref = 0
+
+
+# --- Hex and semi-octets -----------------------------------------------------
+
+def _nibble(c):
+    if c <= 0x39:
+        return c - 0x30
+    return (c | 0x20) - 0x57    # 'a'-'f' and 'A'-'F'
+
+
+def from_hex(line, buf=None):
+    """
+    Decode a hex PDU line (bytes or memoryview) into octets
+
+    Decodes into buf when given (no allocation) and returns a memoryview
+    of the decoded part.
+    """
+    n = len(line) // 2
+    if buf is None or len(buf) < n:
+        buf = bytearray(n)
+    for i in range(n):
+        buf[i] = (_nibble(line[2 * i]) << 4) | _nibble(line[2 * i + 1])
+    return memoryview(buf)[:n]
+
+
+def to_hex(data):
+    """Octets to the upper-case hex bytes AT+CMGS expects"""
+    return hexlify(data).upper()
+
+
+def _semi_octets(data, start, digits):
+    # Swapped-nibble BCD digits, 'F' filler dropped
+    out = []
+    for i in range(digits):
+        octet = data[start + i // 2]
+        d = (octet >> 4) if i & 1 else (octet & 0x0F)
+        out.append("0123456789*#abc"[d] if d < 15 else "")
+    return "".join(out)
+
+
+def encode_address(number):
+    """Encode a phone number as <length><toa><semi-octets>"""
+    toa = TOA_UNKNOWN
+    if number.startswith("+"):
+        toa = TOA_INTERNATIONAL
+        number = number[1:]
+    digits = [c for c in number if c in "0123456789*#"]
+    out = bytearray(2 + (len(digits) + 1) // 2)
+    out[0] = len(digits)
+    out[1] = toa
+    for i in range(len(digits)):
+        d = "0123456789*#".index(digits[i])
+        if i & 1:
+            out[2 + i // 2] = (out[2 + i // 2] & 0x0F) | (d << 4)
+        else:
+            out[2 + i // 2] = 0xF0 | d
+    return out
+
+
+def decode_address(data, pos):
+    """Decode an originating/destination address, return (number, next_pos)"""
+    digits = data[pos]
+    toa = data[pos + 1]
+    octets = (digits + 1) // 2
+    start = pos + 2
+    if toa & 0x70 == TOA_ALPHANUMERIC:
+        number = decode_gsm7(data[start:start + octets], digits * 4 // 7)
+    else:
+        number = _semi_octets(data, start, digits)
+        if toa & 0x70 == 0x10:  # International
+            number = "+" + number
+    return number, start + octets
+
+
+def decode_smsc(data):
+    """Decode the SMSC prefix of a modem PDU, return (number, tpdu_start)"""
+    length = data[0]
+    if length == 0:
+        return "", 1
+    toa = data[1]
+    number = _semi_octets(data, 2, (length - 1) * 2)
+    if toa & 0x70 == 0x10:
+        number = "+" + number
+    return number, 1 + length
+
+
+def decode_timestamp(data, pos):
+    """
+    Decode a 7-octet service centre timestamp
+
+    Returns (year, month, day, hour, minute, second, tz_minutes).
+    """
+    values = []
+    for i in range(6):
+        octet = data[pos + i]
+        values.append((octet & 0x0F) * 10 + (octet >> 4))
+    tz = data[pos + 6]
+    quarters = (tz & 0x07) * 10 + (tz >> 4)
+    if tz & 0x08:
+        quarters = -quarters
+    return (2000 + values[0], values[1], values[2],
+            values[3], values[4], values[5], quarters * 15)
+
+
+# --- GSM 7-bit ---------------------------------------------------------------
+
+def gsm7_septets(text):
+    """Return the septet values for text, or None if it needs UCS-2"""
+    septets = []
+    for c in text:
+        code = _GSM7_REVERSE.get(c)
+        if code is None:
+            return None
+        if code > 0xFF:
+            septets.append(GSM7_ESCAPE)
+            septets.append(code & 0x7F)
+        else:
+            septets.append(code)
+    return septets
+
+
+def pack_septets(septets, fill_bits=0, out=None, pos=0):
+    """Pack septets into octets after fill_bits padding, return the octets"""
+    size = (len(septets) * 7 + fill_bits + 7) // 8
+    if out is None:
+        out = bytearray(size)
+        pos = 0
+    bit = fill_bits
+    for s in septets:
+        i = pos + (bit >> 3)
+        shift = bit & 7
+        out[i] |= (s << shift) & 0xFF
+        if shift > 1:
+            out[i + 1] |= s >> (8 - shift)
+        bit += 7
+    return out
+
+
+def decode_gsm7(data, count, fill_bits=0):
+    """Unpack count septets from data (after fill_bits) into text"""
+    chars = []
+    escaped = False
+    bit = fill_bits
+    for _ in range(count):
+        i = bit >> 3
+        shift = bit & 7
+        s = data[i] >> shift
+        if shift > 1 and i + 1 < len(data):
+            s |= data[i + 1] << (8 - shift)
+        s &= 0x7F
+        bit += 7
+        if escaped:
+            chars.append(GSM7_EXTENSION.get(s, " "))
+            escaped = False
+        elif s == GSM7_ESCAPE:
+            escaped = True
+        else:
+            chars.append(GSM7_BASIC[s])
+    return "".join(chars)
+
+
+# --- UCS-2 -------------------------------------------------------------------
+
+def ucs2_units(text):
+    """UTF-16 code units for text (astral characters become surrogate pairs)"""
+    units = []
+    for c in text:
+        cp = ord(c)
+        if cp > 0xFFFF:
+            cp -= 0x10000
+            units.append(0xD800 | (cp >> 10))
+            units.append(0xDC00 | (cp & 0x3FF))
+        else:
+            units.append(cp)
+    return units
+
+
+def decode_ucs2(data):
+    """Decode big-endian UTF-16 octets into text"""
+    chars = []
+    high = 0
+    for i in range(0, len(data) - 1, 2):
+        unit = (data[i] << 8) | data[i + 1]
+        if 0xD800 <= unit < 0xDC00:
+            high = unit
+            continue
+        if 0xDC00 <= unit < 0xE000 and high:
+            unit = 0x10000 + ((high - 0xD800) << 10) + (unit - 0xDC00)
+        high = 0
+        chars.append(chr(unit))
+    return "".join(chars)
+
+
+# --- User data header --------------------------------------------------------
+
+def parse_udh(data, pos):
+    """
+    Parse a user data header starting at its UDHL octet
+
+    Returns (header_octets, concat) where concat is (ref, total, seq) or None.
+    """
+    udhl = data[pos]
+    end = pos + 1 + udhl
+    concat = None
+    i = pos + 1
+    while i + 1 < end:
+        iei = data[i]
+        length = data[i + 1]
+        ie = i + 2
+        if iei == IEI_CONCAT_8 and length == 3:
+            concat = (data[ie], data[ie + 1], data[ie + 2])
+        elif iei == IEI_CONCAT_16 and length == 4:
+            concat = ((data[ie] << 8) | data[ie + 1], data[ie + 2], data[ie + 3])
+        i = ie + length
+    return udhl + 1, concat
+
+
+def dcs_alphabet(dcs):
+    """Alphabet of a data coding scheme: ALPHABET_GSM7, _8BIT or _UCS2"""
+    if dcs & 0x80 == 0x00:
+        # General data coding: alphabet in bits 3..2, 3 is reserved
+        alphabet = (dcs >> 2) & 0x03
+        return ALPHABET_GSM7 if alphabet == 3 else alphabet
+    group = dcs & 0xF0
+    if group == 0xE0:
+        return ALPHABET_UCS2
+    if group == 0xF0:
+        return ALPHABET_8BIT if dcs & 0x04 else ALPHABET_GSM7
+    return ALPHABET_GSM7
+
+
+def decode_user_data(data, pos, udl, dcs, has_udh):
+    """Decode TP-UD, return (text, concat)"""
+    alphabet = dcs_alphabet(dcs)
+    header = 0
+    concat = None
+    if has_udh:
+        header, concat = parse_udh(data, pos)
+
+    if alphabet == ALPHABET_GSM7:
+        # udl counts septets, including the header
+        header_septets = (header * 8 + 6) // 7
+        fill = header_septets * 7 - header * 8
+        text = decode_gsm7(data[pos + header:], udl - header_septets, fill)
+    elif alphabet == ALPHABET_UCS2:
+        text = decode_ucs2(data[pos + header:pos + udl])
+    else:
+        text = bytes(data[pos + header:pos + udl]).decode("utf-8", "ignore")
+    return text, concat
+
+
+# --- SMS-DELIVER / SMS-STATUS-REPORT ------------------------------------------
+
+def decode_deliver(pdu):
+    """
+    Decode an SMS-DELIVER PDU as returned by AT+CMGR / AT+CMGL / +CMT
+
+    pdu: octets including the SMSC prefix (see from_hex)
+    Returns a dict with smsc, sender, timestamp, dcs, text and concat,
+    where concat is (ref, total, seq) for a part of a long message.
+    """
+    smsc, pos = decode_smsc(pdu)
+    first = pdu[pos]
+    if first & 0x03 != 0x00:
+        raise ValueError("not an SMS-DELIVER PDU")
+    sender, pos = decode_address(pdu, pos + 1)
+    pid = pdu[pos]
+    dcs = pdu[pos + 1]
+    timestamp = decode_timestamp(pdu, pos + 2)
+    udl = pdu[pos + 9]
+    text, concat = decode_user_data(pdu, pos + 10, udl, dcs, first & UDHI)
+    return {
+        'smsc': smsc,
+        'sender': sender,
+        'timestamp': timestamp,
+        'pid': pid,
+        'dcs': dcs,
+        'text': text,
+        'concat': concat,
+    }
+
+
+def decode_status_report(pdu):
+    """
+    Decode an SMS-STATUS-REPORT PDU (+CDS in PDU mode)
+
+    Returns a dict with mr (the TP-MR of the submitted message, as in
+    +CMGS: <mr>), recipient, timestamp, discharged and status; see
+    STATUS_DELIVERED and report_final().
+    """
+    _, pos = decode_smsc(pdu)
+    if pdu[pos] & 0x03 != MTI_STATUS_REPORT:
+        raise ValueError("not an SMS-STATUS-REPORT PDU")
+    mr = pdu[pos + 1]
+    recipient, pos = decode_address(pdu, pos + 2)
+    return {
+        'mr': mr,
+        'recipient': recipient,
+        'timestamp': decode_timestamp(pdu, pos),
+        'discharged': decode_timestamp(pdu, pos + 7),
+        'status': pdu[pos + 14],
+    }
+
+
+def report_final(status):
+    """
+    Classify a TP-ST value
+
+    Returns True when delivered, False when delivery failed for good, and
+    None while the service centre is still trying.
+    """
+    if status < 0x20:
+        return True
+    if status < 0x40:
+        return None
+    return False
+
+
+# --- SMS-SUBMIT --------------------------------------------------------------
+
+def next_concat_ref():
+    global _concat_ref
+    _concat_ref = (_concat_ref + 1) & 0xFF
+    return _concat_ref
+
+
+def _split(items, single, part, keep_together):
+    # Split septets/code units into parts without breaking escape sequences
+    # or surrogate pairs
+    if len(items) <= single:
+        return [items]
+    parts = []
+    start = 0
+    while start < len(items):
+        end = min(start + part, len(items))
+        if end < len(items) and keep_together(items[end - 1]):
+            end -= 1
+        parts.append(items[start:end])
+        start = end
+    return parts
+
+
+def encode_submit(number, text, srr=False, ref=None):
+    """
+    Encode text for number as one or more SMS-SUBMIT PDUs
+
+    Returns a list of (hex_pdu, tpdu_length) tuples: send each with
+    AT+CMGS=<tpdu_length>, then the hex PDU and Ctrl+Z. The hex PDU starts
+    with "00" so the SIM's default SMSC is used.
+    """
+    septets = gsm7_septets(text)
+    if septets is not None:
+        dcs = DCS_GSM7
+        parts = _split(septets, GSM7_SINGLE, GSM7_PART, lambda s: s == GSM7_ESCAPE)
+    else:
+        dcs = DCS_UCS2
+        parts = _split(ucs2_units(text), UCS2_SINGLE, UCS2_PART,
+                       lambda u: 0xD800 <= u < 0xDC00)
+
+    if len(parts) > 1 and ref is None:
+        ref = next_concat_ref()
+    address = encode_address(number)
+
+    pdus = []
+    for seq in range(len(parts)):
+        part = parts[seq]
+        first = MTI_SUBMIT | VPF_RELATIVE
+        if srr:
+            first |= SRR
+        udh = b""
+        if len(parts) > 1:
+            first |= UDHI
+            udh = bytes((5, IEI_CONCAT_8, 3, ref & 0xFF, len(parts), seq + 1))
+
+        if dcs == DCS_GSM7:
+            header_septets = (len(udh) * 8 + 6) // 7
+            fill = header_septets * 7 - len(udh) * 8
+            body = pack_septets(part, fill)
+            udl = header_septets + len(part)
+        else:
+            body = bytearray(2 * len(part))
+            for i in range(len(part)):
+                body[2 * i] = part[i] >> 8
+                body[2 * i + 1] = part[i] & 0xFF
+            udl = len(udh) + len(body)
+
+        tpdu = bytearray((first, 0x00))     # TP-MR 0: the modem assigns it
+        tpdu.extend(address)
+        tpdu.extend(bytes((0x00, dcs, VALIDITY_4_DAYS, udl)))
+        tpdu.extend(udh)
+        tpdu.extend(body)
+        pdus.append((b"00" + to_hex(tpdu), len(tpdu)))
+    return pdus
@@ -0,0 +1,63 @@
+# W25Q128 layout and LittleFS mount for the phone's data
+#
+# The first half of the chip is a LittleFS filesystem mounted at /flash for
+# small record files (identity, messages, contacts...). The rest is left for
+# raw append-only regions that want direct sector control.
+
+FLASH_ROOT = "/flash"
+FS_START = 0
+FS_SIZE = 8 * 1024 * 1024
+
+# Raw regions after the filesystem
+TRACK_START = FS_START + FS_SIZE
+TRACK_SIZE = 4 * 1024 * 1024
+CALLER_ID_START = TRACK_START + TRACK_SIZE
+CALLER_ID_SIZE = 4 * 1024 * 1024
+
+_flash = None
+
+
+def flash_chip():
+    """Return the W25Q128 on SPI1 (GP10 SCK, GP11 MOSI, GP8 MISO, GP7 CS)"""
+    global _flash
+    if _flash is None:
+        from machine import Pin, SPI
+        from w25q128 import W25Q128
+        spi = SPI(1, baudrate=62_500_000, polarity=0, phase=0,
+                  sck=Pin(10), mosi=Pin(11), miso=Pin(8))
+        _flash = W25Q128(spi, Pin(7, Pin.OUT, value=1))
+    return _flash
+
+
+def mount_flash(root=FLASH_ROOT):
+    """Mount the LittleFS region at root, formatting it on first use"""
+    import vfs
+    bdev = flash_chip().partition(FS_START, FS_SIZE)
+    try:
+        vfs.mount(vfs.VfsLfs2(bdev), root)
+    except OSError as e:
+        if e.args and e.args[0] == 1:  # EPERM: already mounted
+            return root
+        print("Formatting flash filesystem...")
+        vfs.VfsLfs2.mkfs(bdev)
+        vfs.mount(vfs.VfsLfs2(bdev), root)
+    return root
+
+
+def track_region():
+    """The raw region holding the GPS track log"""
+    return flash_chip().partition(TRACK_START, TRACK_SIZE)
+
+
+def caller_id_region():
+    """The raw region holding the caller-ID index"""
+    return flash_chip().partition(CALLER_ID_START, CALLER_ID_SIZE)
+
+
+def write_file_atomic(path, data):
+    """Replace a file so a power cut leaves either the old or new contents"""
+    import os
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.rename(tmp, path)  # LittleFS rename replaces the target atomically
@@ -0,0 +1,340 @@
+# GPS track log in a raw W25Q128 region
+#
+# Fixes are stored as compact records in append-only 4KB sectors used as a
+# ring: when the region is full the oldest sector is erased and reused.
+# Every sector starts with a header and an absolute keyframe, so each one
+# decodes on its own; further fixes are deltas from the previous one,
+# zigzag/varint encoded (a walking-pace fix takes ~6 bytes instead of ~40
+# as text). Records are collected in a one-page RAM buffer and programmed a
+# page at a time, so flash is written about once per 40 fixes. A record
+# torn by a power cut stops reading in its sector; on mount, writing then
+# resumes in a fresh sector, since the torn bytes cannot be programmed again.
+#
+# Sector layout:  "TRK1" <seq u32 LE> <record>... 0xFF (erased)
+# Records:        <tag> <varint t> <zigzag lat> <zigzag lon> <zigzag alt>
+#                 t in seconds, lat/lon in micro-degrees, alt in cm
+
+import sys
+import time
+from w25q128 import SECTOR_SIZE, PAGE_SIZE
+from location import fix_epoch
+
+MAGIC = b"TRK1"
+HEADER_SIZE = 8
+
+TAG_SEGMENT = 0x01      # Absolute values starting a new track segment
+TAG_KEY = 0x02          # Absolute values continuing a segment in a new sector
+TAG_DELTA = 0x03        # Differences from the previous point
+TAG_END = 0xFF          # Erased flash
+
+MAX_VARINT = 5          # Bytes of a 32-bit varint
+MAX_RECORD = 1 + 4 * MAX_VARINT
+
+# Flush the page buffer at least this often (seconds of track time), which
+# bounds what a power cut can lose
+FLUSH_INTERVAL = 60
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _put_varint(buf, pos, value):
+    while value >= 0x80:
+        buf[pos] = (value & 0x7F) | 0x80
+        value >>= 7
+        pos += 1
+    buf[pos] = value
+    return pos + 1
+
+
+def _get_varint(buf, pos):
+    value = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+        if shift >= 7 * MAX_VARINT:
+            # Runs into erased flash (0xFF): a torn record
+            raise ValueError("varint too long")
+
+
+def _iso_time(t):
+    tm = time.gmtime(t)
+    return f"{tm[0]:04d}-{tm[1]:02d}-{tm[2]:02d}T{tm[3]:02d}:{tm[4]:02d}:{tm[5]:02d}Z"
+
+
+def _degrees(micro):
+    sign = "-" if micro < 0 else ""
+    micro = abs(micro)
+    return f"{sign}{micro // 1000000}.{micro % 1000000:06d}"
+
+
+class TrackLog:
+    def __init__(self, flash, min_interval=1, flush_interval=FLUSH_INTERVAL):
+        """
+        Args:
+            flash: raw region (W25Q128 partition, see storage.track_region)
+            min_interval: seconds between logged fixes; faster fixes are skipped
+            flush_interval: seconds of track time between forced page writes
+        """
+        self.flash = flash
+        self.sectors = flash.size // SECTOR_SIZE
+        self.min_interval = min_interval
+        self.flush_interval = flush_interval
+        self.record = bytearray(MAX_RECORD)
+        self.header = bytearray(HEADER_SIZE)
+        self.page = bytearray(PAGE_SIZE)
+        self.page_start = 0
+        self.page_fill = 0
+        self.last = None        # (t, lat, lon, alt) of the previous record
+        self.flushed_t = None  # Track time of the last flush
+        self.new_segment = True
+        self.points = 0         # Points logged since mount
+        self.bytes = 0          # Record bytes logged since mount
+        self.torn = False       # Mount found a torn record after the last good one
+        self._mount()
+
+    # --- Sector bookkeeping ---------------------------------------------------
+
+    def _read_seq(self, sector):
+        self.flash.read(sector * SECTOR_SIZE, self.header)
+        if self.header[:4] != MAGIC:
+            return None
+        return int.from_bytes(self.header[4:8], "little")
+
+    def _mount(self):
+        # Newest sector = highest sequence number; writing resumes at its end
+        self.sector = None
+        self.seq = -1
+        self.oldest = None
+        oldest_seq = None
+        for sector in range(self.sectors):
+            seq = self._read_seq(sector)
+            if seq is None:
+                continue
+            if seq > self.seq:
+                self.sector, self.seq = sector, seq
+            if oldest_seq is None or seq < oldest_seq:
+                self.oldest, oldest_seq = sector, seq
+        if self.sector is None:
+            self.addr = None
+            return
+        end = HEADER_SIZE
+        for point in self._records(self.sector):
+            end = point[5]
+        self.addr = self.sector * SECTOR_SIZE + end
+        # Anything but erased flash after the last good record was torn by a
+        # power cut: continue in the next sector instead of writing over it
+        self.torn = not self._erased(self.addr, (self.sector + 1) * SECTOR_SIZE)
+        if self.torn:
+            self.addr = None
+
+    def _erased(self, start, end):
+        while start < end:
+            n = min(PAGE_SIZE - start % PAGE_SIZE, end - start)
+            chunk = memoryview(self.page)[:n]
+            self.flash.read(start, chunk)
+            for b in chunk:
+                if b != 0xFF:
+                    return False
+            start += n
+        return True
+
+    def _open_sector(self):
+        self.flush()
+        self.sector = 0 if self.sector is None else (self.sector + 1) % self.sectors
+        self.seq += 1
+        self.flash.erase_sector(self.sector * SECTOR_SIZE)
+        if self.oldest is None:
+            self.oldest = self.sector
+        elif self.oldest == self.sector:
+            self.oldest = (self.sector + 1) % self.sectors
+            if self._read_seq(self.oldest) is None:
+                self.oldest = self.sector
+        self.header[:4] = MAGIC
+        self.header[4:8] = self.seq.to_bytes(4, "little")
+        self.flash.program(self.sector * SECTOR_SIZE, self.header)
+        self.addr = self.sector * SECTOR_SIZE + HEADER_SIZE
+
+    # --- Writing -------------------------------------------------------------
+
+    def _encode(self, tag, t, lat, lon, alt):
+        self.record[0] = tag
+        pos = _put_varint(self.record, 1, t)
+        pos = _put_varint(self.record, pos, _zigzag(lat))
+        pos = _put_varint(self.record, pos, _zigzag(lon))
+        return _put_varint(self.record, pos, _zigzag(alt))
+
+    def _write(self, n):
+        i = 0
+        while i < n:
+            if self.page_fill == 0:
+                self.page_start = self.addr
+            k = min(PAGE_SIZE - self.addr % PAGE_SIZE, n - i)
+            self.page[self.page_fill:self.page_fill + k] = self.record[i:i + k]
+            self.page_fill += k
+            self.addr += k
+            i += k
+            if self.addr % PAGE_SIZE == 0:
+                self.flush()
+
+    def log(self, t, lat, lon, alt):
+        """Append one point: t in seconds, lat/lon in micro-degrees, alt in cm"""
+        last = self.last
+        if not self.new_segment and last is not None and t - last[0] < self.min_interval:
+            return False
+        if self.new_segment or last is None or t < last[0]:
+            tag = TAG_SEGMENT
+            n = self._encode(tag, t, lat, lon, alt)
+        else:
+            tag = TAG_DELTA
+            n = self._encode(tag, t - last[0], lat - last[1], lon - last[2], alt - last[3])
+
+        if self.addr is None or self.addr % SECTOR_SIZE + n > SECTOR_SIZE \
+                or self.addr % SECTOR_SIZE == 0:
+            self._open_sector()
+            if tag == TAG_DELTA:
+                tag = TAG_KEY
+                n = self._encode(tag, t, lat, lon, alt)
+        self._write(n)
+
+        self.last = (t, lat, lon, alt)
+        self.new_segment = False
+        self.points += 1
+        self.bytes += n
+        if self.flushed_t is None:
+            self.flushed_t = t
+        elif t - self.flushed_t >= self.flush_interval:
+            self.flush()
+        return True
+
+    def log_fix(self, fix):
+        """GnssService subscriber: log a Fix"""
+        self.log(fix_epoch(fix), fix.lat, fix.lon, fix.alt)
+
+    def attach(self, gnss):
+        """Log every fix from gnss, starting a new track segment"""
+        self.new_segment = True
+        gnss.subscribe(self.log_fix)
+
+    def detach(self, gnss):
+        gnss.unsubscribe(self.log_fix)
+        self.flush()
+
+    def flush(self):
+        """Program the buffered records to flash"""
+        if self.page_fill:
+            self.flash.program(self.page_start, memoryview(self.page)[:self.page_fill])
+            self.page_fill = 0
+        if self.last:
+            self.flushed_t = self.last[0]
+
+    # --- Reading -------------------------------------------------------------
+
+    def _records(self, sector):
+        # Yields (tag, t, lat, lon, alt, end_offset) with absolute values,
+        # reading the sector through a small window
+        base = sector * SECTOR_SIZE
+        window = bytearray(PAGE_SIZE + MAX_RECORD)
+        offset = HEADER_SIZE        # Sector offset of window[0]
+        avail = 0
+        pos = 0
+        t = lat = lon = alt = 0
+        while True:
+            if avail - pos < MAX_RECORD and offset + avail < SECTOR_SIZE:
+                window[:avail - pos] = window[pos:avail]
+                offset += pos
+                avail -= pos
+                pos = 0
+                n = min(len(window) - avail, SECTOR_SIZE - offset - avail)
+                self.flash.read(base + offset + avail, memoryview(window)[avail:avail + n])
+                avail += n
+            if pos >= avail:
+                return
+            tag = window[pos]
+            if tag not in (TAG_SEGMENT, TAG_KEY, TAG_DELTA) or avail - pos < 2:
+                return
+            try:
+                dt, p = _get_varint(window, pos + 1)
+                dlat, p = _get_varint(window, p)
+                dlon, p = _get_varint(window, p)
+                dalt, p = _get_varint(window, p)
+            except (IndexError, ValueError):
+                return      # Record cut short by a power loss
+            if p > avail:
+                return
+            if tag == TAG_DELTA:
+                t += dt
+                lat += _unzigzag(dlat)
+                lon += _unzigzag(dlon)
+                alt += _unzigzag(dalt)
+            else:
+                t, lat, lon, alt = dt, _unzigzag(dlat), _unzigzag(dlon), _unzigzag(dalt)
+            pos = p
+            yield tag, t, lat, lon, alt, offset + pos
+
+    def _sector_order(self):
+        if self.oldest is None:
+            return
+        sector = self.oldest
+        for _ in range(self.sectors):
+            if self._read_seq(sector) is not None:
+                yield sector
+            if sector == self.sector:
+                return
+            sector = (sector + 1) % self.sectors
+
+    def read_points(self):
+        """Yield (new_segment, t, lat, lon, alt) oldest first"""
+        self.flush()
+        for sector in self._sector_order():
+            for tag, t, lat, lon, alt, _ in self._records(sector):
+                yield tag == TAG_SEGMENT, t, lat, lon, alt
+
+    def export_gpx(self, write=None):
+        """Stream the track as GPX 1.1 (to USB serial by default)"""
+        write = write or sys.stdout.write
+        write('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<gpx version="1.1" creator="fone" xmlns="http://www.topografix.com/GPX/1/1">\n'
+              '<trk><name>fone track</name>\n')
+        open_segment = False
+        for new_segment, t, lat, lon, alt in self.read_points():
+            if new_segment or not open_segment:
+                if open_segment:
+                    write('</trkseg>\n')
+                write('<trkseg>\n')
+                open_segment = True
+            write(f'<trkpt lat="{_degrees(lat)}" lon="{_degrees(lon)}">'
+                  f'<ele>{alt / 100}</ele><time>{_iso_time(t)}</time></trkpt>\n')
+        if open_segment:
+            write('</trkseg>\n')
+        write('</trk>\n</gpx>\n')
+
+    def export_csv(self, write=None):
+        """Stream the track as CSV (to USB serial by default)"""
+        write = write or sys.stdout.write
+        write("segment,time,lat,lon,alt_m\n")
+        segment = 0
+        for new_segment, t, lat, lon, alt in self.read_points():
+            if new_segment:
+                segment += 1
+            write(f"{segment},{_iso_time(t)},{_degrees(lat)},{_degrees(lon)},{alt / 100}\n")
+
+    def erase(self):
+        """Erase the whole track log"""
+        for sector in range(self.sectors):
+            if self._read_seq(sector) is not None:
+                self.flash.erase_sector(sector * SECTOR_SIZE)
+        self.page_fill = 0
+        self.last = None
+        self.new_segment = True
+        self._mount()
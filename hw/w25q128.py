@@ -0,0 +1,147 @@
+# W25Q128 16MB SPI NOR flash driver
+#
+# Raw page program / sector erase access plus the MicroPython block device
+# protocol, so a region of the chip can carry a LittleFS filesystem while
+# other regions are used as raw append-only logs.
+
+import time
+
+CMD_WRITE_ENABLE = 0x06
+CMD_READ_STATUS1 = 0x05
+CMD_READ_DATA = 0x03
+CMD_PAGE_PROGRAM = 0x02
+CMD_SECTOR_ERASE = 0x20
+CMD_JEDEC_ID = 0x9F
+CMD_POWER_DOWN = 0xB9
+CMD_RELEASE_POWER_DOWN = 0xAB
+
+JEDEC_W25Q128 = b'\xef\x40\x18'
+
+CAPACITY = 16 * 1024 * 1024
+SECTOR_SIZE = 4096      # Smallest erasable unit
+PAGE_SIZE = 256         # Largest single program operation
+
+
+class W25Q128:
+    def __init__(self, spi, cs, start=0, size=None):
+        """
+        Initialize the flash (or a region of it)
+
+        Args:
+            spi: SPI bus (SPI1, shared with the display)
+            cs: Chip select pin (GP7), active low
+            start: byte offset of this region, sector aligned
+            size: region size in bytes, sector aligned (rest of chip if None)
+        """
+        self.spi = spi
+        self.cs = cs
+        self.start = start
+        self.size = size if size is not None else CAPACITY - start
+        self.cmd = bytearray(4)
+        self.status = bytearray(1)
+        self.cs.value(1)
+
+    def partition(self, start, size):
+        """Return a view of [start, start + size) of this region"""
+        if start % SECTOR_SIZE or size % SECTOR_SIZE or start + size > self.size:
+            raise ValueError("partition must be sector aligned and in range")
+        return W25Q128(self.spi, self.cs, self.start + start, size)
+
+    def _command(self, cmd, addr=None):
+        self.cmd[0] = cmd
+        if addr is None:
+            self.spi.write(self.cmd[:1])
+            return
+        addr += self.start
+        self.cmd[1] = (addr >> 16) & 0xFF
+        self.cmd[2] = (addr >> 8) & 0xFF
+        self.cmd[3] = addr & 0xFF
+        self.spi.write(self.cmd)
+
+    def _wait_ready(self):
+        """Wait for the BUSY bit to clear after a program or erase"""
+        while True:
+            self.cs.value(0)
+            self._command(CMD_READ_STATUS1)
+            self.spi.readinto(self.status)
+            self.cs.value(1)
+            if not self.status[0] & 0x01:
+                return
+            time.sleep_us(50)
+
+    def _write_enable(self):
+        self.cs.value(0)
+        self._command(CMD_WRITE_ENABLE)
+        self.cs.value(1)
+
+    def jedec_id(self):
+        """Read the 3-byte JEDEC ID (EF 40 18 for a W25Q128)"""
+        self.cs.value(0)
+        self._command(CMD_JEDEC_ID)
+        data = self.spi.read(3)
+        self.cs.value(1)
+        return data
+
+    def read(self, addr, buf):
+        """Read len(buf) bytes starting at addr"""
+        self.cs.value(0)
+        self._command(CMD_READ_DATA, addr)
+        self.spi.readinto(buf)
+        self.cs.value(1)
+
+    def program(self, addr, data):
+        """Program bytes at addr (the area must be erased), split into pages"""
+        mv = memoryview(data)
+        done = 0
+        while done < len(mv):
+            # A single program operation must not cross a page boundary
+            n = min(PAGE_SIZE - (addr + done) % PAGE_SIZE, len(mv) - done)
+            self._write_enable()
+            self.cs.value(0)
+            self._command(CMD_PAGE_PROGRAM, addr + done)
+            self.spi.write(mv[done:done + n])
+            self.cs.value(1)
+            self._wait_ready()
+            done += n
+
+    def erase_sector(self, addr):
+        """Erase the 4KB sector containing addr (sets it to 0xFF)"""
+        self._write_enable()
+        self.cs.value(0)
+        self._command(CMD_SECTOR_ERASE, addr - addr % SECTOR_SIZE)
+        self.cs.value(1)
+        self._wait_ready()
+
+    def power_down(self):
+        self.cs.value(0)
+        self._command(CMD_POWER_DOWN)
+        self.cs.value(1)
+
+    def wake(self):
+        self.cs.value(0)
+        self._command(CMD_RELEASE_POWER_DOWN)
+        self.cs.value(1)
+        time.sleep_us(5)
+
+    # Block device protocol (extended interface, as used by LittleFS)
+
+    def readblocks(self, block_num, buf, offset=0):
+        self.read(block_num * SECTOR_SIZE + offset, buf)
+
+    def writeblocks(self, block_num, buf, offset=None):
+        if offset is None:
+            # Simple interface: erase whole blocks, then program them
+            for i in range(len(buf) // SECTOR_SIZE):
+                self.erase_sector((block_num + i) * SECTOR_SIZE)
+            offset = 0
+        self.program(block_num * SECTOR_SIZE + offset, buf)
+
+    def ioctl(self, op, arg):
+        if op == 4:  # Block count
+            return self.size // SECTOR_SIZE
+        if op == 5:  # Block size
+            return SECTOR_SIZE
+        if op == 6:  # Block erase
+            self.erase_sector(arg * SECTOR_SIZE)
+            return 0
+        return 0
@@ -0,0 +1,121 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_us, ticks_diff, split_fields, contains, UrcDispatcher # type: ignore
+from at_parse import parse, find, register, compile_spec, SPECS # type: ignore
+from registration import parse_registration # type: ignore
+from call import parse_clcc # type: ignore
+from modem_status import parse_status_lines # type: ignore
+import signal_monitor, inbox_sync, outbox # type: ignore  # register their specs
+
+# Typed AT parser test: field specs, optional fields, quoting, replies the
+# old substring checks got wrong, and parsing straight from a buffer.
+# Runs on the host (python3) or on the Pico.
+
+
+def test_specs():
+    assert compile_spec("d/xxd") == (b"dxxd", 1)
+    assert compile_spec("dd") == (b"dd", 2)
+    try:
+        compile_spec("dq")
+        assert False, "bad type accepted"
+    except ValueError:
+        pass
+
+    assert parse(b"+CSQ: 21,99", "dd") == (21, 99)
+    assert parse(b"+CSQ: 21", "dd") is None             # Required field missing
+    assert parse(b"+CSQ: 2x,99", "dd") is None          # Not a number
+    assert parse(b"+CSQ: 21,99", "d") == (21,)          # Extra fields ignored
+    assert parse(b"+CREG: 1", "d/xxd") == (1, None, None, None)
+    assert parse(b'+CREG: 5,"00fe","0a1B2",7', "d/xxd") == (5, 0xFE, 0xA1B2, 7)
+    assert parse(b"+CCLK: -4", "d") == (-4,)
+    # Quoted commas are data; empty quotes are an empty string
+    assert parse(b'+CMGL: 1,"REC READ","+1555",,"26/10/17,12:05:00-28"', "ds/sss") == \
+        (1, b"REC READ", b"+1555", None, b"26/10/17,12:05:00-28")
+    assert parse(b'+CLIP: "",128', "s/d") == (b"", 128)
+    # Lines without a prefix (e.g. text after a prompt) start at field one
+    assert parse(b'"SM",3', "sd") == (b"SM", 3)
+    print("Field specs ✓")
+
+
+def test_registered():
+    # Modules register their prefixes on import
+    for prefix in (b"+CSQ:", b"+CREG:", b"+CEREG:", b"+CLCC:", b"+CLIP:", b"+CMTI:", b"+CMGS:"):
+        assert prefix in SPECS, prefix
+    assert parse(b'+CMTI: "SM",12') == (b"SM", 12)
+    assert parse(b"+CMGS: 17") == (17, None)
+    assert parse(b"+UNKNOWN: 1") is None
+    register("+QTEST:", "dx")
+    assert parse(b'+QTEST: 3,"ff"') == (3, 255)
+    del SPECS[b"+QTEST:"]
+    lines = [b"AT+CMGS=20", b"> ", b"+CMGS: 42", b"", b"OK"]
+    assert find(lines, b"+CMGS:") == (42, None)
+    assert find(lines, "+CSQ:") is None
+    print("Registered specs ✓")
+
+
+def test_substring_pitfalls():
+    # "+CREG: 0,1" not in response missed replies with <n> = 2
+    assert parse_registration(b'+CREG: 2,1,"1A2B","00C3F",7', solicited=True) == (1, 0x1A2B, 0xC3F, 7)
+    assert parse_registration(b"+CREG: 0,1", solicited=True) == (1, None, None, None)
+    assert parse_registration(b"+CREG: 0,5", solicited=True)[0] == 5
+    assert parse_registration(b"+CEREG: 2", solicited=True) is None
+    # "0,0" in response matched inside phone numbers
+    call = parse_clcc(b'+CLCC: 1,1,4,0,0,"+1555000,0123",145,""')
+    assert call['stat'] == 4 and call['state'] == "incoming", call
+    assert call['number'] == "+1555000,0123" and call['type'] == 145 and call['name'] == ""
+    assert parse_clcc(b"+CLCC: 1,0,0,0,0")['state'] == "active"
+    assert parse_clcc(b"+CLCC: 1,0") is None
+
+    values = parse_status_lines([b"+CPIN: READY", b"+CSQ: 18,99", b"+CREG: 2,5,\"1A\",\"2B\"",
+                                 b"+CEREG: 0,1", b'+COPS: 0,0,"T-Mobile",7', b"+CGATT: 0", b"OK"])
+    assert values["sim"] == "READY" and values["rssi"] == 18 and values["creg"] == 5, values
+    assert values["cereg"] == 1 and values["operator"] == "T-Mobile" and values["act"] == 7, values
+    assert values["attached"] is False, values
+    print("Substring pitfalls ✓")
+
+
+def test_buffer():
+    # Lines are parsed in place from the receive buffer
+    buf = bytearray(b'\r\n+CLCC: 1,0,3,0,0,"+15551234567",145,"Alice"\r\n')
+    line = memoryview(buf)[2:-2]
+    call = parse_clcc(line)
+    assert call['state'] == "alerting" and call['name'] == "Alice", call
+    assert parse_registration(memoryview(b'+CEREG: 1,"00FE","0A1B2C3",7')) == (1, 0xFE, 0xA1B2C3, 7)
+
+    # Text mode +CDS is one line, PDU mode waits for the PDU line
+    assert contains(memoryview(b"+CDS: 6,41"), 0x2C) and not contains(memoryview(b"+CDS: 25"), 0x2C)
+    urc = UrcDispatcher()
+    reports = []
+    urc.on_urc("+CDS:", reports.append)
+    assert urc.dispatch(memoryview(b'+CDS: 6,41,"+15551234567",145'))
+    assert urc.dispatch(memoryview(b"+CDS: 25")) and len(reports) == 1
+    assert urc.dispatch(memoryview(b"0006290B915155214365F7"))
+    assert reports[1] == b"+CDS: 25\r\n0006290B915155214365F7", reports
+
+    line = b'+CLCC: 1,0,0,0,0,"+15551234567",145,"Alice"'
+    runs = 2000
+    start = ticks_us()
+    for _ in range(runs):
+        parse(line, "ddddd/sds")
+    typed = ticks_diff(ticks_us(), start)
+    start = ticks_us()
+    for _ in range(runs):
+        fields = split_fields(line)
+        (int(fields[0]), int(fields[1]), int(fields[2]), int(fields[3]), int(fields[4]),
+         fields[5].decode(), int(fields[6]), fields[7].decode())
+    split = ticks_diff(ticks_us(), start)
+    print(f"+CLCC parse: {typed / runs:.1f} us typed, {split / runs:.1f} us split/convert")
+    print("Buffer parsing ✓")
+
+
+def run_test():
+    print("=== Typed AT Parser Test ===")
+    test_specs()
+    test_registered()
+    test_substring_pitfalls()
+    test_buffer()
+    print("\n✓ AT parser test completed")
+
+
+if __name__ == "__main__":
+    run_test()
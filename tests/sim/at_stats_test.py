@@ -0,0 +1,114 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, CTRL_Z # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from at_stats import ModemStats, bucket, BUCKETS, modem_stats # type: ignore
+from fake_uart import ScriptedUART
+
+# Per-verb AT latency statistics test: first byte and final result times
+# land in the right log buckets for the blocking and the asyncio modem,
+# timeouts are counted apart, and snapshots survive a save/load.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+STATS_PATH = "at_stats_test.json"
+
+SCRIPT = [
+    (b"AT+CSQ", [(20, b"\r\n+CSQ: 21,99\r\n\r\nOK\r\n")]),
+    (b"AT+COPS?", [(120, b'\r\n+COPS: 0,0,"T-Mobile",7\r\n\r\nOK\r\n')]),
+    (b"AT+CMGS=", [(10, b"\r\n> ")]),
+    (b"ATD", [(40, b"\r\nOK\r\n")]),
+    (b"AT+SLOW", []),
+]
+
+
+class PayloadUART(ScriptedUART):
+    """Answers the PDU written after the '>' prompt once Ctrl+Z arrives"""
+    def write(self, data):
+        if data == CTRL_Z:
+            self.schedule(300, b"\r\n+CMGS: 7\r\n\r\nOK\r\n")
+            return 1
+        if isinstance(data, str):
+            data = data.encode()
+        if not bytes(data).strip().upper().startswith(b"AT"):
+            self.tx.extend(data)
+            return len(data)
+        return super().write(data)
+
+
+def remove_file():
+    import os
+    try:
+        os.remove(STATS_PATH)
+    except OSError:
+        pass
+
+
+def check_ms(stats, verb, low, high, first_high=None):
+    verb_stats = stats.verbs[verb]
+    p50 = verb_stats.final.percentile_ms(50)
+    assert low <= p50 <= high, (verb, p50)
+    if first_high is not None:
+        first = verb_stats.first.percentile_ms(50)
+        assert first <= first_high, (verb, first)
+
+
+def test_blocking():
+    stats = ModemStats()
+    modem = Modem(PayloadUART(SCRIPT), verbose=False, stats=stats)
+    for _ in range(5):
+        modem.command("AT+CSQ")
+        modem.command("AT+COPS?")
+    modem.command("AT+CMGS=20")
+    modem.write(b"0011000B915155214365F70000AA05E8329BFD06")
+    modem.write(CTRL_Z)
+    modem.read_response(5)
+    modem.command("ATD+15551230000;")
+    assert modem.command("AT+SLOW", 0.1)[0] == "TIMEOUT"
+
+    assert set(stats.verbs) == {"+CSQ", "+COPS", "+CMGS", "D", "+SLOW"}, stats.verbs
+    check_ms(stats, "+CSQ", 16, 64, first_high=8)       # Echo comes first
+    check_ms(stats, "+COPS", 100, 260)
+    check_ms(stats, "+CMGS", 260, 600)                  # Through the payload
+    assert stats.verbs["+CSQ"].results == {"OK": 5}
+    assert stats.verbs["+SLOW"].results == {"TIMEOUT": 1}
+    assert stats.verbs["+SLOW"].final.count == 0
+    return stats
+
+
+async def test_async():
+    stats = ModemStats()
+    modem = AsyncModem(PayloadUART(SCRIPT), stats=stats)
+    modem.start()
+    for _ in range(5):
+        await modem.command("AT+CSQ")
+    await modem.command("AT+CMGS=20", 5, b"0011000B915155214365F70000AA05E8329BFD06")
+    await modem.command("AT+SLOW", 0.1)
+    modem.stop()
+    check_ms(stats, "+CSQ", 16, 64, first_high=8)
+    check_ms(stats, "+CMGS", 260, 600)
+    assert stats.verbs["+SLOW"].results == {"TIMEOUT": 1}
+    return stats
+
+
+def run_test():
+    print("=== AT Latency Statistics Test ===")
+    assert [bucket(us) for us in (0, 1, 2, 3, 1000, 1 << 30)] == [0, 1, 2, 2, 10, BUCKETS - 1]
+    stats = test_blocking()
+    modem_stats(stats)
+    async_stats = asyncio.run(test_async())
+    print()
+    modem_stats(async_stats)
+
+    # Snapshots merge into the totals of a new session
+    remove_file()
+    stats.save(STATS_PATH)
+    restored = ModemStats()
+    assert restored.load(STATS_PATH) and restored.load(STATS_PATH)
+    assert restored.verbs["+CSQ"].final.count == 10
+    assert restored.verbs["+CSQ"].results == {"OK": 10}
+    remove_file()
+    print("\n✓ AT latency statistics test completed")
+
+
+if __name__ == "__main__":
+    run_test()
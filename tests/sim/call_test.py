@@ -0,0 +1,100 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem_async import AsyncModem, asyncio # type: ignore
+from call import CallStateMachine, DIALING, ACTIVE, INCOMING, ENDED # type: ignore
+from sim7600_emulator import SIM7600Emulator
+
+# Call state machine test: an incoming call from RING / +CLIP alone, one
+# answered with +CLCC reports and hung up by the remote side, and
+# outgoing calls that connect or fail to dial.
+# Runs against the SIM7600G emulator, on the host (python3) or on the Pico.
+
+CALLER = "+15551234567"
+
+
+async def wait_for(condition, timeout_ms=3000):
+    for _ in range(timeout_ms // 10):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def setup():
+    # Rings every 150 ms instead of 3 s
+    uart = SIM7600Emulator(time_scale=0.05)
+    modem = AsyncModem(uart)
+    modem.start()
+    call = CallStateMachine(modem)
+    states = []
+    call.on_change(lambda old, new, machine: states.append((new, machine.number)))
+    return uart, modem, call, states
+
+
+async def test_ring_clip():
+    # Without +CLCC reports: RING and +CLIP only
+    uart, modem, call, states = setup()
+    result, _ = await modem.command("AT+CLIP=1")
+    assert result == "OK"
+    uart.incoming_call(CALLER, rings=2)
+    assert await wait_for(lambda: call.state == INCOMING and call.number == CALLER), states
+    assert call.incoming and call.in_call()
+    # The caller gives up: NO CARRIER ends it
+    assert await wait_for(lambda: call.state == ENDED), states
+    # Listeners still see who called; the machine is cleared afterwards
+    assert states[0][0] == INCOMING and states[-1] == (ENDED, CALLER), states
+    assert not call.in_call() and call.call_id is None and call.number == ""
+    modem.stop()
+    print("Incoming call from RING / +CLIP ✓")
+
+
+async def test_answer_remote_hangup():
+    uart, modem, call, states = setup()
+    assert await call.enable()
+    uart.incoming_call(CALLER, rings=20, hangup=False)
+    assert await wait_for(lambda: call.state == INCOMING and call.number == CALLER), states
+    assert call.call_id == 1
+    assert await call.answer()
+    assert await wait_for(lambda: call.state == ACTIVE), states
+    assert call.number == CALLER and call.incoming
+    uart.remote_hangup()
+    assert await wait_for(lambda: call.state == ENDED), states
+    assert [state for state, _ in states] == [INCOMING, ACTIVE, ENDED], states
+    assert call.number == "" and call.call_id is None
+    modem.stop()
+    print("Answered, remote hangup ✓")
+
+
+async def test_dial():
+    uart, modem, call, states = setup()
+    assert await call.enable()
+    # Not registered: ATD answers NO CARRIER
+    uart.reg_stat = 0
+    assert not await call.dial("+15559876543")
+    assert states == [(DIALING, "+15559876543"), (ENDED, "+15559876543")], states
+    assert not call.in_call()
+
+    # Registered: dialing, answered by the remote side, hung up here
+    uart.reg_stat = 1
+    states.clear()
+    assert await call.dial("+15559876543")
+    assert call.state == DIALING
+    assert await wait_for(lambda: call.state == ACTIVE), states
+    assert await call.hangup()
+    assert call.state == ENDED and [state for state, _ in states] == [DIALING, ACTIVE, ENDED], states
+    await asyncio.sleep(0.05)
+    assert call.state == ENDED and not uart.calls    # The late +CLCC report changes nothing
+    modem.stop()
+    print("Dialing, failed dial ✓")
+
+
+async def run_test():
+    print("=== Call State Machine Test ===")
+    await test_ring_clip()
+    await test_answer_remote_hangup()
+    await test_dial()
+    print("\n✓ Call state machine test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,212 @@
+import sys
+sys.path.insert(0, '../../hw')
+import gc
+from modem import Modem, ticks_ms, ticks_diff, RESULT_OK, RESULT_PROMPT, CTRL_Z # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from modem_status import ModemStatus # type: ignore
+from message_store import MessageStore # type: ignore
+from inbox_sync import InboxSync # type: ignore
+from sms import list_messages # type: ignore
+from sms_pdu import encode_submit # type: ignore
+from call import CallStateMachine, INCOMING, ENDED # type: ignore
+from registration import RegistrationTracker # type: ignore
+from gnss import GnssService # type: ignore
+from at_parse import find # type: ignore
+from sim7600_emulator import SIM7600Emulator
+
+# Load test of the modem layer against the SIM7600G emulator: SMS bursts,
+# a full storage listing, call storms, garbled and slow replies and a fast
+# GNSS stream. Prints throughput and peak memory for each scenario.
+# Runs on the host (python3) or on the Pico.
+
+STORE_PATH = "emulator_load_test.jsonl"
+BURST = 300
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class Memory:
+    """Peak heap use of a scenario (tracemalloc on CPython, gc on the Pico)"""
+
+    def __enter__(self):
+        gc.collect()
+        if tracemalloc:
+            tracemalloc.start()
+        else:
+            self.free = gc.mem_free()
+            self.low = self.free
+        return self
+
+    def sample(self):
+        if not tracemalloc:
+            self.low = min(self.low, gc.mem_free())
+
+    def __exit__(self, *exc):
+        if tracemalloc:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            self.peak = self.free - self.low
+        return False
+
+
+def remove_store():
+    import os
+    try:
+        os.remove(STORE_PATH)
+    except OSError:
+        pass
+
+
+async def sms_burst():
+    remove_store()
+    uart = SIM7600Emulator()
+    modem = AsyncModem(uart)
+    modem.start()
+    inbox = InboxSync(modem, MessageStore(STORE_PATH))
+    assert await inbox.enable()
+    inbox.start()
+    with Memory() as memory:
+        start = ticks_ms()
+        uart.sms_burst(BURST, spacing_ms=2)
+        while ticks_diff(ticks_ms(), start) < 60000:
+            await asyncio.sleep(0.01)
+            memory.sample()
+            if not uart.timers and not inbox.pending:
+                break
+        elapsed = ticks_diff(ticks_ms(), start)
+    inbox.stop()
+    modem.stop()
+    stored = sum(1 for _ in MessageStore(STORE_PATH).messages())
+    # Arrivals faster than the fetch loop overflow the module's storage;
+    # everything that was stored must reach flash and leave the SIM
+    assert stored + uart.dropped_sms == BURST and not uart.messages, \
+        (stored, uart.dropped_sms, len(uart.messages))
+    remove_store()
+    print(f"SMS burst: {stored}/{BURST} messages fetched, stored and deleted in {elapsed} ms "
+          f"({stored * 1000 // max(elapsed, 1)}/s), {uart.dropped_sms} lost to full storage, "
+          f"peak {memory.peak // 1024} KB")
+
+
+def storage_listing():
+    uart = SIM7600Emulator()
+    uart.sms_burst(250, spacing_ms=0)
+    modem = Modem(uart, verbose=False)
+    modem.command("AT")
+    with Memory() as memory:
+        start = ticks_ms()
+        count = 0
+        for record in list_messages(modem):
+            count += 1
+            memory.sample()
+        elapsed = ticks_diff(ticks_ms(), start)
+    assert count == 250 and modem.last_result == RESULT_OK, (count, modem.last_result)
+    print(f"Listing: {count} stored messages in {elapsed} ms, peak {memory.peak // 1024} KB")
+
+
+def sms_sending():
+    uart = SIM7600Emulator()
+    uart.latency["+CMGS"] = 20
+    modem = Modem(uart, verbose=False)
+    start = ticks_ms()
+    parts = 0
+    for i in range(20):
+        for pdu, length in encode_submit("+15551230000", f"Load test {i} " * (i + 1)):
+            result, _ = modem.command(f"AT+CMGS={length}", 3)
+            assert result == RESULT_PROMPT, result
+            modem.write(pdu)
+            modem.write(CTRL_Z)
+            result, response = modem.read_response(timeout=5)
+            assert result == RESULT_OK and find(response.split(b"\r\n"), b"+CMGS:", "d"), response
+            parts += 1
+    elapsed = ticks_diff(ticks_ms(), start)
+    assert len(uart.sent) == parts
+    print(f"Sending: {parts} PDUs accepted in {elapsed} ms")
+
+
+async def call_storm():
+    uart = SIM7600Emulator(time_scale=0.01)
+    modem = AsyncModem(uart)
+    modem.start()
+    call = CallStateMachine(modem)
+    transitions = []
+    call.on_change(lambda old, new, m: transitions.append(new))
+    assert await call.enable()
+    with Memory() as memory:
+        # Two rings take 60 ms at this time scale: one caller after another,
+        # with room for timer jitter on a loaded host
+        uart.call_storm(50, spacing_ms=150, rings=2)
+        while len(transitions) < 100 or uart.calls:
+            await asyncio.sleep(0.01)
+            memory.sample()
+        assert transitions.count(INCOMING) == 50 and transitions.count(ENDED) == 50, transitions
+        # Overlapping callers: the machine must still end up idle
+        uart.call_storm(50, spacing_ms=10, rings=2)
+        await asyncio.sleep(0.05)
+        while uart.calls or uart.timers:
+            await asyncio.sleep(0.01)
+            memory.sample()
+        await asyncio.sleep(0.02)
+    modem.stop()
+    assert not call.in_call(), call.state
+    print(f"Call storm: 100 abandoned calls tracked ({len(transitions)} transitions), peak {memory.peak // 1024} KB")
+
+
+def garbled_status():
+    uart = SIM7600Emulator()
+    uart.garble_rate = 0.05
+    uart.slow_ms = 20
+    modem = Modem(uart, verbose=False)
+    status = ModemStatus(modem, timeout=2)
+    start = ticks_ms()
+    complete = 0
+    for _ in range(50):
+        snapshot = status.snapshot()
+        if snapshot.imsi == "310260123456789" and snapshot.operator == "T-Mobile":
+            complete += 1
+    elapsed = ticks_diff(ticks_ms(), start)
+    assert complete >= 35, complete
+    print(f"Garbled replies: {uart.garbled} chunks corrupted, {complete}/50 status "
+          f"snapshots intact, {elapsed} ms")
+
+
+async def registration_and_gnss():
+    uart = SIM7600Emulator(time_scale=0.005)
+    modem = AsyncModem(uart)
+    modem.start()
+    tracker = RegistrationTracker(modem)
+    assert await tracker.enable()
+    assert tracker.registered()
+    uart.set_registration(2, delay_ms=10)
+    uart.set_registration(1, delay_ms=50)
+    await asyncio.sleep(0.02)
+    assert not tracker.registered()
+    assert await tracker.wait_registered(1)
+
+    gnss = GnssService(modem)
+    fixes = []
+    gnss.subscribe(lambda fix: fixes.append(fix.lat))
+    assert await gnss.start_async()
+    await asyncio.sleep(1)
+    await gnss.stop_async()
+    modem.stop()
+    assert len(fixes) > 100 and fixes == sorted(fixes), len(fixes)
+    print(f"GNSS: {gnss.reports} reports in 1 s, {len(fixes)} fixes parsed")
+
+
+async def run_test():
+    print("=== SIM7600G Emulator Load Test ===")
+    await sms_burst()
+    storage_listing()
+    sms_sending()
+    await call_storm()
+    garbled_status()
+    await registration_and_gnss()
+    print("\n✓ Emulator load test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
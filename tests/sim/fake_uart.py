@@ -0,0 +1,114 @@
+# Scripted stand-in for machine.UART
+#
+# Replies to AT commands with canned byte chunks released after a delay, so
+# the modem transport can be exercised and benchmarked without a SIM7600G.
+# Runs on CPython and on MicroPython.
+
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_ms, ticks_diff, ticks_add # type: ignore
+
+FIFO_SIZE = 32      # Pico UART RX FIFO
+
+
+class ScriptedUART:
+    def __init__(self, script, echo=True, baudrate=115200, max_baudrate=None):
+        """
+        Args:
+            script: list of (command_prefix, [(delay_ms, bytes), ...]) tuples.
+                    The longest matching prefix answers a written command;
+                    delays are measured from the moment the command is written.
+            echo: echo commands back like the SIM7600G does with ATE1
+            baudrate: line rate, used to add wire time to every reply
+            max_baudrate: fastest rate the emulated wiring carries without
+                          flow control; faster replies that do not fit
+                          the RX FIFO are overrun
+        """
+        self.script = sorted(script, key=lambda entry: -len(entry[0]))
+        self.echo = echo
+        self.baudrate = baudrate            # Pico side
+        self.module_baudrate = baudrate     # SIM7600G side, changed by AT+IPR
+        self.max_baudrate = max_baudrate
+        self.flow = False
+        self.pending = []   # (release_ticks_ms, bytes) in release order
+        self.rx = bytearray()
+        self.tx = bytearray()
+        self.writes = 0
+
+    def init(self, baudrate=None, flow=None, **kwargs):
+        if baudrate:
+            self.baudrate = baudrate
+        if flow is not None:
+            self.flow = bool(flow)
+        self.pending = []
+        self.rx = bytearray()
+
+    def schedule(self, delay_ms, data):
+        """Queue bytes to be released to the reader after delay_ms"""
+        # 10 bits per byte on the wire
+        delay_ms += len(data) * 10000 // self.module_baudrate
+        due = ticks_add(ticks_ms(), delay_ms)
+        self.pending.append((due, bytes(data)))
+        self.pending.sort(key=lambda item: ticks_diff(item[0], due))
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.tx.extend(data)
+        self.writes += 1
+
+        line = bytes(data).strip()
+        if not line.upper().startswith(b"AT"):
+            return len(data)
+
+        # Mismatched rates turn everything into noise
+        if self.baudrate != self.module_baudrate:
+            self.schedule(2, b"\xf8\x80\x00\xfe")
+            return len(data)
+        if line.startswith(b"AT+IPR="):
+            self.schedule(2, b"\r\nOK\r\n")
+            self.module_baudrate = int(line[7:])
+            return len(data)
+        replies = [(5, b"\r\nERROR\r\n")]
+        for prefix, script_replies in self.script:
+            if line.startswith(prefix):
+                replies = script_replies
+                break
+        # Too fast for the wiring: commands arrive, replies longer than the
+        # RX FIFO are overrun unless RTS/CTS holds the module back
+        if (self.max_baudrate and self.baudrate > self.max_baudrate and not self.flow
+                and len(line) + sum(len(reply) for _, reply in replies) > FIFO_SIZE):
+            self.schedule(2, b"\r\nO\xf8\x80\r")
+            return len(data)
+
+        if self.echo:
+            self.schedule(0, line + b"\r\r\n")
+        for delay_ms, reply in replies:
+            self.schedule(delay_ms, reply)
+        return len(data)
+
+    def _release(self):
+        now = ticks_ms()
+        while self.pending and ticks_diff(now, self.pending[0][0]) >= 0:
+            self.rx.extend(self.pending.pop(0)[1])
+
+    def any(self):
+        self._release()
+        return len(self.rx)
+
+    def read(self, n=None):
+        self._release()
+        if not self.rx:
+            return None
+        if n is None or n > len(self.rx):
+            n = len(self.rx)
+        data = bytes(self.rx[:n])
+        self.rx = self.rx[n:]
+        return data
+
+    def readinto(self, buf, n=None):
+        data = self.read(len(buf) if n is None else min(n, len(buf)))
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
@@ -0,0 +1,88 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, sleep_ms # type: ignore
+from gnss import GnssService, Fix, parse_cgpsinfo, FIELD_COUNT # type: ignore
+from fake_uart import ScriptedUART
+try:
+    from array import array
+except ImportError:
+    from uarray import array
+
+# GNSS auto-report parser and service test.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+FIX_LINE = b"+CGPSINFO: 3113.343286,N,12121.234064,E,250311,072809.3,44.1,12.5,273.45"
+SOUTH_WEST = b"+CGPSINFO: 3352.128400,S,15112.934200,W,010126,235959.0,-12.3,0.0,0.0"
+NO_FIX = b"+CGPSINFO: ,,,,,,,,"
+
+SCRIPT = [
+    (b"AT+CGPS=1", [(10, b"\r\nOK\r\n")]),
+    (b"AT+CGPSINFO=1", [(5, b"\r\nOK\r\n"),
+                        (30, b"\r\n" + NO_FIX + b"\r\n"),
+                        (60, b"\r\n" + FIX_LINE + b"\r\n"),
+                        (90, b"\r\n" + SOUTH_WEST + b"\r\n")]),
+    (b"AT+CGPSINFO=0", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CGPS=0", [(5, b"\r\nOK\r\n")]),
+]
+
+
+def test_parse():
+    fix = Fix()
+    spans = array('H', [0] * (2 * FIELD_COUNT))
+    assert parse_cgpsinfo(memoryview(FIX_LINE), fix, spans)
+    assert fix.lat == 31222388, fix.lat         # 31 deg 13.343286 min
+    assert fix.lon == 121353901, fix.lon        # 121 deg 21.234064 min
+    assert fix.alt == 4410 and fix.course == 27345
+    assert fix.speed == 643, fix.speed          # 12.5 kn
+    assert (fix.year, fix.month, fix.day) == (2011, 3, 25)
+    assert fix.time_ms == (7 * 3600 + 28 * 60 + 9) * 1000 + 300
+
+    assert parse_cgpsinfo(SOUTH_WEST, fix, spans)
+    assert fix.lat == -33868806 and fix.lon == -151215570, (fix.lat, fix.lon)
+    assert fix.alt == -1230
+
+    assert not parse_cgpsinfo(NO_FIX, fix, spans)
+    assert not fix.valid
+    print("Parser: fixed-point values match")
+
+
+def test_no_allocation():
+    # Only measurable on MicroPython, where small ints never allocate
+    import gc
+    if not hasattr(gc, "mem_alloc"):
+        print("Allocation check skipped (not MicroPython)")
+        return
+    fix = Fix()
+    spans = array('H', [0] * (2 * FIELD_COUNT))
+    line = memoryview(FIX_LINE)
+    parse_cgpsinfo(line, fix, spans)
+    gc.collect()
+    before = gc.mem_alloc()
+    for _ in range(100):
+        parse_cgpsinfo(line, fix, spans)
+    assert gc.mem_alloc() == before, gc.mem_alloc() - before
+    print("Parser: 100 fixes without heap allocation")
+
+
+def test_service():
+    uart = ScriptedUART(SCRIPT)
+    modem = Modem(uart, verbose=False)
+    gnss = GnssService(modem)
+    fixes = []
+    gnss.subscribe(lambda fix: fixes.append(fix.copy_to(Fix())))
+    assert gnss.start(interval=1)
+    for _ in range(30):
+        modem.poll()
+        sleep_ms(5)
+    assert gnss.stop()
+    assert gnss.reports == 3, gnss.reports
+    assert [fix.lat for fix in fixes] == [31222388, -33868806], fixes
+    print(f"Service: {gnss.reports} reports, {len(fixes)} fixes published: {fixes[0]}")
+
+
+if __name__ == "__main__":
+    print("=== GNSS Test ===")
+    test_parse()
+    test_no_allocation()
+    test_service()
+    print("\n✓ GNSS test completed")
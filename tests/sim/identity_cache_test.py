@@ -0,0 +1,106 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, sleep_ms # type: ignore
+from identity_cache import IdentityCache # type: ignore
+from fake_uart import ScriptedUART
+
+# Identity cache test: the first boot queries everything, later boots only
+# check the ICCID, a swapped SIM is re-read (at boot or after SIM URCs)
+# and a corrupt cache file is ignored.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+CACHE_PATH = "identity_test.json"
+
+IMEI = b"862636050123456"
+SIM_A = (b"8901260123456789012F", b"310260123456789")
+SIM_B = (b"8944100000000000001F", b"234100000000001")
+
+
+def script(sim):
+    iccid, imsi = sim
+    return [
+        (b"AT+CICCID;+CIMI;+CGSN", [(10, b"\r\n+ICCID: " + iccid + b"\r\n\r\n" + imsi +
+                                    b"\r\n\r\n" + IMEI + b"\r\n\r\nOK\r\n")]),
+        (b"AT+CICCID", [(5, b"\r\n+ICCID: " + iccid + b"\r\n\r\nOK\r\n")]),
+        (b"AT+CIMI", [(5, b"\r\n" + imsi + b"\r\n\r\nOK\r\n")]),
+    ]
+
+
+def remove_cache():
+    import os
+    for path in (CACHE_PATH, CACHE_PATH + ".tmp"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def commands(uart):
+    return bytes(uart.tx).split()
+
+
+def test_boots():
+    remove_cache()
+    uart = ScriptedUART(script(SIM_A))
+    modem = Modem(uart, verbose=False)
+
+    # First boot: one chained query fills the cache
+    identity = IdentityCache(CACHE_PATH).get(modem)
+    assert identity == {"iccid": SIM_A[0].decode(), "imsi": SIM_A[1].decode(),
+                        "imei": IMEI.decode()}, identity
+    assert commands(uart) == [b"AT+CICCID;+CIMI;+CGSN"], commands(uart)
+
+    # Next boot, same SIM: only the ICCID is checked, once
+    uart.tx = bytearray()
+    cache = IdentityCache(CACHE_PATH)
+    assert cache.get(modem) == identity and cache.get(modem) == identity
+    assert commands(uart) == [b"AT+CICCID"], commands(uart)
+    print("Cache hit: one AT+CICCID per boot ✓")
+
+    # Swapped while off: the ICCID differs, so the new IMSI is read
+    uart.tx = bytearray()
+    uart.script = script(SIM_B)
+    identity = IdentityCache(CACHE_PATH).get(modem)
+    assert identity["iccid"] == SIM_B[0].decode() and identity["imsi"] == SIM_B[1].decode()
+    assert commands(uart) == [b"AT+CICCID", b"AT+CIMI"], commands(uart)
+
+    # Swapped back while running: the URCs force a check, and the SIM
+    # seen before needs no +CIMI
+    uart.tx = bytearray()
+    uart.script = script(SIM_A)
+    cache = IdentityCache(CACHE_PATH)
+    cache.get(modem)
+    uart.schedule(0, b"\r\n+SIMCARD: NOT AVAILABLE\r\n")
+    uart.schedule(0, b"\r\n+CPIN: READY\r\n")
+    sleep_ms(20)
+    modem.poll()
+    assert not cache.verified and cache.cached() is None
+    identity = cache.get(modem)
+    assert identity["iccid"] == SIM_A[0].decode() and identity["imsi"] == SIM_A[1].decode()
+    assert commands(uart) == [b"AT+CICCID", b"AT+CICCID"], commands(uart)
+    print("SIM swap ✓")
+
+
+def test_invalid_file():
+    with open(CACHE_PATH, "w") as f:
+        f.write('{"imei": "8626')       # Cut short
+    uart = ScriptedUART(script(SIM_A))
+    modem = Modem(uart, verbose=False)
+    cache = IdentityCache(CACHE_PATH)
+    assert cache.cached() is None
+    assert cache.get(modem)["imei"] == IMEI.decode()
+    assert commands(uart) == [b"AT+CICCID;+CIMI;+CGSN"], commands(uart)
+    assert IdentityCache(CACHE_PATH).cached() == cache.cached()
+    remove_cache()
+    print("Invalid cache file ✓")
+
+
+def run_test():
+    print("=== Identity Cache Test ===")
+    test_boots()
+    test_invalid_file()
+    print("\n✓ Identity cache test completed")
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,108 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem_async import AsyncModem, asyncio # type: ignore
+from message_store import MessageStore # type: ignore
+from inbox_sync import InboxSync # type: ignore
+from fake_uart import ScriptedUART
+from sim7600_emulator import deliver_pdus
+
+# +CMTI-driven inbox sync test.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+STORE_PATH = "inbox_sync_test.jsonl"
+DELIVER_HEX = b"07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07"
+# Same sender, one second later: "hellohello"
+SECOND_HEX = b"07911326040000F0040B911346610089F60000208062917324080AE8329BFD4697D9EC37"
+
+SCRIPT = [
+    (b"AT+CMGF=0", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CNMI=", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CPMS=", [(5, b"\r\n+CPMS: 2,50,2,50,2,50\r\n\r\nOK\r\n")]),
+    (b"AT+CMGL=0", [(20, b"\r\n+CMGL: 1,0,,39\r\n%s\r\n\r\nOK\r\n" % DELIVER_HEX)]),
+    (b"AT+CMGR=1", [(20, b"\r\n+CMGR: 1,,39\r\n%s\r\n\r\nOK\r\n" % DELIVER_HEX)]),
+    (b"AT+CMGR=2", [(20, b"\r\n+CMGR: 0,,36\r\n%s\r\n\r\nOK\r\n" % SECOND_HEX)]),
+    (b"AT+CMGR=7", [(10, b"\r\n+CMS ERROR: 321\r\n")]),
+    (b"AT+CMGD=", [(15, b"\r\nOK\r\n")]),
+    # Index 9 never reads back
+    (b"AT+CMGR=9", [(10, b"\r\n+CMS ERROR: 500\r\n")]),
+]
+THIRD_HEX = deliver_pdus("+15557654321", "Third try")[0]
+
+
+class FlakyUART(ScriptedUART):
+    """The first AT+CMGR=4 fails; the message is there on the next try"""
+    tries = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        if bytes(data).strip() == b"AT+CMGR=4":
+            self.tries += 1
+            self.script = [entry for entry in self.script if entry[0] != b"AT+CMGR=4"]
+            if self.tries == 1:
+                reply = b"\r\n+CMS ERROR: 500\r\n"
+            else:
+                reply = b"\r\n+CMGR: 0,,%d\r\n%s\r\n\r\nOK\r\n" % ((len(THIRD_HEX) - 2) // 2, THIRD_HEX)
+            self.script.insert(0, (b"AT+CMGR=4", [(10, reply)]))
+        return super().write(data)
+
+
+def remove_store():
+    import os
+    try:
+        os.remove(STORE_PATH)
+    except OSError:
+        pass
+
+
+async def run_test():
+    print("=== Inbox Sync Test ===")
+    remove_store()
+    uart = FlakyUART(SCRIPT)
+    modem = AsyncModem(uart)
+    modem.start()
+    received = []
+    inbox = InboxSync(modem, MessageStore(STORE_PATH), received.append, retry_delay=0.05)
+    assert await inbox.enable()
+
+    # Cold start: one unread message waiting on the SIM
+    assert await inbox.reconcile() == 1
+    assert [r['text'] for r in received] == ["How are you?"]
+
+    # New messages announced while the phone is running; index 1 is
+    # announced again, as after a crash before its AT+CMGD
+    inbox.start()
+    uart.schedule(0, b'\r\n+CMTI: "SM",2\r\n')
+    uart.schedule(5, b'\r\n+CMTI: "SM",7\r\n\r\n+CMTI: "SM",1\r\n')
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if not inbox.pending and len(received) >= 2:
+            break
+
+    # A failed read is retried behind newer messages; index 9 is given up
+    # on after FETCH_ATTEMPTS and stays on the SIM
+    uart.schedule(0, b'\r\n+CMTI: "SM",4\r\n\r\n+CMTI: "SM",9\r\n')
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if not inbox.pending and inbox.given_up:
+            break
+    inbox.stop()
+    modem.stop()
+    assert uart.tries == 2 and uart.tx.count(b"AT+CMGR=9") == 3
+    assert inbox.given_up == 1 and not inbox.failures
+
+    assert [r['text'] for r in received] == ["How are you?", "hellohello", "Third try"], received
+    stored = list(MessageStore(STORE_PATH).messages())
+    assert len(stored) == 3, stored
+    deletes = uart.tx.count(b"AT+CMGD=")
+    assert deletes == 4, deletes     # Reconcile, index 2, the duplicate index 1 and index 4
+    assert b"AT+CMGD=9" not in uart.tx
+    assert b"AT+CMGD=7" not in uart.tx
+    assert b"AT+CMGDA" not in uart.tx
+    print(f"Stored {len(stored)} messages, {deletes} slots deleted, duplicate skipped")
+    remove_store()
+    print("\n✓ Inbox sync test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,88 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem # type: ignore
+from location import LocationManager, fix_epoch # type: ignore
+from fake_uart import ScriptedUART
+
+# Location manager test: cached positions, hot/warm/cold start choice and
+# time-to-first-fix metrics.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+LOCATION_PATH = "location_test.json"
+FIX_LINE = b"\r\n+CGPSINFO: 3113.343286,N,12121.234064,E,250311,072809.3,44.1,0.0,0\r\n"
+
+SCRIPT = [
+    (b"AT+CGPSCOLD", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CGPSWARM", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CGPSHOT", [(5, b"\r\nOK\r\n")]),
+    # The first report comes 150 ms after the session starts
+    (b"AT+CGPSINFO=1", [(5, b"\r\nOK\r\n"), (150, FIX_LINE)]),
+    (b"AT+CGPSINFO=0", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CGPS=0", [(5, b"\r\nOK\r\n")]),
+]
+
+
+def remove_file():
+    import os
+    for path in (LOCATION_PATH, LOCATION_PATH + ".tmp"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def manager(clock=None):
+    uart = ScriptedUART(SCRIPT)
+    modem = Modem(uart, verbose=False)
+    if clock is None:
+        return uart, LocationManager(modem, path=LOCATION_PATH, ttl=60)
+    return uart, LocationManager(modem, path=LOCATION_PATH, ttl=60, clock=clock)
+
+
+def test_cold_then_cached():
+    uart, location = manager()
+    assert location.start_mode() == "cold"
+    fix = location.locate(timeout=2)
+    assert fix and fix.lat == 31222388
+    assert b"AT+CGPSCOLD" in uart.tx and b"AT+CGPS=0" in uart.tx
+
+    # Within the TTL the receiver is not touched
+    writes = uart.writes
+    assert location.locate(timeout=2) is fix
+    assert uart.writes == writes
+    count, fastest, _, _ = location.ttff_stats()["cold"]
+    assert count == 1 and 150 <= fastest < 300, fastest
+    print(f"Cold start: TTFF {fastest} ms, then served from cache")
+
+
+def test_start_modes_after_reboot():
+    fixed_at = fix_epoch(manager()[1].fix)
+
+    # Ten minutes later: ephemeris still valid
+    uart, location = manager(lambda: fixed_at + 600)
+    assert location.start_mode() == "hot"
+    assert location.cached() is None
+    assert location.locate(timeout=2)
+    assert b"AT+CGPSHOT" in uart.tx
+    assert location.ttff_stats()["hot"][0] == 1
+    assert location.ttff_stats()["cold"][0] == 1     # Samples survive the reboot
+
+    # A day later, and with an RTC that was reset
+    _, location = manager(lambda: fixed_at + 86400)
+    assert location.start_mode() == "warm"
+    _, location = manager(lambda: 0)
+    assert location.start_mode() == "warm"
+
+    # A month later: nothing useful is left
+    _, location = manager(lambda: fixed_at + 30 * 86400)
+    assert location.start_mode() == "cold"
+    print(f"Start modes after reboot: hot, warm, cold; TTFF {location.ttff_stats()}")
+
+
+if __name__ == "__main__":
+    print("=== Location Manager Test ===")
+    remove_file()
+    test_cold_then_cached()
+    test_start_modes_after_reboot()
+    remove_file()
+    print("\n✓ Location manager test completed")
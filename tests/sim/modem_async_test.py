@@ -0,0 +1,67 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem_async import AsyncModem, asyncio # type: ignore
+from fake_uart import ScriptedUART
+
+# URC demultiplexer test for the asyncio modem engine.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+SCRIPT = [
+    # A call and an SMS notification arrive while AT+COPS? is in flight
+    (b"AT+COPS?", [(20, b"\r\nRING\r\n\r\n+CLIP: \"+15551230000\",145,,,,0\r\n"),
+                   (40, b"\r\n+CMTI: \"SM\",3\r\n"),
+                   (120, b"\r\n+COPS: 0,0,\"T-Mobile\",7\r\n\r\nOK\r\n")]),
+    # +CREG is a URC, except as the answer to AT+CREG?
+    (b"AT+CREG?", [(10, b"\r\n+CREG: 2,1,\"1A2B\",\"01C3D4E5\",7\r\n\r\nOK\r\n")]),
+    (b"AT+CSQ", [(15, b"\r\n+CSQ: 21,99\r\n\r\nOK\r\n"),
+                 (30, b"\r\n+CREG: 5\r\n")]),
+    (b"AT+CMGS=", [(30, b"\r\n> ")]),
+    (b"AT+CMGR=3", [(20, b"\r\n+CMS ERROR: 321\r\n")]),
+]
+
+
+async def run_test():
+    print("=== Async Modem URC Test ===")
+    uart = ScriptedUART(SCRIPT)
+    modem = AsyncModem(uart)
+    seen = []
+    modem.on_urc("RING", lambda line: seen.append(line))
+    modem.on_urc("+CLIP:", lambda line: seen.append(line))
+    modem.on_urc("+CMTI:", lambda line: seen.append(line))
+    modem.on_urc("+CREG:", lambda line: seen.append(line))
+    modem.start()
+
+    # Commands queued together run one at a time, in order
+    results = await asyncio.gather(
+        modem.command("AT+COPS?"),
+        modem.command("AT+CREG?"),
+        modem.command("AT+CSQ"),
+    )
+    await asyncio.sleep(0.05)
+
+    assert results[0] == ("OK", [b'+COPS: 0,0,"T-Mobile",7']), results[0]
+    assert results[1] == ("OK", [b'+CREG: 2,1,"1A2B","01C3D4E5",7']), results[1]
+    assert results[2] == ("OK", [b"+CSQ: 21,99"]), results[2]
+    print(f"✓ Responses kept clean: {[r[1] for r in results]}")
+
+    assert seen == [b"RING", b'+CLIP: "+15551230000",145,,,,0',
+                    b'+CMTI: "SM",3', b"+CREG: 5"], seen
+    print(f"✓ URCs dispatched: {seen}")
+
+    writes = uart.tx.split(b"\r\n")
+    assert writes[:3] == [b"AT+COPS?", b"AT+CREG?", b"AT+CSQ"], writes
+    print("✓ Commands serialized in order")
+
+    # SMS body goes out after the prompt, and +CMS ERROR is a final code
+    result, _ = await modem.command('AT+CMGS="+15551230000"', timeout=0.2, payload="hi")
+    assert uart.tx.endswith(b"hi\x1a") and result == "TIMEOUT", (uart.tx, result)
+    request = await modem.request("AT+CMGR=3")
+    assert request.result == "ERROR" and request.final == b"+CMS ERROR: 321"
+    print("✓ Prompt payload and +CMS ERROR handled")
+
+    modem.stop()
+    print("\n✓ Async modem test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,117 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, ticks_ms, ticks_diff, RESULT_OK, RESULT_PROMPT # type: ignore
+from modem_status import ModemStatus, STATUS_COMMAND # type: ignore
+from fake_uart import ScriptedUART
+
+# Latency benchmark for the terminator-aware AT reader.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+# Reply timings roughly measured on a SIM7600G at 115200 baud
+SCRIPT = [
+    # The ten status queries chained on one line, as sent by ModemStatus
+    (STATUS_COMMAND.encode(), [(150, b"\r\n+CPIN: READY\r\n\r\n310260123456789\r\n"
+                                     b"\r\n+ICCID: 8901260123456789012F\r\n\r\n862636050123456\r\n"
+                                     b"\r\n+CSQ: 21,99\r\n\r\n+CREG: 0,1\r\n\r\n+CEREG: 0,1\r\n"
+                                     b"\r\n+COPS: 0,0,\"T-Mobile\",7\r\n\r\n+CGATT: 1\r\n"
+                                     b"\r\n+CPSI: LTE,Online,310-260,0x1234,56789012,123,EUTRAN-BAND2,900,5,5,-94,-1123,-807,15\r\n"),
+                               (200, b"\r\nOK\r\n")]),
+    (b"AT+CPIN?", [(15, b"\r\n+CPIN: READY\r\n\r\nOK\r\n")]),
+    (b"AT+CIMI", [(20, b"\r\n310260123456789\r\n\r\nOK\r\n")]),
+    (b"AT+CCID", [(25, b"\r\n+ICCID: 8901260123456789012F\r\n\r\nOK\r\n")]),
+    (b"AT+CGSN", [(15, b"\r\n862636050123456\r\n\r\nOK\r\n")]),
+    (b"AT+CSQ", [(20, b"\r\n+CSQ: 21,99\r\n\r\nOK\r\n")]),
+    (b"AT+CREG?", [(15, b"\r\n+CREG: 0,1\r\n\r\nOK\r\n")]),
+    (b"AT+CEREG?", [(15, b"\r\n+CEREG: 0,1\r\n\r\nOK\r\n")]),
+    (b"AT+COPS?", [(120, b'\r\n+COPS: 0,0,"T-Mobile",7\r\n\r\nOK\r\n')]),
+    (b"AT+CGATT?", [(30, b"\r\n+CGATT: 1\r\n\r\nOK\r\n")]),
+    (b"AT+CPSI?", [(40, b"\r\n+CPSI: LTE,Online,310-260,0x1234,56789012,123,EUTRAN-BAND2,900,5,5,-94,-1123,-807,15\r\n"),
+                   (45, b"\r\nOK\r\n")]),
+    (b"AT+CLCC", [(20, b'\r\n+CLCC: 1,0,0,0,0,"+15551230000",145\r\n\r\nOK\r\n')]),
+    (b"AT+CHUP", [(60, b"\r\nOK\r\n")]),
+    (b"AT+CMGS", [(80, b"\r\n> ")]),
+    (b"AT+CUSD", [(10, b"\r\n+CME ERROR: operation not supported\r\n")]),
+    (b"AT", [(10, b"\r\nOK\r\n")]),
+]
+
+# Commands issued by sim_test.run_comprehensive_test, with their timeouts
+COMPREHENSIVE = [
+    ("AT", 2), ("AT+CPIN?", 5), ("AT+CIMI", 5), ("AT+CCID", 5), ("AT+CGSN", 5),
+    ("AT+CSQ", 5), ("AT+CREG?", 5), ("AT+CEREG?", 5), ("AT+COPS?", 5),
+    ("AT+CGATT?", 5), ("AT+CPSI?", 3),
+]
+
+# Call-control style commands and the result each one must end with
+CALL_CONTROL = [
+    ("AT+CLCC", 3, RESULT_OK), ("AT+CHUP", 5, RESULT_OK),
+    ('AT+CMGS="+15551230000"', 3, RESULT_PROMPT), ("AT+CUSD=1", 5, "ERROR"),
+]
+
+ROUNDS = 5
+
+
+def legacy_cost_ms(timeout):
+    """The old reader always spun for the whole timeout, then slept 0.5 s"""
+    return int(timeout * 1000) + 500
+
+
+def bench(modem, command, timeout, expected):
+    """Run one command ROUNDS times, return (best_ms, worst_ms)"""
+    best = None
+    worst = 0
+    for _ in range(ROUNDS):
+        start = ticks_ms()
+        result, raw = modem.command(command, timeout)
+        elapsed = ticks_diff(ticks_ms(), start)
+        assert result == expected, f"{command}: expected {expected}, got {result} {raw}"
+        best = elapsed if best is None else min(best, elapsed)
+        worst = max(worst, elapsed)
+    return best, worst
+
+
+def run_benchmark():
+    print("=== AT Reader Latency Benchmark ===")
+    print(f"{ROUNDS} rounds per command against a scripted UART\n")
+
+    modem = Modem(ScriptedUART(SCRIPT), verbose=False)
+    print(f"{'command':<26}{'best':>8}{'worst':>8}{'legacy':>9}")
+
+    total_new = 0
+    total_legacy = 0
+    cases = [(cmd, timeout, RESULT_OK) for cmd, timeout in COMPREHENSIVE] + CALL_CONTROL
+    for command, timeout, expected in cases:
+        best, worst = bench(modem, command, timeout, expected)
+        legacy = legacy_cost_ms(timeout)
+        total_new += worst
+        total_legacy += legacy
+        print(f"{command:<26}{best:>6}ms{worst:>6}ms{legacy:>7}ms")
+
+    print(f"\nTotal (worst case): {total_new}ms vs legacy {total_legacy}ms")
+    print(f"Speed-up: {total_legacy / max(total_new, 1):.0f}x")
+
+    # A status refresh: ten queries one at a time vs one chained line
+    modem = Modem(ScriptedUART(SCRIPT), verbose=False)
+    start = ticks_ms()
+    for command, timeout in COMPREHENSIVE[1:]:
+        modem.command(command, timeout)
+    separate = ticks_diff(ticks_ms(), start)
+    start = ticks_ms()
+    status = ModemStatus(modem).snapshot()
+    chained = ticks_diff(ticks_ms(), start)
+    assert status.imsi == "310260123456789" and status.imei == "862636050123456", status
+    assert status.operator == "T-Mobile" and status.cereg == 1, status
+    print(f"Status refresh: {separate}ms in 10 round trips, {chained}ms chained")
+
+    # The timeout must still bound a command that never finishes
+    modem = Modem(ScriptedUART([(b"AT+SLOW", [(10, b"\r\n+SLOW: 1\r\n")])]), verbose=False)
+    start = ticks_ms()
+    result, _ = modem.command("AT+SLOW", timeout=0.2)
+    elapsed = ticks_diff(ticks_ms(), start)
+    assert result == "TIMEOUT" and 200 <= elapsed < 300, (result, elapsed)
+    print(f"Unterminated reply timed out after {elapsed}ms (limit 200ms)")
+
+    print("\n✓ Benchmark completed")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,68 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem # type: ignore
+from modem_link import ModemLink, DEFAULT_BAUDRATE # type: ignore
+from fake_uart import ScriptedUART
+
+# UART link manager test: the rate stays capped without flow control, a
+# rate whose long replies are overrun is rejected even though AT answers,
+# and RTS/CTS lifts the cap.
+# Runs against the fake UART's overrun model, on the host (python3) or on
+# the Pico.
+
+# AT+CLAC: a few KB of command names
+CLAC = b"".join(b"\r\n+C%03d" % i for i in range(400)) + b"\r\n\r\nOK\r\n"
+
+SCRIPT = [
+    (b"AT+CLAC", [(5, CLAC)]),
+    (b"AT+IFC=", [(5, b"\r\nOK\r\n")]),
+    (b"AT", [(2, b"\r\nOK\r\n")]),
+]
+
+
+def ipr_commands(uart):
+    return [line for line in bytes(uart.tx).split() if line.startswith(b"AT+IPR=")]
+
+
+def test_capped():
+    # No RTS/CTS: nothing above 115200 is tried, however good the wiring
+    uart = ScriptedUART(SCRIPT)
+    link = ModemLink(Modem(uart, verbose=False))
+    assert link.negotiate() == DEFAULT_BAUDRATE
+    assert ipr_commands(uart) == [] and uart.module_baudrate == DEFAULT_BAUDRATE
+    print("Capped at 115200 without flow control ✓")
+
+
+def test_overrun():
+    # Wiring good for 230400: at 921600 and 460800 AT still answers, but
+    # the long reply is overrun, so both are rejected
+    uart = ScriptedUART(SCRIPT, max_baudrate=230400)
+    link = ModemLink(Modem(uart, verbose=False), max_baudrate=921600)
+    assert link.negotiate() == 230400
+    assert uart.baudrate == uart.module_baudrate == 230400
+    assert ipr_commands(uart) == [b"AT+IPR=921600", b"AT+IPR=115200",
+                                  b"AT+IPR=460800", b"AT+IPR=115200",
+                                  b"AT+IPR=230400"], ipr_commands(uart)
+    assert link.measure_throughput() > 0
+    print(f"Overrun rates rejected: {link.report()}")
+
+
+def test_flow_control():
+    uart = ScriptedUART(SCRIPT, max_baudrate=230400)
+    link = ModemLink(Modem(uart, verbose=False), cts=2, rts=3)
+    assert link.negotiate() == 921600 and link.flow and uart.flow
+    assert uart.module_baudrate == 921600
+    assert link.verify(long=True)
+    print(f"RTS/CTS: {link.report()}")
+
+
+def run_test():
+    print("=== Modem Link Test ===")
+    test_capped()
+    test_overrun()
+    test_flow_control()
+    print("\n✓ Modem link test completed")
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,157 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, ticks_ms, ticks_diff, ticks_add # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from modem_power import ModemPower, RDY_GRACE_MS # type: ignore
+from fake_uart import ScriptedUART
+
+# Power controller test: boot detection from STATUS and the boot URCs,
+# and power-off with the long PWRKEY pulse.
+# Runs against a scripted fake UART and fake pins, on the host (python3)
+# or on the Pico. Boot times are scaled down from the real ~12 s.
+
+STATUS_MS = 120     # STATUS goes high after the PWRKEY pulse
+RDY_MS = 200
+PB_DONE_MS = 260
+SMS_DONE_MS = 300
+OFF_HOLD_MS = 80    # PWRKEY held at least this long switches the module off
+OFF_MS = 100        # STATUS drops this long after the release
+
+
+class ModuleUART(ScriptedUART):
+    """Ignores commands until the module has booted"""
+    ready_at = None
+
+    def write(self, data):
+        if self.ready_at is None or ticks_diff(ticks_ms(), self.ready_at) < 0:
+            return len(data)
+        return super().write(data)
+
+
+def module_uart():
+    return ModuleUART([(b"AT", [(5, b"\r\nOK\r\n")])])
+
+
+class FakeModule:
+    """PWRKEY and STATUS of a SIM7600G whose UART is a ScriptedUART"""
+
+    def __init__(self, uart, on=False, send_urcs=True):
+        self.uart = uart
+        self.send_urcs = send_urcs
+        self.on_at = ticks_ms() if on else None
+        self.off_at = None
+        if on:
+            uart.ready_at = ticks_ms()
+        self.pulses = 0
+        self.off_pulses = 0
+        self.power_key = self.PowerKey(self)
+        self.status = self.Status(self)
+
+    class PowerKey:
+        def __init__(self, module):
+            self.module = module
+            self.level = 1
+            self.pressed = None
+
+        def value(self, level):
+            if self.level == 1 and level == 0:
+                self.pressed = ticks_ms()
+            if self.level == 0 and level == 1:
+                self.module.released(ticks_diff(ticks_ms(), self.pressed))
+            self.level = level
+
+    class Status:
+        def __init__(self, module):
+            self.module = module
+
+        def value(self):
+            module = self.module
+            if module.off_at is not None and ticks_diff(ticks_ms(), module.off_at) < 0:
+                return 1    # Still shutting down
+            on_at = module.on_at
+            return 1 if on_at is not None and ticks_diff(ticks_ms(), on_at) >= 0 else 0
+
+    def released(self, held_ms):
+        if self.status.value() and held_ms >= OFF_HOLD_MS:
+            self.off_pulses += 1
+            self.on_at = None
+            self.off_at = ticks_add(ticks_ms(), OFF_MS)
+            return
+        self.pulses += 1
+        self.on_at = ticks_add(ticks_ms(), STATUS_MS)
+        self.uart.ready_at = ticks_add(ticks_ms(), RDY_MS)
+        if self.send_urcs:
+            self.uart.schedule(RDY_MS, b"\r\nRDY\r\n")
+            self.uart.schedule(PB_DONE_MS, b"\r\n+CPIN: READY\r\n\r\nPB DONE\r\n")
+            self.uart.schedule(SMS_DONE_MS, b"\r\nSMS DONE\r\n")
+
+
+def test_cold_boot():
+    uart = module_uart()
+    module = FakeModule(uart)
+    power = ModemPower(Modem(uart, verbose=False), module.power_key, module.status, pulse_ms=50)
+    assert power.power_on(timeout=2)
+    timings = power.timings
+    assert module.pulses == 1
+    # Ready the moment RDY arrives, not after a fixed sleep
+    assert timings["ready"] - timings["pulse"] < RDY_MS + 30, timings
+    assert timings["status"] <= timings["rdy"] <= timings["ready"], timings
+    print(f"Cold boot: {power.report()}")
+
+
+def test_already_on():
+    uart = module_uart()
+    module = FakeModule(uart, on=True)
+    power = ModemPower(Modem(uart, verbose=False), module.power_key, module.status)
+    assert power.power_on(timeout=2)
+    assert module.pulses == 0, "a running module must not be pulsed off"
+    assert power.timings["ready"] < 50, power.timings
+    print(f"Already on: {power.report()}")
+
+
+def test_missed_urcs():
+    # Boot URCs lost (e.g. sent before the Pico listened): AT probes find the module
+    uart = module_uart()
+    module = FakeModule(uart, send_urcs=False)
+    power = ModemPower(Modem(uart, verbose=False), module.power_key, module.status, pulse_ms=50)
+    assert power.power_on(timeout=2)
+    assert "rdy" not in power.timings and power.timings["ready"] < 50 + STATUS_MS + RDY_GRACE_MS + 100
+    print(f"Missed URCs: {power.report()}")
+
+
+async def test_async_boot():
+    uart = module_uart()
+    module = FakeModule(uart)
+    modem = AsyncModem(uart)
+    modem.start()
+    power = ModemPower(modem, module.power_key, module.status, pulse_ms=50)
+    assert await power.power_on_async(timeout=2)
+    await asyncio.sleep((SMS_DONE_MS + 50) / 1000)
+    modem.stop()
+    assert power.sms_ready()
+    assert power.timings["ready"] - power.timings["pulse"] < RDY_MS + 30, power.timings
+    print(f"Async boot: {power.report()}")
+
+
+def test_power_off():
+    uart = module_uart()
+    module = FakeModule(uart, on=True)
+    power = ModemPower(Modem(uart, verbose=False), module.power_key, module.status,
+                       pulse_ms=50, off_pulse_ms=OFF_HOLD_MS + 20)
+    start = ticks_ms()
+    assert power.power_off(timeout=2)
+    elapsed = ticks_diff(ticks_ms(), start)
+    assert module.off_pulses == 1 and module.pulses == 0 and not power.is_on()
+    assert elapsed >= OFF_HOLD_MS + OFF_MS, elapsed
+    assert power.power_off() and module.off_pulses == 1     # Already off: no pulse
+    print(f"Power off: STATUS low after {elapsed} ms")
+
+
+if __name__ == "__main__":
+    print("=== Modem Power Test ===")
+    test_cold_boot()
+    test_already_on()
+    test_missed_urcs()
+    test_power_off()
+    asyncio.run(test_async_boot())
+    print("\n✓ Modem power test completed")
@@ -0,0 +1,123 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_ms, ticks_diff # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from modem_sleep import ModemSleep, AWAKE, SLEEP # type: ignore
+from fake_uart import ScriptedUART
+import time
+
+# Sleep manager test: DTR released when idle, pulled low before each
+# command, wakes by the module counted and accounted while asleep, a
+# lightsleep ended by RI followed by on_wake, and time per state accounted.
+# Runs against a scripted fake UART and fake pins, on the host (python3)
+# or on the Pico.
+
+IDLE_MS = 100
+WAKE_MS = 20
+
+SCRIPT = [
+    (b"AT+CSCLK=1", [(5, b"\r\nOK\r\n")]),
+    (b"AT+CSQ", [(10, b"\r\n+CSQ: 21,99\r\n\r\nOK\r\n")]),
+]
+
+
+class FakePin:
+    IRQ_FALLING = 2
+
+    def __init__(self, level=1):
+        self.level = level
+        self.handler = None
+
+    def value(self, level=None):
+        if level is None:
+            return self.level
+        self.level = level
+
+    def irq(self, handler=None, trigger=None):
+        self.handler = handler
+
+    def pulse(self):
+        if self.handler:
+            self.handler(self)
+
+
+class SleepyUART(ScriptedUART):
+    """Records the DTR level each command was written with"""
+    dtr = None
+
+    def __init__(self, script):
+        super().__init__(script)
+        self.levels = []
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.levels.append((bytes(data).strip(), self.dtr.value()))
+        return super().write(data)
+
+
+async def run_test():
+    print("=== Modem Sleep Test ===")
+    dtr = FakePin(0)
+    ri = FakePin()
+    uart = SleepyUART(SCRIPT)
+    uart.dtr = dtr
+    modem = AsyncModem(uart)
+    modem.start()
+    woken = []
+
+    def lightsleep(ms):
+        # The module sends a URC part way through
+        time.sleep(ms / 2000)
+        ri.pulse()
+
+    sleep = ModemSleep(modem, dtr, ri, idle_ms=IDLE_MS, wake_ms=WAKE_MS,
+                       on_wake=lambda: woken.append(1), lightsleep=lightsleep)
+
+    assert await sleep.enable_async()
+    sleep.start()
+    await asyncio.sleep(IDLE_MS * 1.5 / 1000)
+    assert sleep.state == SLEEP and dtr.value() == 1
+
+    # A command wakes the module first and waits wake_ms before writing
+    start = ticks_ms()
+    result, lines = await modem.command("AT+CSQ")
+    elapsed = ticks_diff(ticks_ms(), start)
+    assert result == "OK" and lines == [b"+CSQ: 21,99"]
+    assert uart.levels[-1] == (b"AT+CSQ", 0), uart.levels
+    assert elapsed >= WAKE_MS, elapsed
+    assert sleep.state == AWAKE and sleep.wakeups == 1
+    assert ri.handler is None   # Replies do not count as wakes
+    print(f"Woken by DTR, command answered after {elapsed} ms")
+
+    # Back to sleep once idle; a URC while asleep is counted once, not
+    # per edge on the RX line
+    await asyncio.sleep(IDLE_MS * 1.5 / 1000)
+    assert sleep.state == SLEEP
+    ri.pulse()
+    ri.pulse()
+    assert sleep.rings == 1 and sleep.state == AWAKE and dtr.value() == 1
+    assert sleep.standby(30) == 0       # Not while the module is up
+    await asyncio.sleep(IDLE_MS * 1.5 / 1000)
+    assert sleep.state == SLEEP and ri.handler is not None
+
+    # The Pico only stands by while the module sleeps; a wake by RI ends
+    # the lightsleep and the URC it may have cut is asked for again
+    slept = sleep.standby(60)
+    assert slept < 60 and sleep.standby_ms == slept, slept
+    assert sleep.rings == 2 and sleep.missed == 1 and woken == [1]
+
+    # A command after the module's wake still pulls DTR low first
+    result, _ = await modem.command("AT+CSQ")
+    assert result == "OK" and uart.levels[-1] == (b"AT+CSQ", 0) and sleep.wakeups == 2
+    sleep.stop()
+
+    totals = sleep.totals()
+    assert totals[SLEEP] > IDLE_MS, totals
+    print(f"State times: {sleep.report()}")
+    modem.stop()
+    print("\n✓ Modem sleep test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -1,6 +1,14 @@
 import sys
 sys.path.insert(0, '../../hw')
-from machine import UART, Pin, ADC, I2S
+from modem import RESULT_OK # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from call import CallStateMachine, ACTIVE, ENDED # type: ignore
+from registration import RegistrationTracker # type: ignore
+from modem_power import ModemPower # type: ignore
+from storage import mount_flash, caller_id_region # type: ignore
+from contacts import ContactStore # type: ignore
+from caller_id import open_index # type: ignore
+from machine import Pin, ADC, I2S
 import time
 import uarray
 import os
@@ -46,9 +54,17 @@ def getenv(key, default=None):
 class PhoneCallManager:
     def __init__(self):
         # SIM7600G Configuration
-        self.uart = UART(0, baudrate=115200, tx=Pin(0), rx=Pin(1))
-        self.power_key = Pin(2, Pin.OUT)
+        self.modem = AsyncModem()  # Owns UART(0) on GP0/GP1
+        # Contacts and the caller-ID index that names incoming calls
+        mount_flash()
+        self.contacts = ContactStore()
+        self.caller_index = open_index(caller_id_region(), self.contacts)
+        self.call = CallStateMachine(self.modem, lookup=self.caller_index.lookup)
+        self.call.on_change(self.on_call_state)
+        self.registration = RegistrationTracker(self.modem)
+        self.power_key = Pin(2, Pin.OUT, value=1)
         self.status_pin = Pin(3, Pin.IN)
+        self.power = ModemPower(self.modem, self.power_key, self.status_pin)
 
         # Audio Configuration
         self.MIC_ADC_PIN = 28
@@ -70,7 +86,6 @@ class PhoneCallManager:
         }
 
         # State tracking
-        self.call_active = False
         self.audio_active = False
         self.last_button_states = {}
 
@@ -79,134 +94,94 @@ class PhoneCallManager:
         self.i2s = None
         self.amp_sd = None
 
-    def reset_and_power_on_sim7600g(self):
-        """Power on the SIM7600G module"""
+    async def reset_and_power_on_sim7600g(self):
+        """Power on the SIM7600G module, returning as soon as it takes commands"""
         print("Powering on SIM7600G...")
-        self.power_key.value(1)
-        time.sleep(0.5)
-        self.power_key.value(0)
-        time.sleep(1)
-        self.power_key.value(1)
-        print("SIM7600G power on sequence sent")
-        time.sleep(5)  # Wait for module to boot
-
-    def send_at_command(self, command, timeout=5):
-        """Send AT command and get response"""
-        print(f"Sending: {command}")
-        self.uart.write(command + '\r\n')
-
-        full_response_bytes = b""
-        start_time = time.time()
-
-        while (time.time() - start_time) < timeout:
-            if self.uart.any():
-                chunk = self.uart.read()
-                if chunk:
-                    full_response_bytes += chunk
-            time.sleep(0.1)
-
-        response_str = ""
-        if full_response_bytes:
-            try:
-                response_str = full_response_bytes.decode('utf-8')
-                print(f"Response: {response_str.strip()}")
-            except UnicodeDecodeError:
-                response_str = str(full_response_bytes)
-                print(f"Response (raw): {response_str}")
-        else:
-            print(f"No response from module for command '{command}' after {timeout}s")
+        if await self.power.power_on_async(timeout=30):
+            print(f"SIM7600G ready ({self.power.report()})")
+            return True
+        print("SIM7600G did not become ready within 30 s")
+        return False
 
-        time.sleep(0.5)
-        return response_str
+    async def send_at_command(self, command, timeout=5):
+        """Send AT command and get response (returns on the final result code)"""
+        print(f"Sending: {command}")
+        result, lines = await self.modem.command(command, timeout)
+        response = "\r\n".join([line.decode() for line in lines] + [result])
+        print(f"Response: {response}")
+        return response
 
-    def test_sim_connection(self):
+    async def test_sim_connection(self):
         """Test basic SIM communication"""
         print("\n=== Testing SIM Connection ===")
         for attempt in range(5):
-            response = self.send_at_command("AT", timeout=2)
-            if any(keyword in response for keyword in ["OK", "RDY", "READY", "+CPIN"]):
+            result, _ = await self.modem.command("AT", timeout=2)
+            if result == RESULT_OK:
                 print("✓ SIM module is responding")
                 return True
             if attempt < 4:
                 print(f"Attempt {attempt + 1} failed, retrying...")
-                time.sleep(2)
+                await asyncio.sleep(2)
         print("✗ SIM connection failed")
         return False
 
-    def make_call(self, phone_number):
+    async def make_call(self, phone_number):
         """Initiate a phone call"""
         print(f"\n=== Making call to {phone_number} ===")
 
-        # Check network registration first
-        response = self.send_at_command("AT+CREG?")
-        if "+CREG: 0,1" not in response and "+CREG: 0,5" not in response:
+        # Registration is tracked from +CREG/+CEREG URCs, so dialing starts
+        # the moment the network accepts the module
+        await self.registration.enable()
+        if not self.registration.registered():
             print("Not registered to network, attempting automatic registration...")
 
             # Enable automatic network registration
-            self.send_at_command("AT+COPS=0")
+            await self.send_at_command("AT+COPS=0")
 
-            # Wait and check registration again
             print("Waiting for network registration...")
-            for attempt in range(30):  # Wait up to 30 seconds
-                time.sleep(1)
-                response = self.send_at_command("AT+CREG?")
-                if "+CREG: 0,1" in response or "+CREG: 0,5" in response:
-                    print(f"✓ Successfully registered to network after {attempt + 1} seconds")
-                    break
-                print(f"Registration attempt {attempt + 1}/30...")
-            else:
+            start = time.ticks_ms()
+            if not await self.registration.wait_registered(30):
                 print("✗ Failed to register to network after 30 seconds")
                 return False
+            print(f"✓ Registered to network after {time.ticks_diff(time.ticks_ms(), start)} ms")
 
-        # Make the call (voice call)
-        response = self.send_at_command(f"ATD{phone_number};", timeout=15)
+        print(f"Network: {self.registration.act_name()}, cell {self.registration.ci}")
 
-        if "OK" in response or "CONNECT" in response:
+        # Call progress is reported through +CLCC URCs from here on
+        if not await self.call.enable():
+            print("✗ Failed to enable call status reports")
+            return False
+
+        # Make the call (voice call)
+        if await self.call.dial(phone_number):
             print("✓ Call initiated successfully")
-            self.call_active = True
             return True
         else:
             print("✗ Failed to initiate call")
-            print(f"Response: {response}")
             return False
 
-    def hangup_call(self):
+    async def hangup_call(self):
         """Hang up the current call"""
-        if not self.call_active:
+        if not self.call.in_call():
             print("No active call to hang up")
             return
 
         print("\n=== Hanging up call ===")
-        response = self.send_at_command("AT+CHUP", timeout=5)
-
-        if "OK" in response:
+        if await self.call.hangup():
             print("✓ Call hung up successfully")
-            self.call_active = False
             self.stop_audio()
         else:
             print("✗ Failed to hang up call")
 
-    def check_call_status(self):
-        """Check current call status"""
-        response = self.send_at_command("AT+CLCC", timeout=3)
-
-        if "+CLCC:" in response:
-            # Parse call status
-            if "0,0" in response:  # Active call
-                if not self.call_active:
-                    print("✓ Call connected - starting audio")
-                    self.call_active = True
-                    self.start_audio()
-            elif "0,3" in response:  # Incoming call
-                print("📞 Incoming call detected")
-            elif "0,2" in response:  # Dialing
-                print("📞 Dialing...")
-        else:
-            # No active calls
-            if self.call_active:
-                print("📞 Call ended")
-                self.call_active = False
-                self.stop_audio()
+    def on_call_state(self, old_state, new_state, call):
+        """React to call state changes reported by the modem"""
+        print(f"📞 Call {old_state} -> {new_state} {call.name or call.number}")
+        if new_state == ACTIVE:
+            print("✓ Call connected - starting audio")
+            self.start_audio()
+        elif new_state == ENDED:
+            print("📞 Call ended")
+            self.stop_audio()
 
     def init_audio(self):
         """Initialize audio components"""
@@ -302,7 +277,7 @@ class PhoneCallManager:
                 states[name] = not pin.value()
         return states
 
-    def check_hangup_buttons(self):
+    async def check_hangup_buttons(self):
         """Check if any hangup button is pressed"""
         states = self.get_button_states()
 
@@ -310,12 +285,12 @@ class PhoneCallManager:
         for button_name, pressed in states.items():
             if pressed and not self.last_button_states.get(button_name, False):
                 print(f"🔴 Hangup button {button_name} pressed")
-                self.hangup_call()
+                await self.hangup_call()
                 break
 
         self.last_button_states = states.copy()
 
-    def run_phone_test(self, phone_number):
+    async def run_phone_test(self, phone_number):
         """Run the complete phone call test"""
         print("=== Phone Call Test ===")
         print(f"Target number: {phone_number}")
@@ -323,14 +298,15 @@ class PhoneCallManager:
         print()
 
         # Initialize SIM
-        self.reset_and_power_on_sim7600g()
+        self.modem.start()
+        await self.reset_and_power_on_sim7600g()
 
-        if not self.test_sim_connection():
+        if not await self.test_sim_connection():
             print("❌ SIM connection failed - cannot proceed")
             return False
 
         # Make the call
-        if not self.make_call(phone_number):
+        if not await self.make_call(phone_number):
             print("❌ Call failed")
             return False
 
@@ -339,25 +315,25 @@ class PhoneCallManager:
         print("Press Ctrl+C to exit")
 
         try:
-            while self.call_active:
-                # Check call status
-                self.check_call_status()
-
+            # Call state changes arrive through URCs; this loop only
+            # services buttons and audio
+            while self.call.in_call():
                 # Check for hangup button presses
-                self.check_hangup_buttons()
+                await self.check_hangup_buttons()
 
                 # Process audio if active
                 if self.audio_active:
                     self.process_audio_chunk()
 
-                time.sleep(0.01)  # Shorter delay for audio processing
+                await asyncio.sleep_ms(1)  # Let the modem tasks run
 
         except KeyboardInterrupt:
             print("\n\n⏹️  Test interrupted")
-            self.hangup_call()
+            await self.hangup_call()
 
         finally:
             self.stop_audio()
+            self.modem.stop()
             print("✅ Phone call test completed")
 
         return True
@@ -380,7 +356,7 @@ def main():
 
     # Create phone call manager and run test
     phone_manager = PhoneCallManager()
-    phone_manager.run_phone_test(phone_number)
+    asyncio.run(phone_manager.run_phone_test(phone_number))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_ms, ticks_diff, RESULT_OK # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from contacts import ContactStore, normalize_number # type: ignore
+from phonebook import PhonebookImport, parse_cpbr # type: ignore
+from sim7600_emulator import SIM7600Emulator
+
+# SIM phonebook import test: +CPBR parsing, paged reads of a full SIM
+# against the SIM7600G emulator, deduplication and sparse phonebooks, with
+# the one-command-per-entry read as a baseline, and imported contacts
+# reaching the caller-ID index.
+# Runs on the host (python3) or on the Pico.
+
+STORE_PATH = "phonebook_test.jsonl"
+
+
+def remove_store():
+    import os
+    try:
+        os.remove(STORE_PATH)
+    except OSError:
+        pass
+
+
+class RecordingIndex:
+    """Stands in for the CallerIndex, noting what it is given"""
+    def __init__(self):
+        self.names = {}
+
+    def add(self, number, name):
+        self.names[normalize_number(number)] = name
+        return True
+
+
+def test_parsing():
+    assert normalize_number("+1 (555) 123-4567") == "15551234567"
+    assert normalize_number("0015551234567") == "15551234567"
+    assert normalize_number("5551234567") == "5551234567"
+    assert normalize_number("*#06#") == "06"
+    assert normalize_number("") == ""
+    assert parse_cpbr(b'+CPBR: 3,"+15551234567",145,"Smith, John"') == (3, "+15551234567", "Smith, John")
+    assert parse_cpbr(memoryview(b'+CPBR: 12,"15551234567",145,"Mom"')) == (12, "+15551234567", "Mom")
+    assert parse_cpbr(b'+CPBR: 4,"5551234",129') == (4, "5551234", "")
+    assert parse_cpbr(b'+CPBR: x,"5551234",129,"A"') is None
+    print("Parsing ✓")
+
+
+async def test_full_sim():
+    remove_store()
+    uart = SIM7600Emulator()
+    uart.fill_phonebook(250, duplicates=10)
+    modem = AsyncModem(uart)
+    modem.start()
+    progress = []
+    index = RecordingIndex()
+    phonebook = PhonebookImport(modem, ContactStore(STORE_PATH),
+                                on_progress=lambda p: progress.append(p.percent()), index=index)
+    start = ticks_ms()
+    added = await phonebook.run()
+    elapsed = ticks_diff(ticks_ms(), start)
+    assert added == 240 and phonebook.read == 250, phonebook.report()
+    assert phonebook.pages == 3 and progress == [40, 80, 100], progress
+    contacts = list(ContactStore(STORE_PATH).contacts())
+    assert len(contacts) == 240 and contacts[0]['name'] == "Contact 0", contacts[0]
+    assert contacts[1]['key'] == "15550000001" and contacts[0]['number'] == "0015550000000"
+    assert len(index.names) == 240 and index.names["15550000001"] == contacts[1]['name']
+    print(f"Paged import: {phonebook.report()} in {elapsed} ms")
+
+    # Importing again adds nothing
+    again = PhonebookImport(modem, ContactStore(STORE_PATH))
+    assert await again.run() == 0 and again.read == 250
+
+    # Baseline: one AT+CPBR per index
+    start = ticks_ms()
+    read = 0
+    for index in range(1, 251):
+        result, lines = await modem.command(f"AT+CPBR={index}")
+        if result == RESULT_OK:
+            read += sum(1 for line in lines if parse_cpbr(line))
+    single = ticks_diff(ticks_ms(), start)
+    modem.stop()
+    assert read == 250
+    print(f"One entry per command: {read} entries in {single} ms")
+    assert elapsed * 3 < single, (elapsed, single)
+    remove_store()
+
+
+async def test_sparse():
+    remove_store()
+    uart = SIM7600Emulator()
+    uart.phonebook = {5: ("+15551110000", "Five"), 180: ("+15552220000", "One eighty")}
+    modem = AsyncModem(uart)
+    modem.start()
+    phonebook = PhonebookImport(modem, ContactStore(STORE_PATH), page=50)
+    assert await phonebook.run() == 2
+    # 151-200 holds the last used entry; 201-250 is never asked for
+    assert phonebook.pages == 4 and phonebook.position == 200, phonebook.report()
+
+    uart.phonebook = {}
+    empty = PhonebookImport(modem, ContactStore(STORE_PATH))
+    assert await empty.run() == 0 and empty.pages == 0
+    modem.stop()
+    remove_store()
+    print("Sparse and empty phonebooks ✓")
+
+
+async def run_test():
+    print("=== SIM Phonebook Import Test ===")
+    test_parsing()
+    await test_full_sim()
+    await test_sparse()
+    print("\n✓ SIM phonebook import test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,57 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_ms, ticks_diff # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from registration import RegistrationTracker, SEARCHING, HOME # type: ignore
+from fake_uart import ScriptedUART
+
+# URC-driven registration tracker test.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+SCRIPT = [
+    (b"AT+CREG=2;+CEREG=2", [(10, b"\r\nOK\r\n")]),
+    (b"AT+CREG?;+CEREG?", [(15, b"\r\n+CREG: 2,2\r\n\r\n+CEREG: 2,2\r\n\r\nOK\r\n")]),
+]
+
+
+async def run_test():
+    print("=== Registration Tracker Test ===")
+    uart = ScriptedUART(SCRIPT)
+    modem = AsyncModem(uart)
+    modem.start()
+    tracker = RegistrationTracker(modem)
+    changes = []
+    tracker.on_change(lambda t: changes.append(dict(t.stats)))
+
+    assert await tracker.enable()
+    assert tracker.stats == {"creg": SEARCHING, "cereg": SEARCHING}
+    assert not tracker.registered()
+
+    # Nothing arrives: the wait is bounded by its timeout
+    start = ticks_ms()
+    assert not await tracker.wait_registered(0.1)
+    waited = ticks_diff(ticks_ms(), start)
+    assert 90 <= waited < 200, waited
+
+    # LTE-only registration: +CREG stays "searching", +CEREG says home
+    uart.schedule(150, b'\r\n+CEREG: 1,"1A2B","01C3D4E5",7\r\n')
+    start = ticks_ms()
+    assert await tracker.wait_registered(5)
+    waited = ticks_diff(ticks_ms(), start)
+    assert waited < 250, waited
+    assert tracker.stats["cereg"] == HOME and tracker.act_name() == "LTE"
+    assert tracker.lac == 0x1A2B and tracker.ci == 0x01C3D4E5
+    print(f"Registered {waited} ms after waiting started (URC due at 150 ms)")
+
+    # Losing coverage clears the state again
+    uart.schedule(0, b"\r\n+CEREG: 2\r\n")
+    await asyncio.sleep(0.05)
+    assert not tracker.registered()
+    assert changes[-2:] == [{"creg": SEARCHING, "cereg": HOME}, {"creg": SEARCHING, "cereg": SEARCHING}], changes
+
+    modem.stop()
+    print("\n✓ Registration tracker test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,80 @@
+import os
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, ticks_ms, ticks_diff, RESULT_OK # type: ignore
+from modem_status import ModemStatus # type: ignore
+from sms import list_messages # type: ignore
+from at_record import RecordingUART, load_transcript # type: ignore
+from fake_uart import ScriptedUART
+from replay_uart import ReplayUART, ReplayMismatch
+from sms_list_test import SCRIPT as SMS_SCRIPT
+from modem_latency_test import SCRIPT as STATUS_SCRIPT
+
+# Record/replay harness test: a flow recorded through RecordingUART is
+# saved, loaded and replayed with recorded and compressed timing, giving
+# the same results. On the device the recording would wrap the real UART.
+# Runs on the host (python3) or on the Pico.
+
+TRACE_PATH = "replay_test_trace.txt"
+
+
+def flow(modem):
+    """Status refresh, a full SMS listing and a call check"""
+    status = ModemStatus(modem).snapshot()
+    senders = [m["sender"] for m in list_messages(modem)]
+    result, raw = modem.command("AT+CLCC", 3)
+    modem.poll()
+    return status.imsi, status.operator, senders, result, raw
+
+
+def timed(modem):
+    start = ticks_ms()
+    outcome = flow(modem)
+    return outcome, ticks_diff(ticks_ms(), start)
+
+
+def record():
+    uart = RecordingUART(ScriptedUART(SMS_SCRIPT + STATUS_SCRIPT))
+    uart.schedule(0, b"\r\nRDY\r\n")
+    outcome, elapsed = timed(Modem(uart, verbose=False))
+    assert outcome[3] == RESULT_OK and len(outcome[2]) == 21, outcome
+    uart.save(TRACE_PATH)
+    print(f"Recorded {len(uart.events)} events in {elapsed} ms")
+    return outcome, elapsed
+
+
+def run_test():
+    print("=== AT Record/Replay Test ===")
+    recorded, recorded_ms = record()
+    events = load_transcript(TRACE_PATH)
+
+    # Recorded timing: same results, about the same time
+    uart = ReplayUART(events)
+    outcome, elapsed = timed(Modem(uart, verbose=False))
+    assert outcome == recorded, outcome
+    assert uart.done() and not uart.mismatches
+    assert abs(elapsed - recorded_ms) < recorded_ms // 4 + 50, (elapsed, recorded_ms)
+    print(f"Replayed in {elapsed} ms (recorded {recorded_ms} ms)")
+
+    # Compressed timing for regression runs
+    uart = ReplayUART(events, speed=0)
+    outcome, elapsed = timed(Modem(uart, verbose=False))
+    assert outcome == recorded, outcome
+    assert elapsed < recorded_ms // 4, elapsed
+    print(f"Compressed replay in {elapsed} ms")
+
+    # Code that drifts from the recording is caught at the first difference
+    uart = ReplayUART(events, speed=0)
+    modem = Modem(uart, verbose=False)
+    try:
+        modem.command("AT+CSQ")
+        assert False, "mismatch not detected"
+    except ReplayMismatch as e:
+        print(f"Drift detected: {e}")
+
+    os.remove(TRACE_PATH)
+    print("\n✓ Record/replay test completed")
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,114 @@
+# Replays a recorded AT transcript (hw/at_record.py) as a machine.UART
+#
+# Received chunks are anchored to the command written before them: when the
+# code under test writes that command, what the module sent after it is
+# released with the recorded delays, scaled by `speed`. Traffic recorded
+# before the first command (boot URCs) is released from construction.
+# Runs on CPython and on MicroPython.
+
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_ms, ticks_diff, ticks_add # type: ignore
+from at_record import TX, RX # type: ignore
+
+
+class ReplayMismatch(AssertionError):
+    pass
+
+
+class ReplayUART:
+    def __init__(self, events, speed=1.0, max_gap_ms=None, strict=True):
+        """
+        Args:
+            events: transcript from load_transcript() or RecordingUART.events
+            speed: 1.0 for recorded timing, 10 for ten times faster,
+                   0 to release replies as soon as their command is written
+            max_gap_ms: cap on any single recorded delay (idle compression)
+            strict: raise ReplayMismatch when a write differs from the recording
+        """
+        self.speed = speed
+        self.max_gap_ms = max_gap_ms
+        self.strict = strict
+        # Split into (tx_bytes, [(delay_us, rx_bytes), ...]) exchanges
+        self.exchanges = []
+        boot = []
+        anchor = 0
+        for us, direction, data in events:
+            if direction == TX:
+                self.exchanges.append((data, []))
+                anchor = us
+            elif direction == RX:
+                replies = self.exchanges[-1][1] if self.exchanges else boot
+                replies.append((us - anchor, data))
+        self.next = 0
+        self.mismatches = []
+        self.pending = []   # (release_ticks_ms, bytes) in release order
+        self.rx = bytearray()
+        self.tx = bytearray()
+        self.writes = 0
+        self._release_after(boot)
+
+    def _delay_ms(self, us):
+        ms = us // 1000
+        if self.max_gap_ms is not None:
+            ms = min(ms, self.max_gap_ms)
+        return int(ms / self.speed) if self.speed else 0
+
+    def _release_after(self, replies):
+        now = ticks_ms()
+        for us, data in replies:
+            self.pending.append((ticks_add(now, self._delay_ms(us)), data))
+        self.pending.sort(key=lambda item: ticks_diff(item[0], now))
+
+    def done(self):
+        """True once every recorded command has been written"""
+        return self.next >= len(self.exchanges)
+
+    def init(self, baudrate=None, **kwargs):
+        pass
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        data = bytes(data)
+        self.tx.extend(data)
+        self.writes += 1
+        if self.done():
+            self.mismatches.append((data, None))
+            if self.strict:
+                raise ReplayMismatch(f"write after the end of the transcript: {data}")
+            return len(data)
+        expected, replies = self.exchanges[self.next]
+        self.next += 1
+        if data != expected:
+            self.mismatches.append((data, expected))
+            if self.strict:
+                raise ReplayMismatch(f"wrote {data}, recording has {expected}")
+        self._release_after(replies)
+        return len(data)
+
+    def _release(self):
+        now = ticks_ms()
+        while self.pending and ticks_diff(now, self.pending[0][0]) >= 0:
+            self.rx.extend(self.pending.pop(0)[1])
+
+    def any(self):
+        self._release()
+        return len(self.rx)
+
+    def read(self, n=None):
+        self._release()
+        if not self.rx:
+            return None
+        if n is None or n > len(self.rx):
+            n = len(self.rx)
+        data = bytes(self.rx[:n])
+        self.rx = self.rx[n:]
+        return data
+
+    def readinto(self, buf, n=None):
+        data = self.read(len(buf) if n is None else min(n, len(buf)))
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
@@ -0,0 +1,128 @@
+import sys
+sys.path.insert(0, '../../hw')
+from ringbuf import RingBuffer # type: ignore
+
+# Receive ring buffer test: lines split across writes, lines wrapping
+# around the end of the ring, overflow of a full ring, wrapped lines
+# longer than the scratch buffer and an RX IRQ landing mid-fill.
+# Runs on the host (python3) or on the Pico.
+
+
+def lines(ring):
+    out = []
+    line = ring.readline()
+    while line is not None:
+        out.append(bytes(line))
+        line = ring.readline()
+    return out
+
+
+def test_partial_lines():
+    ring = RingBuffer(64, 16)
+    ring.write(b"\r\n+CSQ: 2")
+    assert lines(ring) == [b""]
+    ring.write(b"1,99\r")
+    assert ring.readline() is None     # No '\n' yet
+    ring.write(b"\n\r\nOK\r\n")
+    assert lines(ring) == [b"+CSQ: 21,99", b"", b"OK"]
+    assert len(ring) == 0
+    assert ring.write(b"\r\n> ") == 4 and ring.take_prompt() and len(ring) == 0
+    print("Partial lines ✓")
+
+
+def test_wraparound():
+    ring = RingBuffer(32, 32)
+    ring.write(b"x" * 20 + b"\r\n")
+    assert lines(ring) == [b"x" * 20]
+    # Starts at 22 and wraps: joined in the scratch buffer
+    ring.write(b"+CMTI: \"SM\",3\r\n")
+    line = ring.readline()
+    assert bytes(line) == b'+CMTI: "SM",3' and ring.truncated == 0
+    ring.write(b"OK\r\n")
+    assert lines(ring) == [b"OK"]
+
+    # Many laps: every line comes back intact
+    for i in range(100):
+        ring.write(b"+CLCC: %d,1,4,0,0\r\n" % i)
+        assert lines(ring) == [b"+CLCC: %d,1,4,0,0" % i]
+    assert ring.overflows == 0 and ring.truncated == 0
+    print("Wraparound ✓")
+
+
+def test_overflow():
+    ring = RingBuffer(32, 16)
+    assert ring.write(b"a" * 40) == 31 and ring.overflows == 9
+    assert ring.free() == 0
+    # A full ring without a line end is dropped rather than stalling
+    assert ring.readline() is None and len(ring) == 0
+    assert ring.overflows == 40
+    ring.write(b"OK\r\n")
+    assert lines(ring) == [b"OK"]
+    print("Overflow ✓")
+
+
+def test_truncated():
+    ring = RingBuffer(64, 8)
+    ring.write(b"y" * 50 + b"\r\n")
+    assert lines(ring) == [b"y" * 50]     # Contiguous: not limited by line_max
+    # Wrapped and longer than line_max: the start is kept and counted
+    ring.write(b"+CMGL: 1234567890\r\n")
+    assert lines(ring) == [b"+CMGL: 1"] and ring.truncated == 1
+    # Wrapped with more than line_max before the end of the ring
+    ring = RingBuffer(32, 8)
+    ring.write(b"z" * 12 + b"\r\n")
+    lines(ring)
+    ring.write(b"0123456789abcdefghij\r\n")
+    assert lines(ring) == [b"01234567"] and ring.truncated == 1
+    print("Truncated wrapped lines ✓")
+
+
+class RacingUART:
+    """UART whose RX IRQ fires just after fill_from() has seen it empty"""
+    def __init__(self, ring, late):
+        self.ring = ring
+        self.fifo = bytearray(b"+CSQ: 21,99\r\n")
+        self.late = late
+        self.wakeups = 0
+
+    def any(self):
+        if not self.fifo and self.late:
+            self.fifo, self.late = self.late, None
+            self.ring.fill_irq(self, self.wake)
+            return 0    # The loop already decided the FIFO was empty
+        return len(self.fifo)
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.fifo))
+        buf[:n] = self.fifo[:n]
+        self.fifo = self.fifo[n:]
+        return n
+
+    def wake(self):
+        self.wakeups += 1
+
+
+def test_irq_during_fill():
+    ring = RingBuffer(64, 16)
+    uart = RacingUART(ring, bytearray(b"\r\nOK\r\n"))
+    ring.fill_from(uart)
+    assert lines(ring) == [b"+CSQ: 21,99"]
+    # The IRQ could not read, but still woke the reader, which fills again
+    assert uart.wakeups == 1 and uart.fifo == b"\r\nOK\r\n"
+    ring.fill_from(uart)
+    assert lines(ring) == [b"", b"OK"]
+    print("RX IRQ during a fill ✓")
+
+
+def run_test():
+    print("=== Ring Buffer Test ===")
+    test_partial_lines()
+    test_wraparound()
+    test_overflow()
+    test_truncated()
+    test_irq_during_fill()
+    print("\n✓ Ring buffer test completed")
+
+
+if __name__ == "__main__":
+    run_test()
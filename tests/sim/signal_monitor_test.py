@@ -0,0 +1,89 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem_async import AsyncModem, asyncio # type: ignore
+from signal_monitor import SignalMonitor, rssi_bars # type: ignore
+from fake_uart import ScriptedUART
+
+# Signal monitor test: +CSQ URCs where the firmware has AT+AUTOCSQ, adaptive
+# polling where it has not, and events only when the bars change.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+
+class SignalUART(ScriptedUART):
+    """Answers AT+CSQ with the next value of a signal trace"""
+    def __init__(self, script, trace):
+        super().__init__(script)
+        self.trace = list(trace)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        line = bytes(data).strip()
+        if line == b"AT+CSQ":
+            self.tx.extend(line)
+            rssi = self.trace.pop(0) if len(self.trace) > 1 else self.trace[0]
+            self.schedule(0, line + b"\r\r\n")
+            self.schedule(5, b"\r\n+CSQ: %d,99\r\n\r\nOK\r\n" % rssi)
+            return len(data)
+        return super().write(data)
+
+
+async def test_urcs():
+    uart = SignalUART([(b"AT+AUTOCSQ=", [(5, b"\r\nOK\r\n")])], [21])
+    modem = AsyncModem(uart)
+    modem.start()
+    monitor = SignalMonitor(modem)
+    events = []
+    monitor.on_change(lambda bars, m: events.append(bars))
+
+    assert await monitor.enable()
+    assert monitor.bars == 4 and monitor.dbm() == -71, (monitor.bars, monitor.dbm())
+    monitor.start()
+    assert monitor.task is None     # Nothing to poll
+
+    # Small moves inside one bar are not reported
+    for rssi in (22, 20, 23, 14, 13, 99, 99, 8):
+        uart.schedule(0, b"\r\n+CSQ: %d,99\r\n" % rssi)
+    await asyncio.sleep(0.1)
+    assert events == [4, 2, 0, 1], events
+    assert monitor.polls == 1
+    assert monitor.values == 9, monitor.values     # The poll in enable() and 8 URCs
+    modem.stop()
+    print(f"URC mode: {monitor.values} values, {len(events)} events, {monitor.polls} poll")
+
+
+async def test_polling():
+    # Stable, a drop, then stable again
+    trace = [18] * 4 + [12, 11, 6] + [6] * 10
+    uart = SignalUART([], trace)
+    modem = AsyncModem(uart)
+    modem.start()
+    monitor = SignalMonitor(modem, min_interval=0.01, max_interval=0.08)
+    events = []
+    intervals = []
+    monitor.on_change(lambda bars, m: events.append(bars))
+
+    assert not await monitor.enable()
+    monitor.start()
+    for _ in range(40):
+        await asyncio.sleep(0.02)
+        intervals.append(monitor.interval)
+    monitor.stop()
+    assert events == [3, 2, 1], events
+    assert intervals[-1] == 0.08, intervals
+    assert min(intervals[len(intervals) // 2:]) == 0.08, intervals
+    print(f"Polling mode: {monitor.polls} polls in 0.8 s (fixed 0.01 s would be ~80), "
+          f"events {events}")
+    modem.stop()
+
+
+async def run_test():
+    print("=== Signal Monitor Test ===")
+    assert [rssi_bars(r) for r in (0, 2, 10, 15, 20, 31, 99)] == [0, 1, 2, 3, 4, 4, 0]
+    await test_urcs()
+    await test_polling()
+    print("\n✓ Signal monitor test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
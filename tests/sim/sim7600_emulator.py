@@ -0,0 +1,620 @@
+# SIM7600G emulator behind a fake machine.UART
+#
+# Speaks the part of the AT dialect this code base uses: registration
+# (+CREG/+CEREG), SMS in PDU and text mode (+CMGF, +CMGL, +CMGR, +CMGS,
+# +CMGD, +CNMI, +CPMS), voice calls (ATD, ATA, +CHUP, +CLCC, RING/+CLIP),
+# GNSS (+CGPS, +CGPSINFO), the SIM phonebook (+CPBS, +CPBR), the clock
+# (+CCLK), status queries and boot URCs. Scenario methods
+# inject SMS bursts, call storms, slow and garbled replies, so the modem
+# layer can be load-tested on the host. Runs on CPython and on MicroPython.
+
+import sys
+sys.path.insert(0, '../../hw')
+import random
+from modem import ticks_ms, ticks_diff, ticks_add # type: ignore
+from sms_pdu import encode_submit, from_hex, to_hex, MTI_SUBMIT # type: ignore
+from fake_uart import ScriptedUART
+
+CTRL_Z = 0x1A
+ESC = 0x1B
+
+# Reply delays in ms (SIM7600G at 115200 baud, roughly)
+LATENCY = {
+    "default": 5,
+    "+COPS": 120,
+    "+CMGS": 400,       # Network round trip after the PDU
+    "+CMGR": 20,
+    "+CMGL": 10,
+    "D": 30,
+    "+CHUP": 60,
+    "+CPBR": 20,
+}
+PHONEBOOK_ENTRY_MS = 2  # SIM read time per phonebook entry returned
+
+BOOT_URCS = ((0, b"\r\nRDY\r\n"), (300, b"\r\n+CPIN: READY\r\n"),
+             (1200, b"\r\nSMS DONE\r\n"), (1500, b"\r\nPB DONE\r\n"))
+
+STAT_NAMES = ("REC UNREAD", "REC READ", "STO UNSENT", "STO SENT")
+DELIVER_MMS = 0x04      # TP-MMS: no more messages waiting
+UDHI = 0x40
+
+IDENTITY = {
+    "+CIMI": b"310260123456789",
+    "+CGSN": b"862636050123456",
+    "+CCID": b"+ICCID: 8901260123456789012F",
+    "+CICCID": b"+ICCID: 8901260123456789012F",
+    "+COPS?": b'+COPS: 0,0,"T-Mobile",7',
+    "+CGATT?": b"+CGATT: 1",
+    "+CPSI?": b"+CPSI: LTE,Online,310-260,0x1234,56789012,123,EUTRAN-BAND2,900,5,5,-94,-1123,-807,15",
+}
+
+
+def _bcd(value):
+    return ((value % 10) << 4) | (value // 10)
+
+
+def deliver_pdus(sender, text, timestamp=(26, 10, 17, 12, 0, 0)):
+    """
+    Hex SMS-DELIVER PDUs (with a "00" SMSC prefix) as received from sender
+
+    Built from encode_submit, so long texts become concatenated parts.
+    """
+    scts = bytes(_bcd(v) for v in timestamp) + b"\x00"
+    pdus = []
+    for hex_pdu, _ in encode_submit(sender, text):
+        submit = bytes(from_hex(hex_pdu[2:]))
+        address_end = 2 + 2 + (submit[2] + 1) // 2
+        first = DELIVER_MMS | (submit[0] & UDHI)
+        # SUBMIT: first, MR, DA, PID, DCS, VP, UDL, UD
+        # DELIVER: first, OA, PID, DCS, SCTS, UDL, UD
+        tpdu = bytes((first,)) + submit[2:address_end] + submit[address_end:address_end + 2] \
+            + scts + submit[address_end + 3:]
+        pdus.append(b"00" + to_hex(tpdu))
+    return pdus
+
+
+class Message:
+    def __init__(self, stat, sender, text, pdu):
+        self.stat = stat
+        self.sender = sender
+        self.text = text
+        self.pdu = pdu
+
+
+class Call:
+    def __init__(self, call_id, incoming, stat, number):
+        self.id = call_id
+        self.incoming = incoming
+        self.stat = stat
+        self.number = number
+
+    def clcc(self):
+        return b'+CLCC: %d,%d,%d,0,0,"%s",%d' % (
+            self.id, self.incoming, self.stat, self.number.encode(),
+            145 if self.number.startswith("+") else 129)
+
+
+class SIM7600Emulator(ScriptedUART):
+    def __init__(self, boot=False, capacity=255, time_scale=1.0, seed=1, phonebook_size=250, **kwargs):
+        """
+        Args:
+            boot: send the boot URCs as if the module was just switched on
+            capacity: SMS storage slots
+            time_scale: factor on module-side periods (GNSS report interval,
+                        ring cadence) so long scenarios run quickly
+            seed: random seed for garbling
+            phonebook_size: entries the SIM phonebook can hold
+        """
+        super().__init__([], **kwargs)
+        self.capacity = capacity
+        self.time_scale = time_scale
+        self.latency = dict(LATENCY)
+        self.slow_ms = 0        # Added to every reply
+        self.garble_rate = 0    # Probability a reply chunk is corrupted
+        random.seed(seed)
+        self.timers = []        # (due_ticks_ms, callable)
+        self.line = bytearray()
+        self.prompt = None      # Pending AT+CMGS while waiting for the payload
+
+        self.cmgf = 0
+        self.cnmi_mt = 0
+        self.creg_n = 0
+        self.cereg_n = 0
+        self.reg_stat = 1
+        self.lac = 0x1A2B
+        self.ci = 0x01C3D4E5
+        self.rssi = 21
+        self.clcc_urc = False
+        self.clip = False
+        self.messages = {}      # index -> Message
+        self.mr = 0
+        self.clock_s = 0        # SCTS seconds, so every message is distinct
+        self.rtc = b"26/10/17,12:00:00+00"     # Read by AT+CCLK?
+        self.sent = []          # (length or number, payload) of every AT+CMGS
+        self.calls = {}
+        self.next_call_id = 1
+        self.answer_ms = 300    # Remote answers an outgoing call after this
+        self.gps_on = False
+        self.gps_interval = 0
+        self.gps_next = None
+        self.gps_fix_after_ms = 0
+        self.gps_started = None
+        self.gps_reports = 0
+        self.phonebook = {}     # index -> (number, name)
+        self.phonebook_size = phonebook_size
+        self.busy_ms = 0        # Extra reply delay of the command being run
+
+        self.commands = 0
+        self.dropped_sms = 0
+        self.garbled = 0
+        if boot:
+            for delay, urc in BOOT_URCS:
+                self.schedule(delay, urc)
+
+    # --- Scheduling ------------------------------------------------------------
+
+    def after(self, delay_ms, action):
+        """Run action() on the module side after delay_ms"""
+        due = ticks_add(ticks_ms(), int(delay_ms))
+        self.timers.append((due, action))
+        self.timers.sort(key=lambda item: ticks_diff(item[0], due))
+
+    def schedule(self, delay_ms, data):
+        """Queue bytes to start transmitting after delay_ms"""
+        # One serial line: chunks leave in the order they start, and a chunk
+        # is complete once its wire time has passed
+        start = ticks_add(ticks_ms(), delay_ms)
+        due = ticks_add(start, len(data) * 10000 // self.module_baudrate)
+        i = len(self.pending)
+        while i and ticks_diff(self.pending[i - 1][0], start) > 0:
+            i -= 1
+        self.pending.insert(i, (start, due, bytes(data)))
+
+    def _release(self):
+        now = ticks_ms()
+        while self.timers and ticks_diff(now, self.timers[0][0]) >= 0:
+            self.timers.pop(0)[1]()
+        if self.gps_interval and ticks_diff(now, self.gps_next) >= 0:
+            self.gps_next = ticks_add(now, int(self.gps_interval * 1000 * self.time_scale))
+            self._urc(b"+CGPSINFO: " + self._gps_info())
+        while self.pending and ticks_diff(now, self.pending[0][1]) >= 0:
+            self.rx.extend(self.pending.pop(0)[2])
+
+    def _send(self, delay_ms, data):
+        if self.garble_rate and random.random() < self.garble_rate:
+            data = bytearray(data)
+            i = random.getrandbits(16) % len(data)
+            data[i] = 0x80 | random.getrandbits(7)
+            self.garbled += 1
+        self.schedule(delay_ms + self.slow_ms, data)
+
+    def _urc(self, line, delay_ms=0):
+        self._send(delay_ms, b"\r\n" + line + b"\r\n")
+
+    # --- UART side -------------------------------------------------------------
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.tx.extend(data)
+        self.writes += 1
+        for c in bytes(data):
+            if self.prompt is not None:
+                self._payload_byte(c)
+            elif c == 0x0D:
+                line = bytes(self.line).strip()
+                self.line = bytearray()
+                if line:
+                    if self.echo:
+                        self.schedule(0, line + b"\r")
+                    self._command_line(line)
+            elif c != 0x0A:
+                self.line.append(c)
+        return len(data)
+
+    def _payload_byte(self, c):
+        if c == CTRL_Z:
+            target, payload = self.prompt, bytes(self.line)
+            self.prompt = None
+            self.line = bytearray()
+            self._sms_submit(target, payload)
+        elif c == ESC:
+            self.prompt = None
+            self.line = bytearray()
+            self._send(5, b"\r\nOK\r\n")
+        else:
+            self.line.append(c)
+
+    def _command_line(self, line):
+        self.commands += 1
+        if not line.upper().startswith(b"AT"):
+            self._send(5, b"\r\nERROR\r\n")
+            return
+        out = []
+        delay = 0
+        body = line[2:]
+        # Chained commands: AT+CPIN?;+CSQ
+        for command in self._split_chain(body):
+            verb = self._verb(command)
+            delay = max(delay, self.latency.get(verb, self.latency["default"]))
+            self.busy_ms = 0
+            result = self._execute(command, out)
+            if result is None:
+                return      # The command answers by itself (prompt, ATD)
+            if result != b"OK":
+                out.append(result)
+                break
+        else:
+            out.append(b"OK")
+        self._send(delay + self.busy_ms, b"".join(b"\r\n" + line + b"\r\n" for line in out))
+
+    def _split_chain(self, body):
+        parts = []
+        start = 0
+        quoted = False
+        for i in range(len(body)):
+            c = body[i]
+            if c == 0x22:
+                quoted = not quoted
+            elif c == 0x3B and not quoted and body[:1] != b"D":
+                parts.append(body[start:i])
+                start = i + 1
+        parts.append(body[start:])
+        return [p for p in parts if p] or [b""]
+
+    def _verb(self, command):
+        if command[:1] in (b"D", b"A") and not command.startswith(b"+"):
+            return command[:1].decode()
+        end = len(command)
+        for i in range(len(command)):
+            if command[i] in b"=?":
+                end = i
+                break
+        return command[:end].decode()
+
+    # --- Commands ----------------------------------------------------------------
+
+    def _execute(self, command, out):
+        """Run one command, append its info lines; return the final result"""
+        c = command.upper()
+        if c in (b"", b"+IFC=2,2", b"+IFC=0,0"):
+            return b"OK"
+        if c in (b"E0", b"E1"):
+            self.echo = c == b"E1"
+            return b"OK"
+        if c.startswith(b"+CLIP="):
+            self.clip = c.endswith(b"1")
+            return b"OK"
+        if c.startswith(b"+IPR="):
+            self.module_baudrate = int(c[5:])
+            return b"OK"
+        if c == b"+CPIN?":
+            out.append(b"+CPIN: READY")
+            return b"OK"
+        if c == b"+CCLK?":
+            out.append(b'+CCLK: "%s"' % self.rtc)
+            return b"OK"
+        if c == b"+CSQ":
+            out.append(b"+CSQ: %d,99" % self.rssi)
+            return b"OK"
+        if c.startswith(b"+AUTOCSQ=") or c.startswith(b"+CSCLK="):
+            return b"OK"
+        key = c.decode()
+        if key in IDENTITY:
+            out.append(IDENTITY[key])
+            return b"OK"
+        if c.startswith(b"+CREG") or c.startswith(b"+CEREG"):
+            return self._registration(c, out)
+        if c.startswith(b"+CMGF="):
+            self.cmgf = int(c[6:])
+            return b"OK"
+        if c.startswith(b"+CNMI="):
+            fields = c[6:].split(b",")
+            self.cnmi_mt = int(fields[1]) if len(fields) > 1 and fields[1] else 0
+            return b"OK"
+        if c.startswith(b"+CPMS="):
+            used = len(self.messages)
+            out.append(b"+CPMS: %d,%d,%d,%d,%d,%d" % ((used, self.capacity) * 3))
+            return b"OK"
+        if c.startswith(b"+CMGL"):
+            return self._cmgl(command, out)
+        if c.startswith(b"+CMGR="):
+            return self._cmgr(int(c[6:]), out)
+        if c.startswith(b"+CMGD="):
+            fields = c[6:].split(b",")
+            flag = int(fields[1]) if len(fields) > 1 else 0
+            if flag == 4:
+                self.messages = {}
+            elif flag:
+                self.messages = {i: m for i, m in self.messages.items() if m.stat >= flag}
+            elif self.messages.pop(int(fields[0]), None) is None and int(fields[0]) >= self.capacity:
+                return b"+CMS ERROR: 321"
+            return b"OK"
+        if c.startswith(b"+CMGS="):
+            target = command[6:].strip(b'"')
+            self.prompt = target
+            self.line = bytearray()
+            self._send(self.latency["default"], b"\r\n> ")
+            return None
+        if c.startswith(b"D"):
+            return self._dial(command[1:].rstrip(b";").decode())
+        if c == b"A":
+            return self._answer()
+        if c == b"+CHUP":
+            self._hangup_all(local=True)
+            return b"OK"
+        if c == b"+CLCC":
+            out.extend(call.clcc() for call in self.calls.values())
+            return b"OK"
+        if c.startswith(b"+CLCC="):
+            self.clcc_urc = c.endswith(b"1")
+            return b"OK"
+        if c.startswith(b"+CGPS"):
+            return self._gps(c, out)
+        if c.startswith(b"+CPB"):
+            return self._phonebook(c, command, out)
+        return b"ERROR"
+
+    def _registration(self, c, out):
+        cereg = c.startswith(b"+CEREG")
+        name = b"+CEREG" if cereg else b"+CREG"
+        rest = c[len(name):]
+        if rest == b"?":
+            n = self.cereg_n if cereg else self.creg_n
+            out.append(name + b": %d,%s" % (n, self._reg_fields(n)))
+            return b"OK"
+        if rest.startswith(b"="):
+            n = int(rest[1:])
+            if cereg:
+                self.cereg_n = n
+            else:
+                self.creg_n = n
+            return b"OK"
+        return b"ERROR"
+
+    def _reg_fields(self, n):
+        if n >= 2 and self.reg_stat in (1, 5):
+            return b'%d,"%04X","%08X",7' % (self.reg_stat, self.lac, self.ci)
+        return b"%d" % self.reg_stat
+
+    def set_registration(self, stat, delay_ms=0):
+        """Change the registration state, with URCs as enabled by +CREG/+CEREG"""
+        def change():
+            self.reg_stat = stat
+            if self.creg_n:
+                self._urc(b"+CREG: " + self._reg_fields(self.creg_n))
+            if self.cereg_n:
+                self._urc(b"+CEREG: " + self._reg_fields(self.cereg_n))
+        self.after(delay_ms, change)
+
+    # --- SMS ---------------------------------------------------------------------
+
+    def _free_index(self):
+        for index in range(self.capacity):
+            if index not in self.messages:
+                return index
+        return None
+
+    def _cmgl(self, command, out):
+        arg = command[6:].strip(b'"').upper()
+        if self.cmgf:
+            wanted = None if arg == b"ALL" else STAT_NAMES.index(arg.decode())
+        else:
+            wanted = None if arg in (b"", b"4") else int(arg)
+        for index in sorted(self.messages):
+            message = self.messages[index]
+            if wanted is not None and message.stat != wanted:
+                continue
+            out.append(self._record(b"+CMGL: %d," % index, message))
+            if message.stat == 0:
+                message.stat = 1
+        return b"OK"
+
+    def _cmgr(self, index, out):
+        message = self.messages.get(index)
+        if message is None:
+            return b"+CMS ERROR: 321"
+        out.append(self._record(b"+CMGR: ", message))
+        if message.stat == 0:
+            message.stat = 1
+        return b"OK"
+
+    def _record(self, head, message):
+        if self.cmgf:
+            return head + b'"%s","%s",,"26/10/17,12:00:00+00"\r\n%s' % (
+                STAT_NAMES[message.stat].encode(), message.sender.encode(), message.text.encode())
+        return head + b"%d,,%d\r\n%s" % (message.stat, len(message.pdu) // 2 - 1, message.pdu)
+
+    def _sms_submit(self, target, payload):
+        self.sent.append((target, payload))
+        if not self.cmgf:
+            # Check the PDU is well formed: SMSC length, then an SMS-SUBMIT
+            try:
+                tpdu = from_hex(payload.strip())
+                valid = len(tpdu) - 1 - tpdu[0] == int(target) and tpdu[1 + tpdu[0]] & 0x03 == MTI_SUBMIT
+            except (ValueError, IndexError):
+                valid = False
+            if not valid:
+                self._send(self.latency["default"], b"\r\n+CMS ERROR: 304\r\n")
+                return
+        self.mr = (self.mr + 1) & 0xFF
+        self._send(self.latency["+CMGS"], b"\r\n+CMGS: %d\r\n\r\nOK\r\n" % self.mr)
+
+    def receive_sms(self, sender, text, delay_ms=0, parts=None):
+        """Deliver an SMS from sender after delay_ms; parts (1-based) limits a long one"""
+        def arrive():
+            s = self.clock_s
+            self.clock_s += 1
+            timestamp = (26, 10, 17, 12 + s // 3600 % 12, s // 60 % 60, s % 60)
+            for seq, pdu in enumerate(deliver_pdus(sender, text, timestamp), 1):
+                if parts is not None and seq not in parts:
+                    continue    # Lost in the network
+                index = self._free_index()
+                if index is None:
+                    self.dropped_sms += 1
+                    continue
+                self.messages[index] = Message(0, sender, text, pdu)
+                if self.cnmi_mt == 1:
+                    self._urc(b'+CMTI: "SM",%d' % index)
+                elif self.cnmi_mt == 2:
+                    self.messages.pop(index)
+                    self._urc(b"+CMT: ,%d\r\n%s" % (len(pdu) // 2 - 1, pdu))
+        self.after(delay_ms, arrive)
+
+    def sms_burst(self, count, spacing_ms=5, sender="+15551230000"):
+        """count messages arriving spacing_ms apart"""
+        for i in range(count):
+            self.receive_sms(sender, f"Burst message {i}", i * spacing_ms)
+
+    # --- Phonebook ---------------------------------------------------------------
+
+    def _phonebook(self, c, command, out):
+        if c.startswith(b"+CPBS="):
+            return b"OK" if c[6:] == b'"SM"' else b"+CME ERROR: 3"
+        if c == b"+CPBS?":
+            out.append(b'+CPBS: "SM",%d,%d' % (len(self.phonebook), self.phonebook_size))
+            return b"OK"
+        if c == b"+CPBR=?":
+            out.append(b"+CPBR: (1-%d),40,14" % self.phonebook_size)
+            return b"OK"
+        if c.startswith(b"+CPBR="):
+            fields = c[6:].split(b",")
+            first = int(fields[0])
+            last = int(fields[1]) if len(fields) > 1 else first
+            if not 1 <= first <= last <= self.phonebook_size:
+                return b"+CME ERROR: 21"    # Invalid index
+            found = 0
+            for index in range(first, last + 1):
+                entry = self.phonebook.get(index)
+                if entry:
+                    number, name = entry
+                    out.append(b'+CPBR: %d,"%s",%d,"%s"' % (
+                        index, number.encode(), 145 if number.startswith("+") else 129,
+                        name.encode()))
+                    found += 1
+            self.busy_ms = found * PHONEBOOK_ENTRY_MS
+            return b"OK" if found else b"+CME ERROR: 22"   # Not found
+        return b"ERROR"
+
+    def fill_phonebook(self, count, duplicates=0):
+        """Store count synthetic contacts; the last `duplicates` repeat numbers"""
+        self.phonebook = {}
+        for i in range(count):
+            n = i - count + duplicates if i >= count - duplicates else i
+            # Mixed formats, as typed into old phones over the years; a
+            # duplicate has the other format than the entry it repeats
+            international = (n % 3 != 0) != (n != i)
+            number = f"+1555{n:07d}" if international else f"001555{n:07d}"
+            self.phonebook[i + 1] = (number, f"Contact {i}")
+
+    # --- Calls -------------------------------------------------------------------
+
+    def _report(self, call):
+        if self.clcc_urc:
+            self._urc(call.clcc())
+
+    def _new_call(self, incoming, stat, number):
+        call = Call(self.next_call_id, incoming, stat, number)
+        self.next_call_id = self.next_call_id % 7 + 1
+        self.calls[call.id] = call
+        return call
+
+    def _dial(self, number):
+        if not number or self.reg_stat not in (1, 5):
+            return b"NO CARRIER"
+        call = self._new_call(0, 2, number)
+        self._report(call)
+
+        def answered():
+            if self.calls.get(call.id) is call:
+                call.stat = 0
+                self._urc(b"VOICE CALL: BEGIN")
+                self._report(call)
+        self.after(self.answer_ms, answered)
+        return b"OK"
+
+    def _answer(self):
+        for call in self.calls.values():
+            if call.stat == 4:
+                call.stat = 0
+                self._send(self.latency["default"], b"\r\nOK\r\n\r\nVOICE CALL: BEGIN\r\n")
+                self._report(call)
+                return None
+        return b"NO CARRIER"
+
+    def _end(self, call):
+        if self.calls.pop(call.id, None) is None:
+            return
+        if call.stat == 0:
+            self._urc(b"VOICE CALL: END: 000010")
+        call.stat = 6
+        self._report(call)
+
+    def _hangup_all(self, local=False):
+        for call in list(self.calls.values()):
+            self._end(call)
+        if not local:
+            self._urc(b"NO CARRIER")
+
+    def incoming_call(self, number, rings=3, delay_ms=0, hangup=True):
+        """A call from number ringing `rings` times, abandoned unless answered"""
+        period = int(3000 * self.time_scale)
+
+        def ring(left, call):
+            if self.calls.get(call.id) is not call or call.stat != 4:
+                return
+            if left == 0:
+                if hangup:
+                    self.calls.pop(call.id)
+                    call.stat = 6
+                    self._report(call)
+                    self._urc(b"NO CARRIER")
+                return
+            self._urc(b"RING")
+            if self.clip:
+                self._urc(b'+CLIP: "%s",145,,,,0' % number.encode())
+            self.after(period, lambda: ring(left - 1, call))
+
+        def arrive():
+            call = self._new_call(1, 4, number)
+            self._report(call)
+            ring(rings, call)
+        self.after(delay_ms, arrive)
+
+    def call_storm(self, count, spacing_ms=50, rings=1):
+        """count callers in quick succession, each giving up after `rings`"""
+        for i in range(count):
+            self.incoming_call(f"+1555000{i:04d}", rings, i * spacing_ms)
+
+    def remote_hangup(self):
+        self._hangup_all()
+
+    # --- GNSS --------------------------------------------------------------------
+
+    def _gps(self, c, out):
+        if c in (b"+CGPS=1", b"+CGPSHOT", b"+CGPSWARM", b"+CGPSCOLD"):
+            if self.gps_on:
+                return b"ERROR"
+            self.gps_on = True
+            self.gps_started = ticks_ms()
+            return b"OK"
+        if c == b"+CGPS=0":
+            self.gps_on = False
+            self.gps_interval = 0
+            return b"OK"
+        if c.startswith(b"+CGPSINFO="):
+            self.gps_interval = int(c[10:]) if self.gps_on else 0
+            self.gps_next = ticks_ms()
+            return b"OK"
+        if c == b"+CGPSINFO":
+            out.append(b"+CGPSINFO: " + self._gps_info())
+            return b"OK"
+        return b"ERROR"
+
+    def _gps_info(self):
+        if not self.gps_on or ticks_diff(ticks_ms(), self.gps_started) < self.gps_fix_after_ms:
+            return b",,,,,,,,"
+        self.gps_reports += 1
+        # Walk north one second of latitude-minutes per report
+        minutes = 36.3694 + self.gps_reports * 0.0001
+        return b"%02d%09.6f,N,12219.9260,W,171026,120000.0,56.0,0.0,0.0" % (47, minutes)
@@ -1,55 +1,50 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem_power import ModemPower # type: ignore
+from modem import Modem, RESULT_OK # type: ignore
+from modem_status import ModemStatus # type: ignore
+from identity_cache import IdentityCache # type: ignore
+from storage import mount_flash # type: ignore
+from modem_link import ModemLink # type: ignore
+from location import LocationManager # type: ignore
+from signal_monitor import rssi_bars, rssi_dbm # type: ignore
+from registration import parse_registration, ACT_NAMES # type: ignore
+from at_parse import find # type: ignore
+from at_record import RecordingUART # type: ignore
+from at_stats import modem_stats # type: ignore
 from machine import UART, Pin
 import time
 
 # Initialize UART for SIM7600G
 uart = UART(0, baudrate=115200, tx=Pin(0), rx=Pin(1))
+# Set to keep an AT transcript on flash for replay on the host
+# (tests/sim/replay_uart.py)
+RECORD_TRACE = False
+if RECORD_TRACE:
+    uart = RecordingUART(uart)
+modem = Modem(uart)
 
 # Power control pins
-power_key = Pin(2, Pin.OUT)
+power_key = Pin(2, Pin.OUT, value=1)
 status_pin = Pin(3, Pin.IN)
+power = ModemPower(modem, power_key, status_pin)
+location = LocationManager(modem)
 
-# Reset and power on the module
+# Power on the module, returning as soon as it accepts commands
 def reset_and_power_on_sim7600g():
-    # Simple power on sequence
-    power_key.value(1)  # Ensure off first
-    time.sleep(0.5)
-    power_key.value(0)  # Pull low to power on
-    time.sleep(1)       # Hold for 1 second
-    power_key.value(1)  # Release
-    print("SIM7600G power on sequence sent")
+    # No pulse if STATUS shows the module already running: a second pulse
+    # would switch it off
+    if power.power_on(timeout=30):
+        print(f"SIM7600G ready ({power.report()})")
+        return True
+    print("SIM7600G did not become ready within 30 s")
+    return False
 
 # Send AT command and get response
 def send_at_command(command, timeout=5):
-    print(f"Sending: {command}")
-
-    uart.write(command + '\r\n')
-    
-    full_response_bytes = b""
-    start_time = time.time()
-    
-    # Continuously try to read for the 'timeout' duration
-    while (time.time() - start_time) < timeout:
-        if uart.any():
-            chunk = uart.read()
-            if chunk:
-                full_response_bytes += chunk
-        time.sleep(0.1) # Slightly longer delay for stability
-
-    response_str = ""
-    if full_response_bytes:
-        try:
-            response_str = full_response_bytes.decode('utf-8')
-            print(f"Response: {response_str.strip()}")
-        except UnicodeDecodeError:
-            # Handle decode errors by converting to string representation
-            response_str = str(full_response_bytes) 
-            print(f"Response (raw): {response_str}")
-    else:
-        print(f"No response from module for command '{command}' after {timeout}s")
-
-    # Add delay between commands for stability
-    time.sleep(0.5)
-    return response_str
+    # Returns as soon as the module sends a final result code;
+    # timeout is only an upper bound
+    return modem.send_at_command(command, timeout)
 
 # Basic AT test
 def test_basic_at():
@@ -57,10 +52,9 @@ def test_basic_at():
     
     # Try a few times in case module is still sending boot messages
     for attempt in range(5):
-        response = send_at_command("AT", timeout=2)
-        
-        # Accept various valid responses from the module
-        if any(keyword in response for keyword in ["OK", "RDY", "READY", "+CPIN"]):
+        # Boot messages (RDY, +CPIN: READY) are URCs, not the answer to AT
+        result, _ = modem.command("AT", timeout=2)
+        if result == RESULT_OK:
             print("Module is responding - AT communication successful!")
             return True
             
@@ -74,17 +68,29 @@ def test_basic_at():
 # Get signal strength
 def get_signal_strength():
     print("\n=== Signal Strength ===")
-    response = send_at_command("AT+CSQ")
-    return response
+    _, raw = modem.command("AT+CSQ")
+    parsed = find(raw.split(b"\r\n"), b"+CSQ:")
+    if parsed:
+        rssi, ber = parsed
+        print(f"{rssi_bars(rssi)} bars ({rssi_dbm(rssi)} dBm, ber {ber})")
+    return parsed
 
 # Check network registration status
 def check_network_registration():
     print("\n=== Network Registration Status ===")
-    # Check 2G/3G registration
-    response1 = send_at_command("AT+CREG?")
-    # Check LTE registration
-    response2 = send_at_command("AT+CEREG?")
-    return response1, response2
+    # 2G/3G, then LTE: <stat> 1 = home, 5 = roaming, whatever <n> is set to
+    states = []
+    for query, prefix in (("AT+CREG?", b"+CREG:"), ("AT+CEREG?", b"+CEREG:")):
+        _, raw = modem.command(query)
+        parsed = None
+        for line in raw.split(b"\r\n"):
+            if line.startswith(prefix):
+                parsed = parse_registration(line, solicited=True)
+        if parsed:
+            stat, lac, ci, act = parsed
+            print(f"{query[3:-1]}: stat={stat} lac={lac} ci={ci} act={ACT_NAMES.get(act, act)}")
+        states.append(parsed)
+    return states
 
 # Get current network operator
 def get_network_operator():
@@ -128,113 +134,62 @@ def get_network_attach_status():
     response = send_at_command("AT+CGATT?")
     return response
 
-# Turn GPS on
-def turn_gps_on():
-    print("\n=== Turning GPS On ===")
-    response = send_at_command("AT+CGPS=1", timeout=3)
-    return response
-
-# Turn GPS off
+# Turn GPS off, keeping the last fix on flash for the next hot start
 def turn_gps_off():
     print("\n=== Turning GPS Off ===")
-    response = send_at_command("AT+CGPS=0", timeout=3)
-    return response
-
-# Get GPS location information
-def get_gps_location():
-    print("\n=== GPS Location Information ===")
-    response = send_at_command("AT+CGPSINFO", timeout=5)
-    return response
-
-# Parse GPS response and extract coordinates
-def parse_gps_info(gps_response):
-    print("\n=== Parsing GPS Information ===")
-    
-    if not gps_response or "+CGPSINFO:" not in gps_response:
-        print("No valid GPS data received")
-        return None
-    
     try:
-        # Extract the GPS data line
-        lines = gps_response.strip().split('\n')
-        gps_line = None
-        for line in lines:
-            if "+CGPSINFO:" in line:
-                gps_line = line
-                break
-        
-        if not gps_line:
-            print("GPS data line not found")
-            return None
-            
-        # Parse the GPS data: +CGPSINFO: lat,lat_dir,lon,lon_dir,date,utc_time,alt,speed,course
-        gps_data = gps_line.split(":")[1].strip()
-        parts = gps_data.split(",")
-        
-        if len(parts) >= 9 and parts[0] and parts[2]:  # Check if we have valid lat/lon
-            lat = parts[0]
-            lat_dir = parts[1]
-            lon = parts[2] 
-            lon_dir = parts[3]
-            date = parts[4]
-            utc_time = parts[5]
-            altitude = parts[6]
-            speed = parts[7]
-            course = parts[8]
-            
-            print(f"Latitude: {lat} {lat_dir}")
-            print(f"Longitude: {lon} {lon_dir}")
-            print(f"Date: {date}")
-            print(f"UTC Time: {utc_time}")
-            print(f"Altitude: {altitude} meters")
-            print(f"Speed: {speed} km/h")
-            print(f"Course: {course} degrees")
-            
-            return {
-                'latitude': f"{lat} {lat_dir}",
-                'longitude': f"{lon} {lon_dir}",
-                'date': date,
-                'utc_time': utc_time,
-                'altitude': altitude,
-                'speed': speed,
-                'course': course
-            }
-        else:
-            print("GPS fix not available - waiting for satellite lock")
-            return None
-            
-    except Exception as e:
-        print(f"Error parsing GPS data: {e}")
-        return None
-
-# Test GPS functionality with multiple attempts
-def test_gps_location():
+        location.stop()
+    except OSError as e:
+        print(f"Flash not available to keep the last fix: {e}")
+
+# Print a fix (fixed-point: micro-degrees, cm, cm/s, centi-degrees)
+def print_fix(fix):
+    print(f"Latitude: {fix.lat / 1e6:.6f}")
+    print(f"Longitude: {fix.lon / 1e6:.6f}")
+    print(f"Date: {fix.year:04d}-{fix.month:02d}-{fix.day:02d}")
+    seconds = fix.time_ms // 1000
+    print(f"UTC Time: {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}")
+    print(f"Altitude: {fix.alt / 100} meters")
+    print(f"Speed: {fix.speed * 36 / 1000:.1f} km/h")
+    print(f"Course: {fix.course / 100} degrees")
+
+# Test GPS functionality: hot/warm start from the cached fix, then wait for
+# the first auto-reported fix
+def test_gps_location(timeout=100):
     print("\n=== GPS Location Test ===")
+    print(f"Start mode: {location.start_mode()} (last fix age: {location.age()} s)")
     
-    # Turn on GPS
-    turn_gps_on()
-    print("Waiting for GPS to initialize...")
-    time.sleep(3)
+    start = time.ticks_ms()
+    try:
+        fix = location.locate(timeout=timeout, max_age=0, keep_on=True)
+    except OSError as e:
+        print(f"Flash not available to keep the fix: {e}")
+        fix = location.fix if location.session_fixed else None
     
-    # Try to get GPS location multiple times
-    max_attempts = 10
-    for attempt in range(max_attempts):
-        print(f"\nGPS attempt {attempt + 1}/{max_attempts}")
-        gps_response = get_gps_location()
-        gps_data = parse_gps_info(gps_response)
-        
-        if gps_data:
-            print("GPS fix obtained successfully!")
-            return gps_data
-        else:
-            if attempt < max_attempts - 1:
-                print("No GPS fix yet, waiting 10 seconds...")
-                time.sleep(10)
+    if fix:
+        print(f"GPS fix obtained after {time.ticks_diff(time.ticks_ms(), start)} ms "
+              f"({location.gnss.reports} reports)")
+        print_fix(fix)
+        print(f"Time to first fix: {location.ttff_stats()}")
+        return fix
     
-    print("Could not obtain GPS fix after multiple attempts")
+    print(f"Could not obtain GPS fix within {timeout} s")
     print("Note: GPS may need clear sky view and more time for first fix")
     return None
 
+# Print a ModemStatus snapshot
+def print_status(status):
+    print("\n=== Modem Status ===")
+    print(f"SIM: {status.sim}")
+    print(f"IMSI: {status.imsi}")
+    print(f"ICCID: {status.iccid}")
+    print(f"IMEI: {status.imei}")
+    print(f"Signal: rssi={status.rssi} ber={status.ber}")
+    print(f"Registration: CREG={status.creg} CEREG={status.cereg}")
+    print(f"Operator: {status.operator} (AcT {status.act})")
+    print(f"Attached: {status.attached}")
+    print(f"Serving cell: {status.system_mode} {status.cell}")
+
 # Comprehensive test function
 def run_comprehensive_test():
     print("Starting comprehensive SIM7600G test...")
@@ -244,20 +199,22 @@ def run_comprehensive_test():
         print("ERROR: Basic AT communication failed!")
         return False
     
-    # Check SIM card status
-    check_sim_status()
+    # Rates above 115200 need RTS/CTS, which this board does not wire
+    # (UART0's CTS/RTS pins are PWRKEY and STATUS): measure the default link
+    link = ModemLink(modem)
+    link.measure_throughput()
+    print(f"\nModem link: {link.report()}")
     
-    # Get identity information
-    get_imsi()
-    get_iccid()
-    get_imei()
+    # Identity from the flash cache (the modem is only asked on a new SIM)
+    try:
+        mount_flash()
+        identity = IdentityCache().get(modem)
+        print(f"\nCached identity: {identity}")
+    except OSError as e:
+        print(f"\nFlash not available for identity cache: {e}")
     
-    # Check network connectivity
-    get_signal_strength()
-    check_network_registration()
-    get_network_operator()
-    get_network_attach_status()
-    get_serving_cell_info()
+    # SIM, identity and network status in a single round trip
+    print_status(ModemStatus(modem).snapshot())
     
     # Test GPS functionality
     gps_data = test_gps_location()
@@ -265,13 +222,20 @@ def run_comprehensive_test():
     # Turn off GPS to save power
     turn_gps_off()
     
+    print("\n=== AT Command Latency ===")
+    modem_stats()
+    
+    if RECORD_TRACE:
+        try:
+            print(f"\nSaved {uart.save()} AT events to flash")
+        except OSError as e:
+            print(f"\nFlash not available for the AT transcript: {e}")
+    
     print("\n=== Test Complete ===")
     return True
 
 # Usage
 print("Resetting and powering on SIM7600G...")
 reset_and_power_on_sim7600g()
-print("Waiting for module to boot...")
-time.sleep(5)
 
 run_comprehensive_test()
\ No newline at end of file
@@ -0,0 +1,210 @@
+import sys
+sys.path.insert(0, '../../hw')
+import gc
+from modem_async import AsyncModem, asyncio # type: ignore
+from message_store import MessageStore # type: ignore
+from inbox_sync import InboxSync, clock_timestamp # type: ignore
+from sms_concat import ConcatStore, MISSING, ts_seconds # type: ignore
+from sms_pdu import decode_deliver, from_hex # type: ignore
+from sim7600_emulator import SIM7600Emulator, deliver_pdus
+
+# Long SMS reassembly test: parts in any order, duplicates after a power
+# cut, reboots mid-set, expiry and slot eviction, then the inbox getting
+# one message for a long SMS sent through the SIM7600G emulator.
+# Runs on the host (python3) or on the Pico.
+
+CONCAT_DIR = "sms_concat_test.d"
+STORE_PATH = "sms_concat_test.jsonl"
+SENDER = "+15551230000"
+LONG_TEXT = " ".join(f"word{i}" for i in range(80))     # Four parts
+
+
+def remove_files():
+    import os
+    try:
+        for name in os.listdir(CONCAT_DIR):
+            os.remove(f"{CONCAT_DIR}/{name}")
+        os.rmdir(CONCAT_DIR)
+    except OSError:
+        pass
+    try:
+        os.remove(STORE_PATH)
+    except OSError:
+        pass
+
+
+def parts(text, sender=SENDER, timestamp=(26, 10, 17, 12, 0, 0)):
+    """Decoded SMS-DELIVER records of a long message"""
+    return [decode_deliver(from_hex(pdu)) for pdu in deliver_pdus(sender, text, timestamp)]
+
+
+def test_timestamps():
+    assert ts_seconds((2000, 1, 1, 0, 0, 0, 0)) == 0
+    assert ts_seconds((2000, 3, 1, 0, 0, 0, 0)) == 60 * 86400     # 2000 is a leap year
+    assert ts_seconds((2026, 10, 17, 12, 0, 0, -420)) - ts_seconds((2026, 10, 17, 12, 0, 0, 0)) == 7 * 3600
+    assert ts_seconds((2027, 1, 1, 0, 0, 0, 0)) - ts_seconds((2026, 1, 1, 0, 0, 0, 0)) == 365 * 86400
+    print("Timestamps ✓")
+
+
+def test_out_of_order():
+    remove_files()
+    records = parts(LONG_TEXT)
+    assert len(records) == 4 and records[0]['concat'][1] == 4
+    store = ConcatStore(CONCAT_DIR)
+    for record in (records[2], records[0], records[3]):
+        assert store.add(record) == []
+    assert store.pending() == 1
+    message, = store.add(records[1])
+    assert message['text'] == LONG_TEXT and message['parts'] == 4 and message['missing'] == 0
+    assert message['sender'] == SENDER and message['timestamp'] == records[0]['timestamp']
+    assert store.pending() == 0
+
+    # A part fetched again after a power cut (before its AT+CMGD) is dropped
+    assert store.add(records[1]) == []
+    assert ConcatStore(CONCAT_DIR).add(records[3]) == []
+
+    # Ordinary messages pass straight through
+    single = parts("Hi")[0]
+    assert store.add(single) == [single]
+    print("Out of order and duplicates ✓")
+
+
+def test_reboot():
+    remove_files()
+    records = parts(LONG_TEXT + " again")
+    store = ConcatStore(CONCAT_DIR)
+    store.add(records[0])
+    store.add(records[1])
+    del store
+    gc.collect()
+    # Only the index is rebuilt; the parts stay on flash
+    store = ConcatStore(CONCAT_DIR)
+    assert store.pending() == 1
+    assert store.add(records[1]) == []
+    store.add(records[3])
+    message, = store.add(records[2])
+    assert message['text'] == LONG_TEXT + " again", message['text']
+    print("Reboot mid-set ✓")
+
+
+def test_expiry_and_eviction():
+    remove_files()
+    store = ConcatStore(CONCAT_DIR, slots=3, max_age_s=3600)
+    old = parts(LONG_TEXT, timestamp=(26, 10, 17, 9, 0, 0))
+    store.add(old[0])
+    store.add(old[2])
+
+    # A part stamped more than an hour later expires the old set
+    late = parts("Later " + LONG_TEXT, timestamp=(26, 10, 17, 10, 30, 0))
+    expired, = store.add(late[0])
+    assert expired['missing'] == 2 and expired['text'].count(MISSING) == 2, expired
+    assert expired['text'].startswith("word0 ") and "word50" in expired['text']
+
+    # Sets beyond the slot count push out the least recently used one
+    others = [parts(LONG_TEXT, sender=f"+1555999000{i}", timestamp=(26, 10, 17, 10, 31, i))
+              for i in range(3)]
+    assert store.add(others[0][0]) == [] and store.add(others[1][0]) == []
+    evicted, = store.add(others[2][0])
+    assert evicted['text'].startswith("Later ") and evicted['missing'] == 3, evicted
+    assert store.pending() == 3
+
+    # A completed set's tombstone is reused before an incomplete set
+    for record in others[0][1:]:
+        store.add(record)
+    assert store.add(parts(LONG_TEXT, sender="+15559990009", timestamp=(26, 10, 17, 10, 32, 0))[0]) == []
+    assert store.pending() == 3
+
+    # An ordinary message a day later expires the sets it passes
+    single = parts("Tomorrow", timestamp=(26, 10, 18, 12, 0, 0))[0]
+    ready = store.add(single)
+    assert ready[-1] is single and len(ready) == 4, ready
+    assert store.pending() == 0
+    print("Expiry and eviction ✓")
+
+
+def test_clock():
+    assert clock_timestamp(b"26/10/17,12:00:00+08") == (2026, 10, 17, 12, 0, 0, 120)
+    assert clock_timestamp(b"26/10/17,12:00:00-28") == (2026, 10, 17, 12, 0, 0, -420)
+    assert clock_timestamp(b"80/01/06,00:00:03+00") is None    # Not set by the network yet
+    assert clock_timestamp(b"garbage") is None
+    print("Module clock ✓")
+
+
+async def test_lone_part():
+    remove_files()
+    uart = SIM7600Emulator()
+    modem = AsyncModem(uart)
+    modem.start()
+    received = []
+    inbox = InboxSync(modem, MessageStore(STORE_PATH), received.append, ConcatStore(CONCAT_DIR),
+                      expire_interval=0.1)
+    assert await inbox.enable()
+    inbox.start()
+    uart.receive_sms(SENDER, LONG_TEXT, parts=(1,))
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if not uart.messages and not inbox.pending:
+            break
+    assert not received and inbox.concat.pending() == 1
+
+    # No other long message comes: the clock alone expires the set
+    uart.rtc = b"26/10/18,12:00:01+00"
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if received:
+            break
+
+    # Without a network clock the newest service centre time stands in
+    uart.rtc = b"80/01/06,00:00:03+00"
+    sent = ts_seconds((2026, 10, 17, 12, 0, 0, 0))
+    assert 0 <= await inbox.now() - sent <= 5
+    inbox.stop()
+    modem.stop()
+    message, = received
+    assert message['missing'] == 3 and message['text'].startswith("word0 "), message
+    assert inbox.concat.pending() == 0
+    assert [m['missing'] for m in MessageStore(STORE_PATH).messages()] == [3]
+    remove_files()
+    print("Lone part expires on the clock ✓")
+
+
+async def test_inbox():
+    remove_files()
+    uart = SIM7600Emulator()
+    modem = AsyncModem(uart)
+    modem.start()
+    received = []
+    inbox = InboxSync(modem, MessageStore(STORE_PATH), received.append, ConcatStore(CONCAT_DIR))
+    assert await inbox.enable()
+    inbox.start()
+    uart.receive_sms(SENDER, LONG_TEXT)
+    uart.receive_sms("+15559870000", "Short one", delay_ms=5)
+    for _ in range(300):
+        await asyncio.sleep(0.01)
+        if len(received) == 2 and not inbox.pending:
+            break
+    inbox.stop()
+    modem.stop()
+    texts = sorted(r['text'] for r in received)
+    assert texts == ["Short one", LONG_TEXT], texts
+    stored = list(MessageStore(STORE_PATH).messages())
+    assert len(stored) == 2 and not uart.messages, (len(stored), len(uart.messages))
+    assert [m['parts'] for m in stored if m['text'] == LONG_TEXT] == [4]
+    remove_files()
+    print("Inbox gets one message per long SMS ✓")
+
+
+async def run_test():
+    print("=== Long SMS Reassembly Test ===")
+    test_timestamps()
+    test_out_of_order()
+    test_reboot()
+    test_expiry_and_eviction()
+    test_clock()
+    await test_inbox()
+    await test_lone_part()
+    print("\n✓ Long SMS reassembly test completed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
@@ -0,0 +1,88 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import Modem, ticks_ms, ticks_diff, RESULT_OK # type: ignore
+from modem_async import AsyncModem, asyncio # type: ignore
+from sms import list_messages, list_messages_async, STAT_REC_READ, STAT_REC_UNREAD # type: ignore
+from fake_uart import ScriptedUART
+
+# Streaming +CMGL parser test.
+# Runs against a scripted fake UART, on the host (python3) or on the Pico.
+
+DELIVER_HEX = b"07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07"
+MESSAGES = 20
+SPACING_MS = 25     # The module trickles a full store out over time
+
+
+def pdu_listing():
+    replies = [(0, b"\r\n")]
+    for i in range(MESSAGES):
+        stat = i % 2
+        replies.append((i * SPACING_MS, b"+CMGL: %d,%d,,%d\r\n%s\r\n" % (i, stat, 39, DELIVER_HEX)))
+    # A stored outgoing message is not an SMS-DELIVER
+    replies.append((MESSAGES * SPACING_MS, b"+CMGL: 99,2,,18\r\n0011000B915155214365F70000AA05E8329BFD06\r\n"))
+    replies.append((MESSAGES * SPACING_MS + 5, b"\r\nOK\r\n"))
+    return replies
+
+
+SCRIPT = [
+    (b"AT+CMGL=4", pdu_listing()),
+    (b'AT+CMGL="ALL"', [(10, b'\r\n+CMGL: 1,"REC UNREAD","+15551230000","Smith, John","26/10/17,12:00:00-28"\r\n'
+                             b'Line one, with a comma\r\nLine two\r\n'
+                             b'+CMGL: 2,"REC READ","+15559870000",,"26/10/17,12:05:00-28"\r\n'
+                             b'Short\r\n\r\nOK\r\n')]),
+]
+
+
+def test_pdu_streaming():
+    modem = Modem(ScriptedUART(SCRIPT), verbose=False)
+    start = ticks_ms()
+    first = None
+    records = []
+    for record in list_messages(modem):
+        if first is None:
+            first = ticks_diff(ticks_ms(), start)
+        records.append(record)
+    total = ticks_diff(ticks_ms(), start)
+
+    assert modem.last_result == RESULT_OK
+    assert len(records) == MESSAGES + 1, len(records)
+    assert records[0]['text'] == "How are you?"
+    assert records[0]['sender'] == "+31641600986"
+    assert records[0]['stat'] == STAT_REC_UNREAD and records[1]['stat'] == STAT_REC_READ
+    assert records[-1]['index'] == 99 and records[-1]['text'] is None
+    # The first message is usable long before the listing finishes
+    assert first < total // 4, (first, total)
+    print(f"PDU listing: first message after {first} ms, {len(records)} messages in {total} ms")
+
+
+def test_text_mode():
+    modem = Modem(ScriptedUART(SCRIPT), verbose=False)
+    records = list(list_messages(modem, pdu=False))
+    assert modem.last_result == RESULT_OK
+    assert len(records) == 2
+    assert records[0]['sender'] == "+15551230000"
+    assert records[0]['text'] == "Line one, with a comma\nLine two", records[0]['text']
+    assert records[0]['timestamp'] == "26/10/17,12:00:00-28"
+    assert records[1]['stat'] == STAT_REC_READ and records[1]['text'] == "Short"
+    print("Text listing: quoted commas and multi-line bodies parsed")
+
+
+async def test_async_streaming():
+    modem = AsyncModem(ScriptedUART(SCRIPT))
+    modem.start()
+    start = ticks_ms()
+    arrivals = []
+    ok = await list_messages_async(modem, lambda record: arrivals.append(ticks_diff(ticks_ms(), start)))
+    modem.stop()
+    assert ok
+    assert len(arrivals) == MESSAGES + 1
+    assert arrivals[0] < arrivals[-1] // 4, arrivals
+    print(f"Async listing: first message after {arrivals[0]} ms, last after {arrivals[-1]} ms")
+
+
+if __name__ == "__main__":
+    print("=== SMS Listing Test ===")
+    test_pdu_streaming()
+    test_text_mode()
+    asyncio.run(test_async_streaming())
+    print("=== SMS listing tests passed ===")
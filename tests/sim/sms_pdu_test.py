@@ -0,0 +1,120 @@
+import sys
+sys.path.insert(0, '../../hw')
+from sms_pdu import (encode_submit, decode_deliver, from_hex, decode_gsm7, # type: ignore
+                     pack_septets, gsm7_septets, decode_user_data, UDHI)
+
+# Round-trip tests for the SMS PDU codec.
+# Runs on the host (python3) or on the Pico.
+
+# SMS-DELIVER example from 3GPP TS 23.040 / GSM 03.40 literature
+DELIVER_HEX = b"07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07"
+
+
+def submit_to_deliver(pdu_hex):
+    """Turn an encoded SMS-SUBMIT into the SMS-DELIVER a recipient would get"""
+    submit = from_hex(pdu_hex)
+    pos = 1 + submit[0]         # Skip the SMSC prefix
+    first = submit[pos]
+    digits = submit[pos + 2]
+    address = bytes(submit[pos + 2:pos + 4 + (digits + 1) // 2])
+    rest = pos + 4 + (digits + 1) // 2
+    pid, dcs = submit[rest], submit[rest + 1]
+    ud = bytes(submit[rest + 3:])   # Skip TP-VP (relative, one octet)
+    deliver = bytearray(b"\x00")
+    deliver.append(first & UDHI)
+    deliver.extend(address)
+    deliver.extend(bytes((pid, dcs)))
+    deliver.extend(b"\x62\x01\x71\x21\x43\x65\x8a")    # 26-10-17 12:34:56 -07:00
+    deliver.extend(ud)
+    return deliver
+
+
+def round_trip(number, text):
+    parts = encode_submit(number, text)
+    decoded = [decode_deliver(submit_to_deliver(pdu)) for pdu, _ in parts]
+    for (pdu, length), message in zip(parts, decoded):
+        assert len(pdu) == 2 + 2 * length, "AT+CMGS length excludes the SMSC octet"
+        assert message['sender'] == number
+    return parts, decoded
+
+
+def test_known_deliver():
+    message = decode_deliver(from_hex(DELIVER_HEX))
+    assert message['smsc'] == "+31624000000", message['smsc']
+    assert message['sender'] == "+31641600986", message['sender']
+    assert message['text'] == "How are you?", message['text']
+    assert message['timestamp'] == (2002, 8, 26, 19, 37, 41, 0), message['timestamp']
+    assert message['concat'] is None
+
+
+def test_septet_packing():
+    for fill in range(7):
+        septets = gsm7_septets("hellohello [€]")
+        packed = pack_septets(septets, fill)
+        assert decode_gsm7(packed, len(septets), fill) == "hellohello [€]", fill
+
+
+def test_memoryview_buffer():
+    # Decoding into a reused buffer allocates no intermediate hex string
+    buf = bytearray(200)
+    line = memoryview(bytearray(DELIVER_HEX))
+    octets = from_hex(line, buf)
+    assert decode_deliver(octets)['text'] == "How are you?"
+
+
+def test_gsm7_round_trip():
+    parts, decoded = round_trip("+15551234567", "Hello from Fone! {£5} ~ok~")
+    assert len(parts) == 1
+    assert decoded[0]['dcs'] == 0x00
+    assert decoded[0]['text'] == "Hello from Fone! {£5} ~ok~"
+
+
+def test_national_number():
+    _, decoded = round_trip("5551234", "odd length")
+    assert decoded[0]['text'] == "odd length"
+
+
+def test_ucs2_round_trip():
+    text = "Привет, 世界 😀"
+    parts, decoded = round_trip("+441234567890", text)
+    assert decoded[0]['dcs'] == 0x08
+    assert decoded[0]['text'] == text, decoded[0]['text']
+
+
+def test_concatenated_gsm7():
+    text = "".join(str(i % 10) for i in range(400)) + "€"
+    parts, decoded = round_trip("+15551234567", text)
+    assert len(parts) == 3, len(parts)
+    refs = set(message['concat'][0] for message in decoded)
+    assert len(refs) == 1
+    assert [message['concat'][1:] for message in decoded] == [(3, 1), (3, 2), (3, 3)]
+    assert "".join(message['text'] for message in decoded) == text
+
+
+def test_concatenated_keeps_escapes():
+    # The escape septet of '€' must not be the last septet of a part
+    text = "x" * 152 + "€" * 5
+    _, decoded = round_trip("+15551234567", text)
+    assert "".join(message['text'] for message in decoded) == text
+
+
+def test_concatenated_ucs2():
+    text = "😀" * 40 + "ж" * 30
+    parts, decoded = round_trip("+15551234567", text)
+    assert len(parts) == 2, len(parts)
+    assert "".join(message['text'] for message in decoded) == text
+
+
+def test_user_data_offsets():
+    # 8-bit data is returned as-is after the header
+    ud = b"\x05\x00\x03\x07\x02\x01" + b"raw"
+    text, concat = decode_user_data(ud, 0, len(ud), 0x04, True)
+    assert text == "raw" and concat == (7, 2, 1)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: passed")
+    print(f"=== {len(tests)} SMS PDU tests passed ===")
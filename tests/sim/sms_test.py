@@ -1,13 +1,22 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem_power import ModemPower # type: ignore
+from modem import Modem, RESULT_OK, RESULT_PROMPT, CTRL_Z # type: ignore
+from sms_pdu import encode_submit # type: ignore
+from sms import list_messages # type: ignore
+from at_parse import find # type: ignore
 from machine import UART, Pin
 import time
 import os
 
 # Initialize UART for SIM7600G
 uart = UART(0, baudrate=115200, tx=Pin(0), rx=Pin(1))
+modem = Modem(uart)
 
 # Power control pins
-power_key = Pin(2, Pin.OUT)
+power_key = Pin(2, Pin.OUT, value=1)
 status_pin = Pin(3, Pin.IN)
+power = ModemPower(modem, power_key, status_pin)
 
 # Environment variables storage for MicroPython compatibility
 _env_vars = {}
@@ -47,48 +56,21 @@ def getenv(key, default=None):
     # Fall back to our loaded environment variables
     return _env_vars.get(key, default)
 
-# Reset and power on the module
+# Power on the module, returning as soon as it accepts commands
 def reset_and_power_on_sim7600g():
-    # Simple power on sequence
-    power_key.value(1)  # Ensure off first
-    time.sleep(0.5)
-    power_key.value(0)  # Pull low to power on
-    time.sleep(1)       # Hold for 1 second
-    power_key.value(1)  # Release
-    print("SIM7600G power on sequence sent")
+    # No pulse if STATUS shows the module already running: a second pulse
+    # would switch it off
+    if power.power_on(timeout=30):
+        print(f"SIM7600G ready ({power.report()})")
+        return True
+    print("SIM7600G did not become ready within 30 s")
+    return False
 
 # Send AT command and get response
 def send_at_command(command, timeout=5):
-    print(f"Sending: {command}")
-
-    uart.write(command + '\r\n')
-    
-    full_response_bytes = b""
-    start_time = time.time()
-    
-    # Continuously try to read for the 'timeout' duration
-    while (time.time() - start_time) < timeout:
-        if uart.any():
-            chunk = uart.read()
-            if chunk:
-                full_response_bytes += chunk
-        time.sleep(0.1) # Slightly longer delay for stability
-
-    response_str = ""
-    if full_response_bytes:
-        try:
-            response_str = full_response_bytes.decode('utf-8')
-            print(f"Response: {response_str.strip()}")
-        except UnicodeDecodeError:
-            # Handle decode errors by converting to string representation
-            response_str = str(full_response_bytes) 
-            print(f"Response (raw): {response_str}")
-    else:
-        print(f"No response from module for command '{command}' after {timeout}s")
-
-    # Add delay between commands for stability
-    time.sleep(0.5)
-    return response_str
+    # Returns as soon as the module sends a final result code;
+    # timeout is only an upper bound
+    return modem.send_at_command(command, timeout)
 
 # Basic AT test to ensure communication
 def test_basic_at():
@@ -96,10 +78,9 @@ def test_basic_at():
     
     # Try a few times in case module is still sending boot messages
     for attempt in range(5):
-        response = send_at_command("AT", timeout=2)
-        
-        # Accept various valid responses from the module
-        if any(keyword in response for keyword in ["OK", "RDY", "READY", "+CPIN"]):
+        # Boot messages (RDY, +CPIN: READY) are URCs, not the answer to AT
+        result, _ = modem.command("AT", timeout=2)
+        if result == RESULT_OK:
             print("Module is responding - AT communication successful!")
             return True
             
@@ -110,82 +91,70 @@ def test_basic_at():
     print("AT test failed after 5 attempts")
     return False
 
-# Set SMS text mode
-def set_sms_text_mode():
-    print("\n=== Setting SMS Text Mode ===")
-    response = send_at_command("AT+CMGF=1")
+# Set SMS PDU mode: fewer bytes on the wire than text mode, and no CSV
+# parsing of sender names or message bodies
+def set_sms_pdu_mode():
+    print("\n=== Setting SMS PDU Mode ===")
+    result, _ = modem.command("AT+CMGF=0")
     
-    if "OK" in response:
-        print("SMS text mode set successfully")
+    if result == RESULT_OK:
+        print("SMS PDU mode set successfully")
         return True
     else:
-        print("Failed to set SMS text mode")
+        print("Failed to set SMS PDU mode")
         return False
 
-def list_sms_messages():
-    """Lists all SMS messages stored on the SIM."""
+def list_sms_messages(read_indexes=None):
+    """Lists all SMS messages stored on the SIM, collecting their indexes."""
     print("\n=== Listing all SMS messages ===")
-    response = send_at_command('AT+CMGL="ALL"', timeout=10)
-    
-    if "+CMGL:" not in response and "OK" in response:
-        print("No SMS messages found on SIM.")
-        return True
-    
-    if "+CMGL:" in response:
-        print("\n--- All SMS Messages ---")
-        lines = response.strip().split('\r\n')
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if line.startswith("+CMGL:"):
-                header = line
-                # The message body is expected on the next line
-                if (i + 1) < len(lines):
-                    message_body = lines[i+1]
-                    # If the next line is another header or OK, this message has no body
-                    if message_body.startswith("+CMGL:") or message_body.strip() == "OK":
-                        message_body = "[Empty Body]"
-                        i -= 1 # Don't skip the next header line
-
-                    try:
-                        # Parse header: +CMGL: 1,"REC READ","+1234567890",,"24/05/21,10:00:00+00"
-                        parts = header.split(',')
-                        index = parts[0].split(':')[1].strip()
-                        status = parts[1].strip('"')
-                        sender = parts[2].strip('"')
-                        timestamp = ",".join(parts[4:]).strip('"')
+    print('Sending: AT+CMGL=4')
 
-                        print(f"  Index: {index}, Status: {status}")
-                        print(f"  From: {sender}")
-                        print(f"  Date: {timestamp}")
-                        print(f"  Message: {message_body}")
-                        print("  --------------------")
-                    except Exception:
-                        print(f"Could not parse message: {header}")
+    # Each message is printed as soon as its PDU line arrives; only one
+    # message is held in RAM at a time
+    count = 0
+    for message in list_messages(modem, timeout=30):
+        if count == 0:
+            print("\n--- All SMS Messages ---")
+        count += 1
+        print(f"  Index: {message['index']}, Status: {message['stat']}")
+        if message['text'] is None:
+            print(f"  Could not decode PDU: {message['pdu']}")
+            print("  --------------------")
+            continue
+        print(f"  From: {message['sender']}")
+        print(f"  Date: {message['timestamp']}")
+        if message['concat']:
+            print(f"  Part: {message['concat'][2]}/{message['concat'][1]}")
+        print(f"  Message: {message['text'] or '[Empty Body]'}")
+        print("  --------------------")
+        if read_indexes is not None:
+            read_indexes.append(message['index'])
 
-                    i += 2 # Move past header and body
-                else:
-                    i += 1 # End of lines
-            else:
-                i += 1 # Not a header, move to next line
+    if modem.last_result != RESULT_OK:
+        print("Failed to list SMS messages.")
+        return False
 
+    if count == 0:
+        print("No SMS messages found on SIM.")
+    else:
         print("--- End of Messages ---")
-        return True
-    
-    print("Failed to list SMS messages.")
-    return False
+    return True
 
-def delete_all_sms_messages():
-    """Deletes all SMS messages from the SIM."""
-    print("\n=== Deleting all SMS messages ===")
-    response = send_at_command('AT+CMGDA="DEL ALL"', timeout=15)
+def delete_sms_messages(indexes):
+    """Deletes the given SMS storage indexes from the SIM."""
+    print(f"\n=== Deleting {len(indexes)} SMS messages ===")
+    failed = 0
+    for index in indexes:
+        result, _ = modem.command(f"AT+CMGD={index}", timeout=5)
+        if result != RESULT_OK:
+            print(f"Failed to delete message {index}")
+            failed += 1
     
-    if "OK" in response:
-        print("Successfully deleted all SMS messages.")
+    if failed == 0:
+        print("Successfully deleted the listed SMS messages.")
         return True
     
-    print("Failed to delete SMS messages.")
+    print(f"Failed to delete {failed} SMS messages.")
     return False
 
 # Send SMS message
@@ -193,49 +162,31 @@ def send_sms(phone_number, message):
     print(f"\n=== Sending SMS to {phone_number} ===")
     print(f"Message: {message}")
     
-    # Start SMS command
-    response = send_at_command(f'AT+CMGS="{phone_number}"', timeout=3)
-    
-    if ">" in response:
-        print("SMS prompt received, sending message...")
-        
-        # Send the message text followed by Ctrl+Z (ASCII 26)
-        uart.write(message)
-        uart.write(bytes([26]))  # Ctrl+Z to end message
-        
-        # Wait for response (SMS sending can take a while)
-        full_response_bytes = b""
-        start_time = time.time()
-        timeout = 30  # Extended timeout for SMS sending
+    # Long or non-GSM text is split into concatenated parts
+    parts = encode_submit(phone_number, message)
+    for number, (pdu, length) in enumerate(parts, 1):
+        result, _ = modem.command(f"AT+CMGS={length}", timeout=3)
+        if result != RESULT_PROMPT:
+            print("Failed to get SMS prompt")
+            return False
+        print(f"SMS prompt received, sending part {number}/{len(parts)}...")
         
-        while (time.time() - start_time) < timeout:
-            if uart.any():
-                chunk = uart.read()
-                if chunk:
-                    full_response_bytes += chunk
-            time.sleep(0.1)
+        # Hex PDU followed by Ctrl+Z
+        modem.write(pdu)
+        modem.write(CTRL_Z)
         
-        if full_response_bytes:
-            try:
-                response_str = full_response_bytes.decode('utf-8')
-                print(f"SMS Response: {response_str.strip()}")
-                
-                if "+CMGS:" in response_str and "OK" in response_str:
-                    print("SMS sent successfully!")
-                    return True
-                else:
-                    print("SMS sending failed")
-                    return False
-            except UnicodeDecodeError:
-                response_str = str(full_response_bytes)
-                print(f"SMS Response (raw): {response_str}")
-                return False
-        else:
-            print("No response received for SMS sending")
+        # Wait for +CMGS (SMS sending can take a while); returns on the
+        # final result code, 30 s is only the upper bound
+        result, response = modem.read_response(timeout=30)
+        print(f"SMS Response: {response.decode('utf-8', 'ignore').strip()}")
+        sent = find(response.split(b"\r\n"), b"+CMGS:", "d")
+        if result != RESULT_OK or sent is None:
+            print("SMS sending failed")
             return False
-    else:
-        print("Failed to get SMS prompt")
-        return False
+        print(f"Message reference: {sent[0]}")
+    
+    print("SMS sent successfully!")
+    return True
 
 # Main SMS test function
 def run_sms_test(phone_number, message):
@@ -246,9 +197,9 @@ def run_sms_test(phone_number, message):
         print("ERROR: Basic AT communication failed!")
         return False
     
-    # Set SMS text mode
-    if not set_sms_text_mode():
-        print("ERROR: Failed to set SMS text mode!")
+    # Set SMS PDU mode
+    if not set_sms_pdu_mode():
+        print("ERROR: Failed to set SMS PDU mode!")
         return False
     
     # Send the SMS
@@ -268,18 +219,20 @@ def run_read_sms_test():
         print("ERROR: Basic AT communication failed!")
         return False
 
-    # Set SMS text mode
-    if not set_sms_text_mode():
-        print("ERROR: Failed to set SMS text mode!")
+    # Set SMS PDU mode
+    if not set_sms_pdu_mode():
+        print("ERROR: Failed to set SMS PDU mode!")
         return False
 
     # List all messages
-    if not list_sms_messages():
+    read_indexes = []
+    if not list_sms_messages(read_indexes):
         print("ERROR: Failed to list SMS messages!")
-        # We can still try to delete them
+        # We can still delete the ones that were read
     
-    # Deleting messages after reading
-    delete_all_sms_messages()
+    # Delete only what was read: messages that arrived meanwhile stay on
+    # the SIM for the next run
+    delete_sms_messages(read_indexes)
 
     print("\n=== Read SMS Test Finished ===")
     return True
@@ -291,8 +244,6 @@ if __name__ == "__main__":
     
     print("Resetting and powering on SIM7600G...")
     reset_and_power_on_sim7600g()
-    print("Waiting for module to boot...")
-    time.sleep(5)
     
     # Run the read SMS test
     run_read_sms_test()
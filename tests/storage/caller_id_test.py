@@ -0,0 +1,210 @@
+import sys
+sys.path.insert(0, '../../hw')
+from modem import ticks_us, ticks_diff # type: ignore
+from caller_id import CallerIndex, caller_key, open_index, NAME_MAX # type: ignore
+from call import CallStateMachine, INCOMING # type: ignore
+from contacts import ContactStore # type: ignore
+from storage import CALLER_ID_SIZE # type: ignore
+from w25q128 import SECTOR_SIZE # type: ignore
+from ram_flash import RamFlash
+
+# Caller-ID index test: one page read per lookup with 5000 contacts,
+# collision chaining, updates and removal, remount, the RAM cache of
+# recent callers, leading zeros, the contact store keeping the index up
+# to date and the call state machine filling in the name.
+# Runs on the host (python3) with a RAM flash, or on the Pico.
+
+CONTACTS = 5000
+
+
+def synthetic_contacts(count):
+    # Spread over a few countries and formats
+    for i in range(count):
+        n = (i * 7919) % 10000000
+        if i % 4 == 0:
+            number = f"+1555{n:07d}"
+        elif i % 4 == 1:
+            number = f"0044 20 7{n:07d}"
+        elif i % 4 == 2:
+            number = f"+49 30 {n:07d}"
+        else:
+            number = f"555-{n:07d}"
+        yield {'name': f"Contact {i}", 'number': number}
+
+
+class CountingFlash(RamFlash):
+    """RamFlash counting reads, to check what a lookup costs"""
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.reads = 0
+
+    def partition(self, start, size):
+        return CountingFlash(size, self.data, self.start + start)
+
+    def read(self, addr, buf):
+        self.reads += 1
+        super().read(addr, buf)
+
+
+def test_keys():
+    assert caller_key("+1 (555) 012-3456") == (550123456, 9)
+    assert caller_key("0015550123456") == caller_key("+15550123456") == caller_key("5550123456")
+    assert caller_key("1234") == (1234, 4)
+    assert caller_key("012345678") != caller_key("12345678")
+    assert caller_key("") is None and caller_key(None) is None
+    print("Keys ✓")
+
+
+def test_benchmark():
+    flash = CountingFlash(CALLER_ID_SIZE)
+    index = CallerIndex(flash)
+    assert not index.valid and index.lookup("+15550000000") is None
+
+    start = ticks_us()
+    assert index.rebuild(synthetic_contacts(CONTACTS)) == CONTACTS
+    build_ms = ticks_diff(ticks_us(), start) // 1000
+    print(f"Index of {CONTACTS} contacts built in {build_ms} ms, {flash.programs} page programs")
+
+    index = CallerIndex(flash, cache_size=0)     # Fresh mount, no cache
+    assert index.valid
+    flash.reads = 0
+    start = ticks_us()
+    for i, contact in enumerate(synthetic_contacts(CONTACTS)):
+        assert index.lookup(contact['number']) == f"Contact {i}", contact
+    hit_us = ticks_diff(ticks_us(), start) / CONTACTS
+    assert flash.reads == CONTACTS, flash.reads
+    flash.reads = 0
+    start = ticks_us()
+    for i in range(1000):
+        assert index.lookup(f"+3361{i:07d}") is None
+    miss_us = ticks_diff(ticks_us(), start) / 1000
+    assert flash.reads == 1000, flash.reads
+    print(f"Lookups: 1 page read each, {hit_us:.0f} us per known caller, "
+          f"{miss_us:.0f} us per unknown number")
+
+    # Recent callers come from RAM
+    index = CallerIndex(flash)
+    index.lookup("+15550000000")
+    flash.reads = 0
+    assert index.lookup("0015550000000") == "Contact 0"
+    assert flash.reads == 0 and index.cache_hits == 1
+    print("Benchmark ✓")
+
+
+def test_chaining_and_updates():
+    # 16 KB: 31 buckets of 7 slots, so chains are forced
+    flash = RamFlash(4 * SECTOR_SIZE)
+    index = CallerIndex(flash, cache_size=0)
+    assert index.buckets == 31
+    numbers = [f"+1555{i * 31:07d}" for i in range(20)]    # All in one bucket
+    index.rebuild({'name': f"Chain {i}", 'number': n} for i, n in enumerate(numbers))
+    index.page_reads = 0
+    assert index.lookup(numbers[0]) == "Chain 0" and index.page_reads == 3   # Keeps scanning
+    index.page_reads = 0
+    assert index.lookup(numbers[19]) == "Chain 19" and index.page_reads == 3
+    assert index.lookup("+15559999999") is None
+
+    # Updates are appended; removal clears the key; both survive a remount
+    assert index.add(numbers[3], "Renamed")
+    assert index.remove(numbers[4])
+    assert not index.remove("+15559999999")
+    long_name = "Élodie " + "ü" * 40
+    assert index.add("+4930123456789", long_name)
+    index = CallerIndex(flash, cache_size=0)
+    assert index.lookup(numbers[3]) == "Renamed"
+    assert index.lookup(numbers[4]) is None
+    assert index.lookup(numbers[5]) == "Chain 5"
+    name = index.lookup("0049 30 123456789")
+    assert long_name.startswith(name) and len(name.encode()) <= NAME_MAX, name
+
+    # A rebuild only erases sectors holding data (header and buckets, the
+    # first overflow sector), and starts clean
+    flash.erases = 0
+    assert index.rebuild([{'name': "Only", 'number': "+15550000001"}]) == 1
+    assert flash.erases == 3 and index.lookup(numbers[3]) is None
+    print("Chaining, updates and removal ✓")
+
+
+def test_leading_zero():
+    # Same value in the last 9 digits, one with a leading zero
+    flash = RamFlash(4 * SECTOR_SIZE)
+    index = CallerIndex(flash, cache_size=0)
+    index.rebuild([{'name': "Nine", 'number': "+44 012345678"},
+                   {'name': "Eight", 'number': "12345678"}])
+    assert index.lookup("+44012345678") == "Nine"
+    assert index.lookup("12345678") == "Eight"
+    assert index.remove("12345678")
+    assert index.lookup("+44012345678") == "Nine" and index.lookup("12345678") is None
+    print("Leading zeros kept apart ✓")
+
+
+def test_contact_store():
+    import os
+    path = "caller_id_test.jsonl"
+    for name in (path, path + ".tmp"):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+    store = ContactStore(path)
+    store.add("Alice", "+15551110000")
+    flash = RamFlash(4 * SECTOR_SIZE)
+
+    # First boot: no header, so the index is built from the store
+    index = open_index(flash, store)
+    assert index.valid and store.index is index
+    assert index.lookup("5551110000") == "Alice"
+
+    # Adds and removals reach the index without a rebuild
+    store.add_many((("Bob", "+15552220000"), ("Carol", "0044 20 7000 0000")))
+    assert store.remove("+1 555 111 0000") and not store.remove("+15559999999")
+    assert [c['name'] for c in ContactStore(path).contacts()] == ["Bob", "Carol"]
+    flash.erases = 0
+    store = ContactStore(path)
+    index = open_index(flash, store)
+    assert flash.erases == 0        # Valid header: mounted as it is
+    assert index.lookup("+15552220000") == "Bob" and index.lookup("+442070000000") == "Carol"
+    assert index.lookup("+15551110000") is None
+    os.remove(path)
+    print("Contact store updates the index ✓")
+
+
+class FakeModem:
+    def __init__(self):
+        self.handlers = {}
+
+    def on_urc(self, prefix, handler, raw=False):
+        self.handlers[prefix] = handler
+
+
+def test_call_name():
+    flash = RamFlash(4 * SECTOR_SIZE)
+    index = CallerIndex(flash)
+    index.rebuild([{'name': "Mom", 'number': "+15551234567"}])
+    modem = FakeModem()
+    call = CallStateMachine(modem, lookup=index.lookup)
+    names = []
+    call.on_change(lambda old, new, m: names.append((new, m.name)))
+    modem.handlers["RING"](b"RING")
+    modem.handlers["+CLIP:"](b'+CLIP: "5551234567",129,,,,0')
+    assert names == [(INCOMING, ""), (INCOMING, "Mom")], names
+    modem.handlers["NO CARRIER"](b"NO CARRIER")
+    assert call.name == ""
+    modem.handlers["+CLIP:"](b'+CLIP: "+15550000000",145,,,,0')
+    assert call.name == "" and call.number == "+15550000000"
+    print("Incoming call name ✓")
+
+
+def run_test():
+    print("=== Caller-ID Index Test ===")
+    test_keys()
+    test_benchmark()
+    test_chaining_and_updates()
+    test_leading_zero()
+    test_contact_store()
+    test_call_name()
+    print("\n✓ Caller-ID index test completed")
+
+
+if __name__ == "__main__":
+    run_test()
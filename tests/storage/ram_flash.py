@@ -0,0 +1,50 @@
+# RAM stand-in for the W25Q128 driver
+#
+# Same read / program / erase_sector / partition interface, with NOR
+# semantics (programming can only clear bits, erasing sets a sector to
+# 0xFF), so raw flash regions can be exercised on the host. Counts page
+# programs and sector erases for write-efficiency checks.
+
+import sys
+sys.path.insert(0, '../../hw')
+from w25q128 import CAPACITY, SECTOR_SIZE, PAGE_SIZE # type: ignore
+
+
+class RamFlash:
+    def __init__(self, size=CAPACITY, data=None, start=0):
+        self.data = data if data is not None else bytearray(b"\xff") * size
+        self.start = start
+        self.size = size
+        self.programs = 0   # Page program operations
+        self.erases = 0
+
+    def partition(self, start, size):
+        if start % SECTOR_SIZE or size % SECTOR_SIZE or start + size > self.size:
+            raise ValueError("partition must be sector aligned and in range")
+        return RamFlash(size, self.data, self.start + start)
+
+    def _check(self, addr, n):
+        if addr < 0 or addr + n > self.size:
+            raise ValueError("address out of range")
+
+    def read(self, addr, buf):
+        self._check(addr, len(buf))
+        addr += self.start
+        buf[:] = self.data[addr:addr + len(buf)]
+
+    def program(self, addr, data):
+        self._check(addr, len(data))
+        done = 0
+        while done < len(data):
+            n = min(PAGE_SIZE - (addr + done) % PAGE_SIZE, len(data) - done)
+            base = self.start + addr + done
+            for i in range(n):
+                self.data[base + i] &= data[done + i]
+            self.programs += 1
+            done += n
+
+    def erase_sector(self, addr):
+        self._check(addr, 1)
+        base = self.start + addr - addr % SECTOR_SIZE
+        self.data[base:base + SECTOR_SIZE] = b"\xff" * SECTOR_SIZE
+        self.erases += 1
@@ -0,0 +1,110 @@
+import sys
+sys.path.insert(0, '../../hw')
+from track_log import TrackLog, TAG_DELTA # type: ignore
+from w25q128 import SECTOR_SIZE # type: ignore
+from ram_flash import RamFlash
+
+# Track log test: delta encoding, page-buffered writes, remount, ring
+# wrap-around, resuming after a torn record and GPX/CSV export.
+# Runs on the host (python3) with a RAM flash, or on the Pico.
+
+START = 800000000       # Track time in seconds
+
+
+def walk(track, start, seconds, lat=47606200, lon=-122332100, alt=5600):
+    # ~1.4 m/s heading north-east with GPS-like altitude jitter
+    for i in range(seconds):
+        track.log(start + i, lat + i * 9, lon + i * 7, alt + (i * 7919) % 300 - 150)
+    return start + seconds
+
+
+def test_compact_writes():
+    flash = RamFlash(64 * SECTOR_SIZE)
+    track = TrackLog(flash)
+    walk(track, START, 3 * 3600)
+    track.flush()
+    per_point = track.bytes / track.points
+    assert per_point < 8, per_point
+    assert flash.programs < track.points / 20, flash.programs
+    print(f"3 h at 1 Hz: {track.points} points, {per_point:.1f} bytes/point, "
+          f"{flash.programs} page programs, {flash.erases} sector erases")
+
+
+def test_remount_and_export():
+    flash = RamFlash(64 * SECTOR_SIZE)
+    track = TrackLog(flash)
+    end = walk(track, START, 600)
+    track.flush()
+
+    # After a reboot the log continues in a new segment
+    track = TrackLog(flash)
+    track.new_segment = True
+    walk(track, end + 300, 120, lat=47700000)
+    track.flush()
+    points = list(track.read_points())
+    assert len(points) == 720, len(points)
+    assert points[0] == (True, START, 47606200, -122332100, 5600 - 150), points[0]
+    assert points[600][0] and points[600][2] == 47700000
+    assert sum(1 for p in points if p[0]) == 2
+
+    lines = []
+    track.export_gpx(lines.append)
+    gpx = "".join(lines)
+    assert gpx.count("<trkpt") == 720 and gpx.count("<trkseg>") == 2
+    assert '<trkpt lat="47.606200" lon="-122.332100"><ele>54.5</ele>' in gpx, gpx[:400]
+    lines = []
+    track.export_csv(lines.append)
+    assert len("".join(lines).splitlines()) == 721
+    print(f"Remount: {len(points)} points in 2 segments exported as GPX and CSV")
+
+
+def test_wrap_around():
+    flash = RamFlash(8 * SECTOR_SIZE)
+    track = TrackLog(flash)
+    end = walk(track, START, 20000)
+    track.flush()
+    points = list(TrackLog(flash).read_points())
+    # The oldest sectors were recycled; what is left is the newest, in order
+    assert points[-1][1] == end - 1
+    assert all(b[1] == a[1] + 1 for a, b in zip(points, points[1:]))
+    assert 5000 < len(points) < 20000, len(points)
+    print(f"Wrap-around: {len(points)} newest points kept in 8 sectors")
+
+
+def test_torn_record():
+    flash = RamFlash(8 * SECTOR_SIZE)
+    track = TrackLog(flash)
+    end = walk(track, START, 100)
+    track.flush()
+    sector, addr = track.sector, track.addr
+
+    # Power cut while programming the next record: the tag and the first
+    # bytes made it, the rest is still erased
+    flash.program(addr, bytes((TAG_DELTA, 0x02, 0x92)))
+    track = TrackLog(flash)
+    assert track.torn and track.addr is None
+    assert len(list(track.read_points())) == 100
+
+    # Writing resumes in the next sector; both parts read back
+    track.new_segment = True
+    walk(track, end + 60, 50)
+    track.flush()
+    assert track.sector == sector + 1
+    track = TrackLog(flash)
+    assert not track.torn
+    points = list(track.read_points())
+    assert len(points) == 150 and points[100][:2] == (True, end + 60), points[100]
+
+    # Cut right after the tag byte
+    flash.program(track.addr, bytes((TAG_DELTA,)))
+    assert TrackLog(flash).torn
+    print("Torn record: resumed in a fresh sector, no points lost")
+
+
+if __name__ == "__main__":
+    print("=== Track Log Test ===")
+    test_compact_writes()
+    test_remount_and_export()
+    test_wrap_around()
+    test_torn_record()
+    print("\n✓ Track log test completed")
@@ -1,5 +1,6 @@
 import sys
 sys.path.insert(0, '../../hw')
+from w25q128 import W25Q128 # type: ignore
 from machine import Pin, SPI
 import os
 import vfs
@@ -88,43 +89,8 @@ def test_w25q128_flash():
     # Test filesystem operations using a simple custom block device
     print("\nTesting filesystem operations...")
     try:
-        # Create a simple block device wrapper for the flash
-        class W25Q128BlockDev:
-            def __init__(self, spi, cs):
-                self.spi = spi
-                self.cs = cs
-                self.sector_size = 4096  # 4KB sectors
-                
-            def readblocks(self, block_num, buf):
-                """Read blocks from flash"""
-                addr = block_num * self.sector_size
-                self.cs.value(0)
-                self.spi.write(bytearray([0x03, 
-                                        (addr >> 16) & 0xFF,
-                                        (addr >> 8) & 0xFF, 
-                                        addr & 0xFF]))
-                self.spi.readinto(buf)
-                self.cs.value(1)
-                
-            def writeblocks(self, block_num, buf):
-                """Write blocks to flash (simplified - real implementation needs erase)"""
-                print(f"Write block {block_num} (size: {len(buf)} bytes)")
-                # Note: This is a simplified implementation
-                # Real implementation would need to:
-                # 1. Send Write Enable command (0x06)
-                # 2. Erase sector if needed (0x20)
-                # 3. Program pages (0x02) 
-                
-            def ioctl(self, op, arg):
-                """Handle filesystem control operations"""
-                if op == 4:  # Block count
-                    return 4096  # 16MB / 4KB = 4096 sectors
-                elif op == 5:  # Block size
-                    return self.sector_size
-                return 0
-        
-        # Create block device
-        bdev = W25Q128BlockDev(spi, cs)
+        # Block device driver for the flash
+        bdev = W25Q128(spi, cs)
         
         # Test basic block device operations
         print("Testing block device interface...")